@@ -0,0 +1,208 @@
+"""
+Priority-aware admission control for upstream LLM work.
+
+One ``AdmissionController`` guards one upstream model.  It allows at most
+``max_in_flight`` units of work at once (a mock test generated as five
+shards weighs five units) and queues the rest by priority class, highest
+first and FIFO within a class.  Each requester may hold at most
+``per_requester_limit`` admitted or queued requests.  Requester keys are
+``kind:value`` strings, and ``requester_limits`` can give a kind its own cap
+(a client address shared by a whole school needs a much higher one than a
+student).  A request with no requester is not capped.
+
+A request is rejected straight away with ``AdmissionRejected`` when its
+requester is over the cap, or when the estimated queue wait for its priority
+already exceeds that priority's latency budget; it is also rejected if it
+does wait and the budget runs out.  The rejection carries a ``retry_after``
+hint in seconds for a 429 response.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; maps to HTTP 429"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request not admitted ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's hold on the controller; release it exactly once when the work ends"""
+
+    __slots__ = ("_controller", "_requester", "_weight", "_started", "_released")
+
+    def __init__(self, controller: "AdmissionController", requester: Optional[str], weight: int):
+        self._controller = controller
+        self._requester = requester
+        self._weight = weight
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._requester, self._weight, time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """Weighted in-flight limit with priority queueing, per-requester caps and latency budgets"""
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        priorities: List[str],
+        budgets: Dict[str, Optional[float]],
+        per_requester_limit: int = 2,
+        requester_limits: Optional[Dict[str, int]] = None,
+        initial_service_time: float = 10.0,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.priorities = priorities
+        self.budgets = budgets
+        self.per_requester_limit = per_requester_limit
+        self.requester_limits = requester_limits or {}
+        self.in_flight = 0
+        self._rank = {priority: rank for rank, priority in enumerate(priorities)}
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._per_requester: Dict[str, int] = defaultdict(int)
+        # Smoothed seconds one unit of work holds its slot, used to estimate queue waits
+        self._service_time = initial_service_time
+        self._waits: Dict[str, Deque[float]] = {priority: deque(maxlen=200) for priority in priorities}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = defaultdict(int)
+
+    def _queued_ahead(self, rank: int) -> int:
+        return sum(entry[2] for entry in self._queue if entry[0] <= rank and not entry[3].done())
+
+    def estimated_wait(self, priority: str, weight: int = 1) -> float:
+        """Seconds a new request of ``priority`` would likely wait for a slot"""
+        units_ahead = self._queued_ahead(self._rank[priority]) + weight - (self.max_in_flight - self.in_flight)
+        if units_ahead <= 0:
+            return 0.0
+        return units_ahead / self.max_in_flight * self._service_time
+
+    def requester_limit(self, requester: str) -> int:
+        """Cap for one requester key, by the kind before its first ``:``"""
+        return self.requester_limits.get(requester.split(":", 1)[0], self.per_requester_limit)
+
+    def _reject(self, requester: Optional[str], reason: str, retry_after: float):
+        if requester is not None:
+            self._drop_requester(requester)
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, max(1, math.ceil(retry_after)))
+
+    def _drop_requester(self, requester: str):
+        self._per_requester[requester] -= 1
+        if self._per_requester[requester] <= 0:
+            del self._per_requester[requester]
+
+    async def acquire(self, priority: str, requester: Optional[str] = None, weight: int = 1) -> Ticket:
+        """Wait for a slot and return a Ticket, or raise AdmissionRejected"""
+        weight = max(1, min(weight, self.max_in_flight))
+        rank = self._rank[priority]
+        if requester is not None:
+            if self._per_requester.get(requester, 0) >= self.requester_limit(requester):
+                self.rejected["requester_limit"] += 1
+                raise AdmissionRejected("requester_limit", max(1, math.ceil(self._service_time)))
+            self._per_requester[requester] += 1
+
+        if self._queued_ahead(rank) == 0 and self.in_flight + weight <= self.max_in_flight:
+            self.in_flight += weight
+            self.admitted += 1
+            self._waits[priority].append(0.0)
+            return Ticket(self, requester, weight)
+
+        budget = self.budgets.get(priority)
+        estimate = self.estimated_wait(priority, weight)
+        if budget is not None and estimate > budget:
+            self._reject(requester, "queue_over_budget", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, [rank, next(self._sequence), weight, future, time.monotonic(), priority])
+        try:
+            await asyncio.wait_for(future, budget)
+        except asyncio.TimeoutError:
+            # A request that gave up at the head of the queue may have been holding others back
+            self._dispatch()
+            self._reject(requester, "queue_timeout", self.estimated_wait(priority, weight))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away: hand the slot back
+                Ticket(self, requester, weight).release()
+            else:
+                if requester is not None:
+                    self._drop_requester(requester)
+                self._dispatch()
+            raise
+        return Ticket(self, requester, weight)
+
+    @asynccontextmanager
+    async def slot(self, priority: str, requester: Optional[str] = None, weight: int = 1):
+        """``async with controller.slot(...)``: acquire on entry, release on exit"""
+        ticket = await self.acquire(priority, requester, weight)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _release(self, requester: Optional[str], weight: int, held: float):
+        self.in_flight -= weight
+        if requester is not None:
+            self._drop_requester(requester)
+        self._service_time = 0.8 * self._service_time + 0.2 * (held / weight)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._queue:
+            rank, _, weight, future, enqueued_at, priority = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            # Strict priority: a large request at the head holds back smaller ones behind it
+            if self.in_flight + weight > self.max_in_flight:
+                break
+            heapq.heappop(self._queue)
+            self.in_flight += weight
+            self.admitted += 1
+            self._waits[priority].append(time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        depth = {priority: 0 for priority in self.priorities}
+        for entry in self._queue:
+            if not entry[3].done():
+                depth[entry[5]] += 1
+        waits = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[priority] = {
+                "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else 0.0,
+                "estimated_ms": round(self.estimated_wait(priority) * 1000, 1),
+            }
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": depth,
+            "wait": waits,
+            "budgets_seconds": self.budgets,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "requesters_active": len(self._per_requester),
+            "per_requester_limit": self.per_requester_limit,
+            "requester_limits": self.requester_limits,
+            "avg_service_seconds": round(self._service_time, 3),
+        }
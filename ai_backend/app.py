@@ -1,12 +1,34 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import os, json, re, random
+from openai import BadRequestError
+import os, sys, json, re, random, time, hmac
+import asyncio
 import logging
-from openai import OpenAI
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Sibling modules are imported by name whether this file runs from ai_backend/
+# (python app.py, uvicorn app:app) or is imported as ai_backend.app from the repo root.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import LLMClient
+from question_pool import QuestionPool
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from seen_questions import ANONYMOUS_STUDENT, SeenQuestionStore
+from near_duplicates import NearDuplicateFilter
+from curriculum import CurriculumIndex
+from resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+from streaming_json import JSONArrayItemParser, iter_json_array_positioned
+from admission import AdmissionController, AdmissionRejected
+from question_bank import MOCK, QUICK, QuestionBank, mock_scope
+from metrics import Registry, RequestMetricsMiddleware
+from prompt_templates import PromptBudgetExceeded, PromptRegistry, RenderedPrompt, count_message_tokens, fit_history
+from conversation_memory import ConversationMemory
+from translation import QuestionTranslator
 
 # -------------------------------
 # Configure logging
@@ -24,21 +46,286 @@ if not API_KEY:
     logger.error("OPENROUTER_API_KEY not found in environment variables")
     API_KEY = "invalid_key"  # placeholder to prevent startup crash
 
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+DEFAULT_MODEL = "google/gemini-2.0-flash-001"
+
+# Upstream connection pool, concurrency bound and per-call timeout (seconds)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "100"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Total budget (seconds) for one upstream call per endpoint, including queueing and hedges
+LLM_DEADLINES = {
+    "quiz": float(os.getenv("QUIZ_DEADLINE", "20")),
+    "mock_test": float(os.getenv("MOCK_TEST_DEADLINE", "45")),
+    "chat": float(os.getenv("CHAT_DEADLINE", "30")),
+    "notes": float(os.getenv("NOTES_DEADLINE", "60")),
+    "study_plan": float(os.getenv("STUDY_PLAN_DEADLINE", "60")),
+    "summary": float(os.getenv("SUMMARY_DEADLINE", "30")),
+    "translation": float(os.getenv("TRANSLATION_DEADLINE", "30")),
+}
+
+# Circuit breaker per upstream model: opens when, over the last BREAKER_WINDOW calls,
+# the failure rate or the share of calls slower than BREAKER_SLOW_CALL_SECONDS is too high
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "15"))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Hedged requests: a second identical call is sent once the first has run longer than
+# the observed p95 latency (never sooner than HEDGE_MIN_DELAY). Doubles cost on slow calls
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+HEDGED_ENDPOINTS = {"quiz", "chat"}
+
+# Admission control per upstream model: at most ADMISSION_MAX_IN_FLIGHT units of work
+# (a mock test counts one unit per shard), queued by priority, highest first.
+# A request whose estimated queue wait exceeds its class budget (seconds) gets a 429
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "50"))
+ADMISSION_PER_STUDENT = int(os.getenv("ADMISSION_PER_STUDENT", "2"))
+# Opt-in cap per client address for requests without a student_id (0 = off). Schools share one
+# address behind NAT or the front-end proxy, so set it well above the per-student cap
+ADMISSION_PER_ADDRESS = int(os.getenv("ADMISSION_PER_ADDRESS", "0"))
+ADMISSION_PRIORITIES = ["interactive", "generation", "mock_test", "background"]
+ADMISSION_BUDGETS = {
+    "interactive": float(os.getenv("ADMISSION_BUDGET_INTERACTIVE", "10")),
+    "generation": float(os.getenv("ADMISSION_BUDGET_GENERATION", "5")),
+    "mock_test": float(os.getenv("ADMISSION_BUDGET_MOCK_TEST", "3")),
+    "background": None,  # pool refills wait as long as it takes
+}
+NAMESPACE_PRIORITIES = {"chat": "interactive", "notes": "generation", "study_plan": "generation"}
+
+# Input token budget per prompt template, checked before a prompt is sent
+PROMPT_BUDGETS = {
+    "assistant_chat": int(os.getenv("ASSISTANT_CHAT_PROMPT_BUDGET", "3000")),
+    "chat": int(os.getenv("CHAT_PROMPT_BUDGET", "3000")),
+    "study_plan": int(os.getenv("STUDY_PLAN_PROMPT_BUDGET", "1500")),
+    "notes": int(os.getenv("NOTES_PROMPT_BUDGET", "1500")),
+    "conversation_summary": int(os.getenv("SUMMARY_PROMPT_BUDGET", "6000")),
+    "question_translation": int(os.getenv("TRANSLATION_PROMPT_BUDGET", "4000")),
+}
+
+# Chat sessions keep this many recent messages (user and assistant count one each) verbatim;
+# older ones are folded into a summary
+CHAT_MEMORY_MESSAGES = int(os.getenv("CHAT_MEMORY_MESSAGES", "4"))
+CHAT_MEMORY_TTL = int(os.getenv("CHAT_MEMORY_TTL", str(24 * 3600)))
+
 # -------------------------------
-# Initialize OpenAI client
+# Prometheus metrics (served at /metrics)
+# -------------------------------
+metrics_registry = Registry()
+http_request_duration = metrics_registry.histogram(
+    "ai_backend_http_request_duration_seconds", "HTTP request latency, including streamed bodies",
+    ("method", "route", "status"),
+)
+http_requests_in_progress = metrics_registry.gauge(
+    "ai_backend_http_requests_in_progress", "HTTP requests currently being served", ("method",)
+)
+llm_time_to_first_token = metrics_registry.histogram(
+    "ai_backend_llm_time_to_first_token_seconds", "Time from a streaming upstream call to its first delta",
+    ("endpoint", "model"),
+)
+llm_request_duration = metrics_registry.histogram(
+    "ai_backend_llm_request_duration_seconds", "Total upstream LLM call time", ("endpoint", "model")
+)
+llm_requests_total = metrics_registry.counter(
+    "ai_backend_llm_requests_total", "Upstream LLM calls by outcome (ok, error, timeout, circuit_open)",
+    ("endpoint", "model", "outcome"),
+)
+llm_prompt_tokens = metrics_registry.counter(
+    "ai_backend_llm_prompt_tokens_total", "Prompt tokens reported by upstream usage", ("endpoint", "model")
+)
+llm_completion_tokens = metrics_registry.counter(
+    "ai_backend_llm_completion_tokens_total", "Completion tokens reported by upstream usage", ("endpoint", "model")
+)
+fallback_responses = metrics_registry.counter(
+    "ai_backend_fallback_responses_total", "Responses served from the static fallback questions", ("endpoint",)
+)
+mock_tests_short = metrics_registry.counter(
+    "ai_backend_mock_tests_short_total", "Mock tests returned with fewer questions than requested"
+)
+
+def _record_usage(model: str, endpoint: str, prompt_tokens: int, completion_tokens: int):
+    llm_prompt_tokens.inc(endpoint, model, amount=prompt_tokens)
+    llm_completion_tokens.inc(endpoint, model, amount=completion_tokens)
+
+def _llm_outcome(error: BaseException) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+# -------------------------------
+# Initialize async LLM client
 # -------------------------------
 try:
-    client = OpenAI(api_key=API_KEY, base_url="https://openrouter.ai/api/v1")
-    logger.info("OpenAI client initialized successfully")
+    client = LLMClient(
+        api_key=API_KEY,
+        base_url=OPENROUTER_BASE_URL,
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        timeout=LLM_TIMEOUT,
+        on_usage=_record_usage,
+    )
+    logger.info("Async LLM client initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize OpenAI client: {e}")
+    logger.error(f"Failed to initialize LLM client: {e}")
     client = None
 
+# -------------------------------
+# LLM response cache
+# -------------------------------
+# Per-endpoint TTLs in seconds; 0 disables caching for that endpoint
+CACHE_TTLS = {
+    "notes": int(os.getenv("NOTES_CACHE_TTL", str(7 * 24 * 3600))),
+    "study_plan": int(os.getenv("STUDY_PLAN_CACHE_TTL", str(7 * 24 * 3600))),
+    "chat": int(os.getenv("CHAT_CACHE_TTL", "0")),
+    "translation": int(os.getenv("TRANSLATION_CACHE_TTL", str(30 * 24 * 3600))),
+}
+# DELETE /cache needs "Authorization: Bearer <token>" with this token; unset, the endpoint is disabled
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+    local_ttl=float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", "300")),
+    redis_url=os.getenv("REDIS_URL"),
+)
+
+# Identical concurrent generations share one upstream call
+inflight = SingleFlight()
+
+# Prompt templates with a fixed system prefix and a token budget
+prompts = PromptRegistry()
+
+# -------------------------------
+# Upstream resilience
+# -------------------------------
+breakers: Dict[str, CircuitBreaker] = {}
+
+def _breaker_for(model: str) -> CircuitBreaker:
+    breaker = breakers.get(model)
+    if breaker is None:
+        breaker = breakers[model] = CircuitBreaker(
+            model,
+            window=BREAKER_WINDOW,
+            min_calls=BREAKER_MIN_CALLS,
+            failure_rate=BREAKER_FAILURE_RATE,
+            slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+            slow_call_rate=BREAKER_SLOW_CALL_RATE,
+            reset_timeout=BREAKER_RESET_SECONDS,
+        )
+    return breaker
+
+admission: Dict[str, AdmissionController] = {}
+
+def _admission_for(model: str) -> AdmissionController:
+    controller = admission.get(model)
+    if controller is None:
+        controller = admission[model] = AdmissionController(
+            model,
+            max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+            priorities=ADMISSION_PRIORITIES,
+            budgets=ADMISSION_BUDGETS,
+            per_requester_limit=ADMISSION_PER_STUDENT,
+            requester_limits={"address": ADMISSION_PER_ADDRESS},
+        )
+    return controller
+
+def _requester(student_id: Optional[str], http_request: Request) -> Optional[str]:
+    """Key for the per-requester admission cap: the student id, else (only with ADMISSION_PER_ADDRESS) the client address"""
+    if student_id and student_id != ANONYMOUS_STUDENT:
+        return f"student:{student_id}"
+    if ADMISSION_PER_ADDRESS > 0 and http_request.client is not None:
+        return f"address:{http_request.client.host}"
+    return None
+
+async def llm_complete(endpoint: str, messages: List[Dict[str, str]], temperature: float, model: str = DEFAULT_MODEL) -> str:
+    """One upstream completion under the endpoint's deadline, the model's circuit breaker and optional hedging
+
+    Raises CircuitOpenError without calling upstream while the breaker is open,
+    and asyncio.TimeoutError once the endpoint's deadline is spent.
+    """
+    deadline = LLM_DEADLINES[endpoint]
+    breaker = _breaker_for(model)
+    hedge_delay = None
+    if HEDGE_ENABLED and endpoint in HEDGED_ENDPOINTS:
+        p95 = breaker.p95()
+        if p95 is not None:
+            hedge_delay = max(p95, HEDGE_MIN_DELAY)
+    started = time.monotonic()
+    try:
+        text = await call_with_resilience(
+            breaker,
+            lambda: client.complete(model=model, messages=messages, temperature=temperature, timeout=deadline, label=endpoint),
+            deadline,
+            hedge_delay
+        )
+    except Exception as e:
+        llm_requests_total.inc(endpoint, model, _llm_outcome(e))
+        raise
+    llm_request_duration.observe(time.monotonic() - started, endpoint, model)
+    llm_requests_total.inc(endpoint, model, "ok")
+    return text
+
+async def llm_stream(
+    endpoint: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    model: str = DEFAULT_MODEL,
+    **kwargs
+) -> AsyncIterator[str]:
+    """Streaming counterpart of llm_complete: same breaker and deadline (for the whole stream), no hedging"""
+    breaker = _breaker_for(model)
+    if not breaker.allow():
+        llm_requests_total.inc(endpoint, model, "circuit_open")
+        raise CircuitOpenError(f"Circuit for {model} is open")
+    deadline = LLM_DEADLINES[endpoint]
+    started = time.monotonic()
+    succeeded = None
+    first = True
+    deltas = client.stream(model=model, messages=messages, temperature=temperature, timeout=deadline, label=endpoint, **kwargs)
+    try:
+        while True:
+            remaining = max(0.0, deadline - (time.monotonic() - started))
+            try:
+                delta = await asyncio.wait_for(deltas.__anext__(), remaining)
+            except StopAsyncIteration:
+                break
+            if first:
+                first = False
+                llm_time_to_first_token.observe(time.monotonic() - started, endpoint, model)
+            yield delta
+        succeeded = True
+    except Exception as e:
+        succeeded = False
+        llm_requests_total.inc(endpoint, model, _llm_outcome(e))
+        raise
+    finally:
+        await deltas.aclose()
+        elapsed = time.monotonic() - started
+        if succeeded is None:
+            # The consumer stopped early or went away: no outcome to record
+            breaker.release()
+        else:
+            breaker.record(succeeded, elapsed)
+        if succeeded:
+            llm_request_duration.observe(elapsed, endpoint, model)
+            llm_requests_total.inc(endpoint, model, "ok")
+
 # -------------------------------
 # Create FastAPI app
 # -------------------------------
 app = FastAPI(title="AI Chat Backend", version="1.0")
 
+app.add_middleware(
+    RequestMetricsMiddleware,
+    latency=http_request_duration,
+    in_progress=http_requests_in_progress,
+)
+
 # Allow all origins (you can restrict this later)
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +335,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def close_llm_client():
+    if client is not None:
+        await client.aclose()
+    await response_cache.aclose()
+    await seen_store.aclose()
+
 # -------------------------------
 # Define request models
 # -------------------------------
@@ -57,6 +351,10 @@ class ChatRequest(BaseModel):
     chapter: str
     student_question: str
     chat_history: Optional[List[Dict[str, str]]] = None
+    session_id: Optional[str] = None
+    student_id: Optional[str] = None
+    stream: bool = False
+    no_cache: bool = False
 
 class StudyPlanRequest(BaseModel):
     class_level: str
@@ -64,12 +362,18 @@ class StudyPlanRequest(BaseModel):
     chapter: str
     days_available: int = 7
     hours_per_day: int = 2
+    student_id: Optional[str] = None
+    stream: bool = False
+    no_cache: bool = False
 
 class NotesRequest(BaseModel):
     class_level: str
     subject: str
     chapter: str
     specific_topic: Optional[str] = None
+    student_id: Optional[str] = None
+    stream: bool = False
+    no_cache: bool = False
 
 # -------------------------------
 # Curriculum Data
@@ -1299,12 +1603,32 @@ CHAPTERS_SIMPLE = {
     }
 }
 
+# Indexes and pre-serialised bodies compiled once from the curriculum dicts above
+CURRICULUM = CurriculumIndex(CHAPTERS_DETAILED, CHAPTERS_SIMPLE)
+
 # -------------------------------
 # Global variables
 # -------------------------------
-MAX_PREVIOUS_QUESTIONS = 100
-PREVIOUS_QUESTIONS_QUICK = {}
-PREVIOUS_QUESTIONS_MOCK = {}
+# Per-student history of served questions, shared by all workers through Redis
+seen_store = SeenQuestionStore(
+    redis_url=os.getenv("REDIS_URL"),
+    max_seen=int(os.getenv("SEEN_QUESTIONS_PER_SCOPE", "500")),
+    ttl=int(os.getenv("SEEN_QUESTIONS_TTL", str(90 * 24 * 3600))),
+)
+
+# Generated questions at least this similar (estimated trigram Jaccard) to one the
+# student has seen, or to another in the same batch, are dropped and only the
+# shortfall is regenerated, at most DEDUPE_TOP_UP_ROUNDS times
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+DEDUPE_TOP_UP_ROUNDS = int(os.getenv("DEDUPE_TOP_UP_ROUNDS", "2"))
+
+def _level_for_attempts(attempts: int) -> int:
+    """Difficulty level from a student's own attempt count: 1 = simple, 2 = medium, 3 = hard"""
+    if attempts == 0:
+        return 1
+    elif attempts == 1:
+        return 2
+    return 3
 
 # Fallback quiz data when API is unavailable
 FALLBACK_QUIZZES = {
@@ -1451,6 +1775,112 @@ def _classify_question_type(question: str) -> str:
     else:
         return "general"
 
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _cached_completion(
+    namespace: str,
+    prompt: RenderedPrompt,
+    temperature: float,
+    no_cache: bool = False,
+    requester: Optional[str] = None
+) -> Tuple[str, bool]:
+    """Return (text, cached) for a prompt, serving from the response cache when the endpoint has a TTL
+
+    Only a cache miss goes through admission control (and may raise AdmissionRejected).
+    """
+    ttl = CACHE_TTLS.get(namespace, 0)
+    key = ResponseCache.make_key(namespace, prompt.cache_text, DEFAULT_MODEL, temperature)
+    if ttl > 0 and not no_cache:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return cached, True
+
+    async def generate() -> str:
+        async with _admission_for(DEFAULT_MODEL).slot(NAMESPACE_PRIORITIES[namespace], requester):
+            text = await llm_complete(namespace, prompt.messages, temperature)
+        if ttl > 0 and text.strip():
+            await response_cache.set(key, text, ttl)
+        return text
+
+    if no_cache:
+        return await generate(), False
+    return await inflight.do(key, generate, leader_errors=(AdmissionRejected,)), False
+
+async def _replay(text: str):
+    """Yield a cached response as a single stream delta"""
+    yield text
+
+async def _stream_completion(
+    prompt: RenderedPrompt,
+    temperature: float,
+    metadata: dict,
+    namespace: str = "chat",
+    no_cache: bool = False,
+    requester: Optional[str] = None,
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None
+) -> StreamingResponse:
+    """Stream an LLM completion as SSE: one ``token`` event per delta, then a ``done`` event carrying metadata
+
+    A cache miss is admitted before the response starts, so a rejection is still a plain 429.
+    """
+    started = time.perf_counter()
+    ttl = CACHE_TTLS.get(namespace, 0)
+    key = ResponseCache.make_key(namespace, prompt.cache_text, DEFAULT_MODEL, temperature) if ttl > 0 else None
+    cached = await response_cache.get(key) if key and not no_cache else None
+    ticket = None
+    if cached is None:
+        ticket = await _admission_for(DEFAULT_MODEL).acquire(NAMESPACE_PRIORITIES[namespace], requester)
+
+    async def event_stream():
+        first_token_ms = None
+        chunks = []
+        try:
+            if cached is not None:
+                deltas = _replay(cached)
+            else:
+                deltas = llm_stream(namespace, prompt.messages, temperature)
+
+            async for delta in deltas:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000)
+                chunks.append(delta)
+                yield _sse_event("token", {"delta": delta})
+
+            text = "".join(chunks)
+            if key and cached is None and text.strip():
+                await response_cache.set(key, text, ttl)
+            if on_complete is not None:
+                await on_complete(text)
+            yield _sse_event("done", {
+                "success": True,
+                **metadata,
+                "cached": cached is not None,
+                "model": DEFAULT_MODEL,
+                "chars": len(text),
+                "time_to_first_token_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000)
+            })
+        except Exception as e:
+            logger.error(f"Error while streaming completion: {str(e)}")
+            yield _sse_event("error", {
+                "success": False,
+                **metadata,
+                "message": "I apologize, but I'm having trouble processing your request right now. Please try again."
+            })
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot even if the client left before the body started
+        background=BackgroundTask(ticket.release) if ticket is not None else None
+    )
+
 # -------------------------------
 # Health check endpoint
 # -------------------------------
@@ -1458,11 +1888,56 @@ def _classify_question_type(question: str) -> str:
 async def health_check():
     return {"status": "ok", "message": "FastAPI is running successfully!"}
 
+# -------------------------------
+# Response cache endpoints
+# -------------------------------
+@app.get("/cache/stats")
+def get_cache_stats():
+    return JSONResponse(content={"ttls": CACHE_TTLS, **response_cache.stats(), "single_flight": inflight.stats()})
+
+@app.delete("/cache")
+async def invalidate_cache(http_request: Request, namespace: Optional[str] = None):
+    if not CACHE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Cache invalidation is disabled")
+    supplied = http_request.headers.get("authorization", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {CACHE_ADMIN_TOKEN}".encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    if namespace is not None and namespace not in CACHE_TTLS:
+        raise HTTPException(status_code=400, detail="Invalid cache namespace")
+    removed = await response_cache.invalidate(namespace)
+    logger.info(f"Invalidated response cache namespace: {namespace or 'all'} ({removed} local entries)")
+    return JSONResponse(content={"invalidated": namespace or "all", "local_entries_removed": removed})
+
+# -------------------------------
+# Upstream status endpoint
+# -------------------------------
+@app.get("/upstream/status")
+def get_upstream_status():
+    return JSONResponse(content={
+        "in_flight": client.in_flight if client is not None else 0,
+        "max_concurrency": client.max_concurrency if client is not None else 0,
+        "deadlines": LLM_DEADLINES,
+        "hedging": {"enabled": HEDGE_ENABLED, "min_delay": HEDGE_MIN_DELAY, "endpoints": sorted(HEDGED_ENDPOINTS)},
+        "breakers": {model: breaker.status() for model, breaker in breakers.items()},
+        "admission": {model: controller.stats() for model, controller in admission.items()},
+        "generation": {
+            **generation_stats,
+            "usable_ratio": round(generation_stats["usable"] / generation_stats["requested"], 4) if generation_stats["requested"] else 0.0,
+            "structured_output": STRUCTURED_OUTPUT_ENABLED,
+            "structured_output_unsupported": sorted(_structured_output_unsupported)
+        },
+        "translation": {
+            "enabled": TRANSLATION_PIPELINE_ENABLED,
+            "canonical_language": CANONICAL_LANGUAGE,
+            **translator.stats()
+        }
+    })
+
 # -------------------------------
 # AI chat endpoint
 # -------------------------------
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     if not client or API_KEY == "invalid_key":
         raise HTTPException(status_code=500, detail="OpenAI client not initialized")
 
@@ -1470,25 +1945,677 @@ async def chat_endpoint(request: ChatRequest):
         messages = [
             {"role": "system", "content": f"You are a helpful AI tutor for {request.subject}, class {request.class_level}."},
         ]
+        question = {"role": "user", "content": request.student_question}
+        history_budget = PROMPT_BUDGETS["chat"] - count_message_tokens(messages + [question])
+        messages.extend(await _conversation_context("chat", request.session_id, request.chat_history, history_budget))
+        messages.append(question)
 
-        if request.chat_history:
-            messages.extend(request.chat_history)
+        async with _admission_for("gpt-3.5-turbo").slot("interactive", _requester(request.student_id, http_request)):
+            answer = await llm_complete("chat", messages, 0.7, model="gpt-3.5-turbo")
 
-        messages.append({"role": "user", "content": request.student_question})
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.7,
-        )
-
-        answer = response.choices[0].message.content.strip()
-        return {"answer": answer}
+        await _remember_turn("chat", request.session_id, request.student_question, answer.strip())
+        return {"answer": answer.strip()}
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error during chat request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------------
+# Question generation
+# -------------------------------
+QUIZ_SIZE = 10
+MOCK_TEST_SIZE = 50
+
+# Mock tests are generated as concurrent shards of this many questions
+MOCK_SHARD_SIZE = int(os.getenv("MOCK_SHARD_SIZE", "10"))
+MOCK_SHARD_RETRIES = int(os.getenv("MOCK_SHARD_RETRIES", "1"))
+# Shards of one mock test in flight upstream at once
+MOCK_SHARD_CONCURRENCY = int(os.getenv("MOCK_SHARD_CONCURRENCY", "5"))
+
+# Ask for schema-constrained JSON where the provider supports it; models that
+# reject response_format are remembered and asked for plain JSON instead
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT_ENABLED", "true").lower() == "true"
+_structured_output_unsupported = set()
+
+# Follow-up requests for just the questions that failed validation or never arrived
+GENERATION_REPAIR_ROUNDS = int(os.getenv("GENERATION_REPAIR_ROUNDS", "2"))
+
+def _questions_response_format(name: str, item_schema: dict) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"questions": {"type": "array", "items": item_schema}},
+                "required": ["questions"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+QUIZ_RESPONSE_FORMAT = _questions_response_format("quiz_questions", {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+        "answer": {"type": "string"},
+    },
+    "required": ["question", "options", "answer"],
+    "additionalProperties": False,
+})
+
+MOCK_RESPONSE_FORMAT = _questions_response_format("mock_test_questions", {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "options": {
+            "type": "object",
+            "properties": {label: {"type": "string"} for label in "ABCD"},
+            "required": list("ABCD"),
+            "additionalProperties": False,
+        },
+        "answer": {"type": "string", "enum": list("ABCD")},
+    },
+    "required": ["question", "options", "answer"],
+    "additionalProperties": False,
+})
+
+# Generate-once, translate-many: questions for other languages are generated (or
+# taken from the question bank) in CANONICAL_LANGUAGE and translated, cached per
+# question and language
+TRANSLATION_PIPELINE_ENABLED = os.getenv("TRANSLATION_PIPELINE_ENABLED", "false").lower() == "true"
+CANONICAL_LANGUAGE = os.getenv("CANONICAL_LANGUAGE", "English")
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "5"))
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+
+# Counters for how much of each generation is usable
+generation_stats = {
+    "requested": 0,
+    "usable": 0,
+    "malformed": 0,
+    "invalid": 0,
+    "missing": 0,
+    "repair_requests": 0,
+    "structured_output_fallbacks": 0,
+}
+
+def _validate_quiz_question(q) -> Optional[dict]:
+    """A quick-practice question with 4 list options and an answer among them, or None"""
+    if not isinstance(q, dict) or not all(key in q for key in ["question", "options", "answer"]):
+        return None
+
+    # Ensure options is a list with exactly 4 items
+    if not isinstance(q["options"], list) or len(q["options"]) != 4:
+        return None
+
+    # Ensure the answer exists in the options
+    if q["answer"] not in q["options"]:
+        return None
+
+    return q
+
+def _shuffle_quiz(questions: List[dict]) -> List[dict]:
+    """Return shuffled copies of quick-practice questions with shuffled options"""
+    # The answer is the option text, not its position, so it survives the shuffle
+    shuffled = [dict(q, options=random.sample(q["options"], len(q["options"]))) for q in questions]
+    random.shuffle(shuffled)
+    return shuffled
+
+def _validate_mock_question(q) -> Optional[dict]:
+    """A mock-test question with 4 A-D options and an answer label among them, or None"""
+    if not isinstance(q, dict) or not all(key in q for key in ["question", "options", "answer"]):
+        return None
+    if isinstance(q["options"], list) and len(q["options"]) == 4:
+        q["options"] = {chr(65 + i): opt for i, opt in enumerate(q["options"])}
+    elif not isinstance(q["options"], dict) or len(q["options"]) != 4:
+        return None
+    if q["answer"] not in q["options"]:
+        return None
+    return q
+
+async def _stream_questions(
+    endpoint: str,
+    prompt: str,
+    validate: Callable[[dict], Optional[dict]],
+    response_format: Optional[dict] = None
+) -> AsyncIterator[dict]:
+    """Stream a generation and yield each valid question as soon as its closing brace arrives
+
+    Malformed or invalid items are dropped one by one (and logged by position);
+    the rest of the batch is kept.  Raises ValueError if the completion
+    contained no JSON objects at all.
+    """
+    kwargs = {}
+    if response_format is not None and STRUCTURED_OUTPUT_ENABLED and DEFAULT_MODEL not in _structured_output_unsupported:
+        kwargs["response_format"] = response_format
+
+    parser = JSONArrayItemParser()
+    rejected = []
+    deltas = llm_stream(endpoint, [{"role": "user", "content": prompt}], 0.9, **kwargs)
+    try:
+        # Positions are array indexes, counting dropped elements too
+        async for position, item in iter_json_array_positioned(deltas, parser):
+            question = validate(item)
+            if question is None:
+                rejected.append(position)
+                continue
+            yield question
+    except BadRequestError as e:
+        if "response_format" not in kwargs or parser.parsed or parser.dropped:
+            raise
+        logger.warning(f"{DEFAULT_MODEL} rejected structured output, falling back to plain JSON: {e}")
+        _structured_output_unsupported.add(DEFAULT_MODEL)
+        generation_stats["structured_output_fallbacks"] += 1
+        async for question in _stream_questions(endpoint, prompt, validate):
+            yield question
+        return
+    finally:
+        generation_stats["malformed"] += parser.dropped
+        generation_stats["invalid"] += len(rejected)
+
+    if parser.dropped or rejected:
+        logger.warning(
+            f"Dropped malformed questions at positions {parser.dropped_positions} and invalid questions "
+            f"at positions {rejected} from a {endpoint} generation"
+        )
+    if parser.parsed == 0 and parser.dropped == 0:
+        raise ValueError("AI did not return a JSON array of questions")
+
+async def _collect_questions(
+    endpoint: str,
+    prompt: str,
+    validate: Callable[[dict], Optional[dict]],
+    response_format: Optional[dict] = None
+) -> List[dict]:
+    """Gather a streamed generation, keeping the questions that arrived before any mid-stream failure"""
+    questions = []
+    try:
+        async for question in _stream_questions(endpoint, prompt, validate, response_format):
+            questions.append(question)
+    except Exception as e:
+        if not questions:
+            raise
+        logger.warning(f"{endpoint} generation stopped after {len(questions)} questions: {e}")
+    return questions
+
+async def _generate_validated(
+    endpoint: str,
+    build_prompt: Callable[[int], str],
+    validate: Callable[[dict], Optional[dict]],
+    count: int,
+    response_format: Optional[dict] = None
+) -> List[dict]:
+    """Generate ``count`` valid questions, re-requesting only as many as were rejected or never arrived"""
+    generation_stats["requested"] += count
+    questions = await _collect_questions(endpoint, build_prompt(count), validate, response_format)
+    questions = questions[:count]
+    for repair_round in range(1, GENERATION_REPAIR_ROUNDS + 1):
+        shortfall = count - len(questions)
+        if shortfall <= 0:
+            break
+        generation_stats["repair_requests"] += 1
+        logger.info(f"Requesting {shortfall} replacement questions for a {endpoint} generation (repair round {repair_round})")
+        try:
+            replacements = await _collect_questions(endpoint, build_prompt(shortfall), validate, response_format)
+        except Exception as e:
+            logger.error(f"Repair request failed: {e}")
+            break
+        questions.extend(replacements[:shortfall])
+    generation_stats["usable"] += len(questions)
+    generation_stats["missing"] += count - len(questions)
+    return questions
+
+def _shuffle_mock_options(questions: List[dict]) -> List[dict]:
+    """Return copies of mock-test questions with options shuffled and relabelled A-D"""
+    shuffled = []
+    for q in questions:
+        items = list(q["options"].items())
+        random.shuffle(items)
+        new_options = {}
+        new_answer = None
+        for new_idx, (old_label, text_opt) in enumerate(items):
+            new_label = chr(65 + new_idx)
+            new_options[new_label] = text_opt
+            if old_label == q["answer"]:
+                new_answer = new_label
+        shuffled.append(dict(q, options=new_options, answer=new_answer))
+    return shuffled
+
+def _quiz_prompt(subtopic: str, difficulty: str, language: str, count: int) -> str:
+    """Prompt for a quick-practice batch"""
+    # Get language instruction
+    language_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["English"])
+
+    prompt = f"""
+        Generate {count} multiple-choice questions for "{subtopic}".
+        Difficulty: {difficulty}.
+        {language_instruction}
+       
+        IMPORTANT INSTRUCTIONS:
+        - ALL questions, options, and content MUST be in {language} language only.
+        - Do NOT mix English with the target language.
+        - Use proper script for the selected language.
+       
+        IMPORTANT FORMAT REQUIREMENTS:
+        - Each question should have exactly 4 options as an array: ["option1", "option2", "option3", "option4"]
+        - The answer should be the actual text of the correct option, NOT a letter
+        - Return ONLY a JSON array with keys: question, options (array), answer (actual option text)
+       
+        Example format (in {language}):
+        [
+          {{
+            "question": "[Question text in {language}]",
+            "options": ["[Option 1 in {language}]", "[Option 2 in {language}]", "[Option 3 in {language}]", "[Option 4 in {language}]"],
+            "answer": "[Correct option text in {language}]"
+          }}
+        ]
+        """
+
+    return prompt
+
+async def _iter_questions(questions: Awaitable[List[dict]]) -> AsyncIterator[dict]:
+    for question in await questions:
+        yield question
+
+def stream_quiz_questions(subtopic: str, difficulty: str, language: str, count: int = QUIZ_SIZE) -> AsyncIterator[dict]:
+    """Yield validated quick-practice questions as the LLM produces them"""
+    if _translated_language(language):
+        # Translations arrive a batch at a time, so there is nothing to stream token by token
+        return _iter_questions(generate_quiz_questions(subtopic, difficulty, language, count))
+    return _stream_questions(
+        "quiz", _quiz_prompt(subtopic, difficulty, language, count), _validate_quiz_question, QUIZ_RESPONSE_FORMAT
+    )
+
+async def generate_quiz_questions(subtopic: str, difficulty: str, language: str, count: int = QUIZ_SIZE) -> List[dict]:
+    """Ask the LLM for a quick-practice batch and return the validated questions"""
+    if _translated_language(language):
+        canonical = await _canonical_questions(
+            QUICK, subtopic, difficulty, count,
+            lambda: generate_quiz_questions(subtopic, difficulty, CANONICAL_LANGUAGE, count)
+        )
+        return await translator.translate(QUICK, canonical, language)
+    return await _generate_validated(
+        "quiz",
+        lambda n: _quiz_prompt(subtopic, difficulty, language, n),
+        _validate_quiz_question,
+        count,
+        QUIZ_RESPONSE_FORMAT
+    )
+
+def _mock_prompt(
+    class_name: str,
+    subject: str,
+    chapter: str,
+    difficulty: str,
+    language: str,
+    num_questions: int,
+    shard: Optional[Tuple[int, int]] = None
+) -> str:
+    """Prompt for a mock-test batch"""
+    # Get language instruction
+    language_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["English"])
+
+    # Shards of one test are generated in parallel; steer them towards different concepts
+    shard_instruction = ""
+    if shard is not None:
+        shard_instruction = f"This is question set {shard[0]} of {shard[1]} for this chapter. Cover concepts the other sets are unlikely to repeat."
+
+    prompt = f"""
+        Generate {num_questions} multiple-choice questions for "{chapter}" in {subject} for class {class_name}.
+        Difficulty: {difficulty}.
+        {language_instruction}
+        {shard_instruction}
+       
+        IMPORTANT INSTRUCTIONS:
+        - ALL questions, options, and content MUST be in {language} language only.
+        - Do NOT mix English with the target language.
+        - Use proper script for the selected language.
+       
+        FORMAT REQUIREMENTS:
+        - Each question must have exactly 4 options as a JSON object {{"A": "option text", "B": "another option", "C": "third option", "D": "fourth option"}}.
+        - The answer must be the label "A", "B", "C", or "D".
+        - Return ONLY a JSON array of objects with keys: question, options, answer.
+       
+        Example format (in {language}):
+        [
+          {{
+            "question": "[Question text in {language}]",
+            "options": {{
+              "A": "[Option A in {language}]",
+              "B": "[Option B in {language}]",
+              "C": "[Option C in {language}]",
+              "D": "[Option D in {language}]"
+            }},
+            "answer": "C"
+          }}
+        ]
+        """
+
+    return prompt
+
+async def generate_mock_questions(
+    class_name: str,
+    subject: str,
+    chapter: str,
+    difficulty: str,
+    language: str,
+    num_questions: int,
+    shard: Optional[Tuple[int, int]] = None
+) -> List[dict]:
+    """Ask the LLM for a mock-test batch and return the validated questions"""
+    if _translated_language(language):
+        canonical = await generate_mock_questions(
+            class_name, subject, chapter, difficulty, CANONICAL_LANGUAGE, num_questions, shard
+        )
+        return await translator.translate(MOCK, canonical, language)
+    logger.info(f"Sending prompt to AI for chapter: {chapter} in {language}")
+    return await _generate_validated(
+        "mock_test",
+        lambda n: _mock_prompt(class_name, subject, chapter, difficulty, language, n, shard),
+        _validate_mock_question,
+        num_questions,
+        MOCK_RESPONSE_FORMAT
+    )
+
+async def generate_mock_questions_sharded(
+    class_name: str,
+    subject: str,
+    chapter: str,
+    difficulty: str,
+    language: str,
+    num_questions: int
+) -> List[dict]:
+    """Generate a mock test as parallel shards of MOCK_SHARD_SIZE questions, retrying only failed shards"""
+    if _translated_language(language):
+        canonical = await _canonical_questions(
+            MOCK, mock_scope(class_name, subject, chapter), difficulty, num_questions,
+            lambda: generate_mock_questions_sharded(class_name, subject, chapter, difficulty, CANONICAL_LANGUAGE, num_questions)
+        )
+        questions = await translator.translate(MOCK, canonical, language)
+        if not questions:
+            raise ValueError(f"Could not translate mock test questions into {language}")
+        return questions
+
+    sizes = [MOCK_SHARD_SIZE] * (num_questions // MOCK_SHARD_SIZE)
+    if num_questions % MOCK_SHARD_SIZE:
+        sizes.append(num_questions % MOCK_SHARD_SIZE)
+    pending = list(enumerate(sizes, start=1))
+    in_flight = asyncio.Semaphore(MOCK_SHARD_CONCURRENCY)
+
+    async def shard(index: int, size: int) -> List[dict]:
+        async with in_flight:
+            return await generate_mock_questions(
+                class_name, subject, chapter, difficulty, language, size, shard=(index, len(sizes))
+            )
+
+    questions = []
+    last_error = None
+    for attempt in range(MOCK_SHARD_RETRIES + 1):
+        results = await asyncio.gather(
+            *(shard(index, size) for index, size in pending),
+            return_exceptions=True
+        )
+        failed = []
+        for (index, size), result in zip(pending, results):
+            if isinstance(result, Exception) or not result:
+                last_error = result if isinstance(result, Exception) else ValueError("empty shard")
+                logger.warning(f"Mock test shard {index}/{len(sizes)} for {chapter} failed (attempt {attempt + 1}): {last_error}")
+                failed.append((index, size))
+            else:
+                questions.extend(result)
+        if not failed:
+            break
+        pending = failed
+
+    if not questions:
+        raise ValueError(f"All mock test shards failed: {last_error}")
+    logger.info(f"Generated {len(questions)} mock test questions for {chapter} in {len(sizes)} shards")
+    return questions
+
+# -------------------------------
+# Multilingual pipeline
+# -------------------------------
+prompts.register(
+    "question_translation",
+    system="""
+    You translate multiple-choice questions for school students from English into another language.
+    Translate each question and each of its 4 options faithfully and naturally for students, keeping
+    numbers, formulas, units and proper nouns accurate. Keep the options in exactly the same order and
+    keep every option distinct. Do not add, drop, merge or reorder items, and do not answer the questions.
+    Return ONLY a JSON array with one object per input item, in the same order, each with the keys:
+    id (copied unchanged), question (translated), options (array of the 4 translated options).
+    """,
+    user="""
+    Target language: {language}. {language_instruction}
+
+    Questions:
+    {items}
+    """,
+    max_input_tokens=PROMPT_BUDGETS["question_translation"],
+)
+
+async def _translate_question_batch(items: List[dict], language: str) -> str:
+    prompt = prompts.render(
+        "question_translation",
+        language=language,
+        language_instruction=LANGUAGE_INSTRUCTIONS[language],
+        items=json.dumps(items, ensure_ascii=False),
+    )
+    return await llm_complete("translation", prompt.messages, 0.2)
+
+translator = QuestionTranslator(
+    _translate_question_batch,
+    response_cache,
+    ttl=CACHE_TTLS["translation"],
+    batch_size=TRANSLATION_BATCH_SIZE,
+    concurrency=TRANSLATION_CONCURRENCY,
+)
+
+def _translated_language(language: str) -> bool:
+    """True if questions in ``language`` come from translating the canonical set"""
+    return TRANSLATION_PIPELINE_ENABLED and language != CANONICAL_LANGUAGE and language in LANGUAGE_INSTRUCTIONS
+
+async def _canonical_questions(
+    kind: str, scope: str, difficulty: str, count: int, generate: Callable[[], Awaitable[List[dict]]]
+) -> List[dict]:
+    """Canonical-language questions to translate: from the question bank when it covers the scope, else generated
+
+    Concurrent requests for the same scope in different languages share one generation.
+    """
+    if question_bank is not None:
+        stored = question_bank.take(kind, scope, difficulty, CANONICAL_LANGUAGE, count)
+        if stored is not None:
+            return stored
+    return await inflight.do(("canonical", kind, scope, difficulty, count), generate)
+
+async def _fill_unique(questions: List[dict], needed: int, dedupe: NearDuplicateFilter, generate_more) -> List[dict]:
+    """Drop near-duplicates of the student's history and of each other, regenerating only the shortfall"""
+    unique = [q for q in questions if dedupe.add(q["question"])]
+    rounds = 0
+    while len(unique) < needed and rounds < DEDUPE_TOP_UP_ROUNDS:
+        rounds += 1
+        shortfall = needed - len(unique)
+        logger.info(f"Regenerating {shortfall} questions after near-duplicate filtering (round {rounds})")
+        try:
+            extra = await generate_more(shortfall)
+        except Exception as e:
+            logger.error(f"Top-up generation failed: {e}")
+            break
+        unique.extend(q for q in extra if dedupe.add(q["question"]))
+    return unique[:needed]
+
+def get_fallback_mock_test(chapter: str, difficulty: str, language: str) -> List[dict]:
+    """Fallback quiz questions in mock-test form (lettered options) for when upstream is unavailable"""
+    labels = ["A", "B", "C", "D"]
+    questions = []
+    for q in get_fallback_quiz(chapter, difficulty, language)["quiz"]:
+        questions.append({
+            "question": q["question"],
+            "options": dict(zip(labels, q["options"])),
+            "answer": labels[q["options"].index(q["answer"])]
+        })
+    return _shuffle_mock_options(questions)
+
+# -------------------------------
+# Warm question pools
+# -------------------------------
+QUESTION_POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "true").lower() == "true"
+QUESTION_POOL_REFILL_CONCURRENCY = int(os.getenv("QUESTION_POOL_REFILL_CONCURRENCY", "4"))
+QUESTION_POOL_MAX_AGE = float(os.getenv("QUESTION_POOL_MAX_AGE", "21600"))
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", "30"))
+QUIZ_POOL_LOW_WATER = int(os.getenv("QUIZ_POOL_LOW_WATER", "10"))
+MOCK_POOL_SIZE = int(os.getenv("MOCK_POOL_SIZE", "100"))
+MOCK_POOL_LOW_WATER = int(os.getenv("MOCK_POOL_LOW_WATER", "50"))
+
+# Pools are shared by all students; per-student repeats are filtered when questions are taken.
+# Only curriculum subtopics/chapters and supported languages get a bucket, so arbitrary
+# client strings cannot grow the pools or trigger background refills.
+def _quiz_poolable(subtopic: str, language: str) -> bool:
+    return subtopic in CURRICULUM.subtopic_to_chapters and language in LANGUAGE_INSTRUCTIONS
+
+def _mock_poolable(language: str) -> bool:
+    # The chapter is validated against the curriculum before the pool is consulted
+    return language in LANGUAGE_INSTRUCTIONS
+
+async def _refill_quiz_bucket(key) -> List[dict]:
+    _, subtopic, difficulty, language = key
+    async with _admission_for(DEFAULT_MODEL).slot("background"):
+        return await generate_quiz_questions(subtopic, difficulty, language)
+
+async def _refill_mock_bucket(key) -> List[dict]:
+    _, class_name, subject, chapter, difficulty, language = key
+    shards = -(-MOCK_TEST_SIZE // MOCK_SHARD_SIZE)
+    async with _admission_for(DEFAULT_MODEL).slot("background", weight=shards):
+        return await generate_mock_questions_sharded(class_name, subject, chapter, difficulty, language, MOCK_TEST_SIZE)
+
+quiz_pool = QuestionPool(
+    "quiz",
+    _refill_quiz_bucket,
+    capacity=QUIZ_POOL_SIZE,
+    low_water=QUIZ_POOL_LOW_WATER,
+    refill_concurrency=QUESTION_POOL_REFILL_CONCURRENCY,
+    max_age=QUESTION_POOL_MAX_AGE,
+)
+mock_pool = QuestionPool(
+    "mock_test",
+    _refill_mock_bucket,
+    capacity=MOCK_POOL_SIZE,
+    low_water=MOCK_POOL_LOW_WATER,
+    refill_concurrency=QUESTION_POOL_REFILL_CONCURRENCY,
+    max_age=QUESTION_POOL_MAX_AGE,
+)
+
+# Offline-built question bank (see build_question_bank.py); served before the pools when present
+QUESTION_BANK_PATH = os.getenv(
+    "QUESTION_BANK_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_bank.sqlite3")
+)
+question_bank = QuestionBank.open_if_exists(QUESTION_BANK_PATH)
+if question_bank is not None:
+    logger.info(f"Serving pre-generated questions from {QUESTION_BANK_PATH}")
+
+@app.on_event("shutdown")
+async def close_question_pools():
+    await quiz_pool.aclose()
+    await mock_pool.aclose()
+    if question_bank is not None:
+        question_bank.close()
+
+@app.get("/pool/stats")
+def get_pool_stats():
+    return JSONResponse(content={
+        "enabled": QUESTION_POOL_ENABLED,
+        "quiz": quiz_pool.stats(),
+        "mock_test": mock_pool.stats(),
+        "question_bank": question_bank.stats() if question_bank is not None else None,
+        "seen_questions": seen_store.stats()
+    })
+
+# -------------------------------
+# Metrics endpoint
+# -------------------------------
+# Figures kept elsewhere are read at scrape time only
+metrics_registry.callback(
+    "ai_backend_llm_in_flight", "Upstream LLM calls currently in flight", "gauge",
+    lambda: client.in_flight if client is not None else 0,
+)
+metrics_registry.callback(
+    "ai_backend_admission_in_flight", "Admitted units of upstream work per model", "gauge",
+    lambda: {(model,): controller.in_flight for model, controller in admission.items()}, ("model",),
+)
+metrics_registry.callback(
+    "ai_backend_admission_queue_depth", "Requests waiting for admission per model and priority", "gauge",
+    lambda: {
+        (model, priority): depth
+        for model, controller in admission.items()
+        for priority, depth in controller.stats()["queue_depth"].items()
+    },
+    ("model", "priority"),
+)
+metrics_registry.callback(
+    "ai_backend_admission_rejected_total", "Requests rejected by admission control", "counter",
+    lambda: {
+        (model, reason): count
+        for model, controller in admission.items()
+        for reason, count in controller.rejected.items()
+    },
+    ("model", "reason"),
+)
+metrics_registry.callback(
+    "ai_backend_circuit_open", "1 while the model's circuit breaker is open", "gauge",
+    lambda: {(model,): int(breaker.is_open()) for model, breaker in breakers.items()}, ("model",),
+)
+metrics_registry.callback(
+    "ai_backend_single_flight_in_flight", "Distinct coalesced generations in flight", "gauge",
+    lambda: inflight.stats()["in_flight"],
+)
+metrics_registry.callback(
+    "ai_backend_generation_questions_total",
+    "Generated questions: requested, usable, malformed and invalid (dropped by validation), missing (shortfall)",
+    "counter",
+    lambda: {(kind,): generation_stats[kind] for kind in ("requested", "usable", "malformed", "invalid", "missing")},
+    ("kind",),
+)
+metrics_registry.callback(
+    "ai_backend_generation_repair_requests_total", "Follow-up calls made to replace dropped questions", "counter",
+    lambda: generation_stats["repair_requests"],
+)
+metrics_registry.callback(
+    "ai_backend_response_cache_lookups_total", "Response cache lookups by result", "counter",
+    lambda: {
+        ("local_hit",): response_cache.local_hits,
+        ("redis_hit",): response_cache.redis_hits,
+        ("miss",): response_cache.misses,
+    },
+    ("result",),
+)
+metrics_registry.callback(
+    "ai_backend_question_pool_lookups_total", "Question pool lookups by pool and result", "counter",
+    lambda: {
+        key: value
+        for name, pool in (("quiz", quiz_pool), ("mock_test", mock_pool))
+        for key, value in (((name, "hit"), pool.hits), ((name, "miss"), pool.misses))
+    },
+    ("pool", "result"),
+)
+metrics_registry.callback(
+    "ai_backend_question_pool_refills_in_progress", "Background pool refills running", "gauge",
+    lambda: {("quiz",): quiz_pool.stats()["refills_in_progress"], ("mock_test",): mock_pool.stats()["refills_in_progress"]},
+    ("pool",),
+)
+metrics_registry.callback(
+    "ai_backend_question_bank_lookups_total", "Question bank lookups by result", "counter",
+    lambda: {("hit",): question_bank.hits, ("miss",): question_bank.misses} if question_bank is not None else {},
+    ("result",),
+)
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # -------------------------------
 # Quick Practice Endpoints
 # -------------------------------
@@ -1520,159 +2647,208 @@ def quick_practice():
 @app.get("/classes")
 def get_classes():
     logger.info("Fetching available classes")
-    return JSONResponse(content={"classes": list(CHAPTERS_DETAILED.keys())})
+    return Response(content=CURRICULUM.quick_classes_body, media_type="application/json")
 
 @app.get("/chapters")
 def get_subjects(class_name: str):
     logger.info(f"Fetching subjects for class: {class_name}")
-    subjects = CHAPTERS_DETAILED.get(class_name)
-    if not subjects:
+    body = CURRICULUM.quick_subjects_body.get(class_name)
+    if body is None:
         logger.error(f"Invalid class: {class_name}")
         raise HTTPException(status_code=400, detail="Invalid class")
-    return JSONResponse(content={"chapters": list(subjects.keys())})
+    return Response(content=body, media_type="application/json")
 
 @app.get("/subtopics")
 def get_subtopics(class_name: str, subject: str):
     logger.info(f"Fetching subtopics for class: {class_name}, subject: {subject}")
-    subjects = CHAPTERS_DETAILED.get(class_name)
-    if not subjects or subject not in subjects:
+    body = CURRICULUM.quick_subtopics_body.get((class_name, subject))
+    if body is None:
         logger.error(f"Invalid subject: {subject} or class: {class_name}")
         raise HTTPException(status_code=400, detail="Invalid subject or class")
-    subtopics = subjects[subject]
-    return JSONResponse(content={"subtopics": subtopics})
+    return Response(content=body, media_type="application/json")
+
+@app.get("/catalog")
+def get_catalog(request: Request):
+    """Whole curriculum tree (quick practice and mock test) as one cacheable, ETag'd bundle"""
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    etag = CURRICULUM.catalog_gzip_etag if use_gzip else CURRICULUM.catalog_etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=300",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=CURRICULUM.catalog_gzip, media_type="application/json", headers=headers)
+    return Response(content=CURRICULUM.catalog_body, media_type="application/json", headers=headers)
+
+async def _stream_quiz(
+    subtopic: str,
+    difficulty: str,
+    language: str,
+    current_level: int,
+    pooled: Optional[List[dict]],
+    pooled_source: str,
+    dedupe: NearDuplicateFilter,
+    student_id: str,
+    retry: bool,
+    requester: Optional[str]
+) -> StreamingResponse:
+    """Stream a quiz as SSE: one ``question`` event per question as soon as it is ready, then ``done``"""
+    ticket = None
+    if pooled is None and client is not None:
+        ticket = await _admission_for(DEFAULT_MODEL).acquire("generation", requester)
+
+    async def event_stream():
+        started = time.perf_counter()
+        served = []
+        fallback_quiz = []
+        source = pooled_source if pooled is not None else "ai"
+        try:
+            if pooled is not None:
+                for q in _shuffle_quiz(pooled):
+                    served.append(q)
+                    yield _sse_event("question", q)
+            else:
+                if client is None:
+                    raise RuntimeError("OpenAI client not available")
+                async for q in stream_quiz_questions(subtopic, difficulty, language):
+                    if len(served) < QUIZ_SIZE and dedupe.add(q["question"]):
+                        q = _shuffle_quiz([q])[0]
+                        served.append(q)
+                        yield _sse_event("question", q)
+                if len(served) < QUIZ_SIZE:
+                    extra = await _fill_unique(
+                        [], QUIZ_SIZE - len(served), dedupe,
+                        lambda n: generate_quiz_questions(subtopic, difficulty, language, n)
+                    )
+                    for q in _shuffle_quiz(extra):
+                        served.append(q)
+                        yield _sse_event("question", q)
+        except Exception as e:
+            logger.error(f"Error while streaming quiz: {str(e)}")
+            if not served:
+                source = "fallback"
+                fallback_responses.inc("quiz")
+                fallback_quiz = get_fallback_quiz(subtopic, difficulty, language)["quiz"]
+                for q in fallback_quiz:
+                    yield _sse_event("question", q)
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+        if served and not retry:
+            await seen_store.record_attempt(student_id, "quick", subtopic, [q["question"] for q in served])
+
+        yield _sse_event("done", {
+            "success": True,
+            "currentLevel": current_level,
+            "count": len(fallback_quiz) if source == "fallback" else len(served),
+            "source": source,
+            "total_ms": round((time.perf_counter() - started) * 1000)
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(ticket.release) if ticket is not None else None
+    )
 
 @app.get("/quiz")
-def get_quiz(
+async def get_quiz(
+    http_request: Request,
     subtopic: str,
     retry: bool = False,
     currentLevel: int = None,
-    language: str = "English"
+    language: str = "English",
+    student_id: Optional[str] = None,
+    stream: bool = False
 ):
     try:
-        previous = PREVIOUS_QUESTIONS_QUICK.get(subtopic, []) if not retry else []
+        requester = _requester(student_id, http_request)
+        student_id = student_id or ANONYMOUS_STUDENT
+        if retry:
+            seen, attempts = set(), 0
+        else:
+            seen, attempts = await seen_store.history(student_id, "quick", subtopic)
+        dedupe = NearDuplicateFilter.from_fingerprints(seen, NEAR_DUPLICATE_THRESHOLD)
 
         # Use the level from frontend if provided
         if currentLevel is not None:
             current_level = currentLevel
         else:
-            # fallback if frontend doesn't provide level
-            num_prev = len(previous)
-            if num_prev == 0:
-                current_level = 1
-            elif num_prev == 1:
-                current_level = 2
-            else:
-                current_level = 3
+            # fallback if frontend doesn't provide level: the student's own attempt count
+            current_level = _level_for_attempts(attempts)
 
         difficulty_map = {1: "simple", 2: "medium", 3: "hard"}
         difficulty = difficulty_map.get(current_level, "simple")
 
         logger.info(f"Generating quiz for subtopic: {subtopic}, difficulty: {difficulty}, retry: {retry}, level: {current_level}, language: {language}")
-       
-        # Get language instruction
-        language_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["English"])
 
-        prompt = f"""
-        Generate 10 multiple-choice questions for "{subtopic}".
-        Difficulty: {difficulty}.
-        {language_instruction}
-       
-        IMPORTANT INSTRUCTIONS:
-        - ALL questions, options, and content MUST be in {language} language only.
-        - Do NOT mix English with the target language.
-        - Use proper script for the selected language.
-        - Avoid repeating these questions: {previous}.
-       
-        IMPORTANT FORMAT REQUIREMENTS:
-        - Each question should have exactly 4 options as an array: ["option1", "option2", "option3", "option4"]
-        - The answer should be the actual text of the correct option, NOT a letter
-        - Return ONLY a JSON array with keys: question, options (array), answer (actual option text)
-       
-        Example format (in {language}):
-        [
-          {{
-            "question": "[Question text in {language}]",
-            "options": ["[Option 1 in {language}]", "[Option 2 in {language}]", "[Option 3 in {language}]", "[Option 4 in {language}]"],
-            "answer": "[Correct option text in {language}]"
-          }}
-        ]
-        """
-
-        # Check if client is available
-        if client is None:
-            logger.warning("OpenAI client not available, using fallback quiz")
-            return get_fallback_quiz(subtopic, difficulty, language)
-            
-        try:
-            response = client.chat.completions.create(
-                model="google/gemini-2.0-flash-001",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.9
+        seen_before = lambda q: dedupe.is_duplicate(q["question"])
+        upstream_down = _breaker_for(DEFAULT_MODEL).is_open()
+        processed_quiz = None
+        source = "bank"
+        if question_bank is not None:
+            processed_quiz = question_bank.take(QUICK, subtopic, difficulty, language, QUIZ_SIZE, exclude=seen_before)
+            if processed_quiz is None and upstream_down:
+                # Upstream is failing: stored questions the student may have seen beat waiting on it
+                processed_quiz = question_bank.take(QUICK, subtopic, difficulty, language, QUIZ_SIZE)
+        if processed_quiz is None and QUESTION_POOL_ENABLED and _quiz_poolable(subtopic, language):
+            source = "pool"
+            pool_key = ("quiz", subtopic, difficulty, language)
+            processed_quiz = quiz_pool.take(pool_key, QUIZ_SIZE, exclude=seen_before)
+            if processed_quiz is None and upstream_down:
+                processed_quiz = quiz_pool.take(pool_key, QUIZ_SIZE)
+
+        if stream:
+            return await _stream_quiz(
+                subtopic, difficulty, language, current_level, processed_quiz, source, dedupe, student_id, retry, requester
             )
-        except Exception as api_error:
-            logger.error(f"API call failed: {api_error}")
-            # Fallback: Return sample quiz when API is unavailable
-            return get_fallback_quiz(subtopic, difficulty, language)
-
-        message_content = response.choices[0].message.content
-        text = ""
-        if isinstance(message_content, list):
-            for block in message_content:
-                if block.get("type") == "text":
-                    text += block.get("text", "")
-        else:
-            text = str(message_content)
 
-        # Clean up markdown code blocks if present
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:].strip()
-        if text.endswith("```"):
-            text = text[:-3].strip()
+        if processed_quiz is None:
+            # Check if client is available
+            if client is None:
+                logger.warning("OpenAI client not available, using fallback quiz")
+                fallback_responses.inc("quiz")
+                return get_fallback_quiz(subtopic, difficulty, language)
+
+            async def generate():
+                # Coalesced followers share the leader's slot, but not its rejection
+                async with _admission_for(DEFAULT_MODEL).slot("generation", requester):
+                    return await generate_quiz_questions(subtopic, difficulty, language)
+
+            try:
+                if retry:
+                    processed_quiz = await generate()
+                else:
+                    processed_quiz = await inflight.do(
+                        ("quiz", subtopic, difficulty, language), generate, leader_errors=(AdmissionRejected,)
+                    )
+            except (ValueError, AdmissionRejected):
+                raise
+            except Exception as api_error:
+                logger.error(f"API call failed: {api_error}")
+                # Fallback: Return sample quiz when API is unavailable
+                fallback_responses.inc("quiz")
+                return get_fallback_quiz(subtopic, difficulty, language)
+
+        processed_quiz = await _fill_unique(
+            processed_quiz, QUIZ_SIZE, dedupe,
+            lambda n: generate_quiz_questions(subtopic, difficulty, language, n)
+        )
 
-        try:
-            quiz_json = json.loads(text)
-        except json.JSONDecodeError:
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-            if not match:
-                logger.error(f"AI did not return valid JSON: {text[:200]}")
-                raise ValueError(f"AI did not return valid JSON: {text[:200]}")
-            quiz_json = json.loads(match.group(0))
-
-        # Process and validate the quiz
-        processed_quiz = []
-        for q in quiz_json:
-            if not all(key in q for key in ["question", "options", "answer"]):
-                continue
-               
-            # Ensure options is a list with exactly 4 items
-            if not isinstance(q["options"], list) or len(q["options"]) != 4:
-                continue
-               
-            # Ensure the answer exists in the options
-            if q["answer"] not in q["options"]:
-                # Try to fix by finding the closest match
-                continue
-               
-            processed_quiz.append(q)
+        # Shuffle the quiz questions and their options
+        processed_quiz = _shuffle_quiz(processed_quiz)
 
-        # Shuffle the quiz questions
-        random.shuffle(processed_quiz)
-       
-        # Shuffle options while preserving correct answer
-        for q in processed_quiz:
-            # Create a mapping of original positions
-            original_options = q["options"].copy()
-            correct_answer = q["answer"]
-           
-            # Shuffle the options
-            random.shuffle(q["options"])
-           
-            # The answer remains the same text, not the position
-            # This ensures the answer is always the correct option text
-           
         if not retry:
-            PREVIOUS_QUESTIONS_QUICK[subtopic] = previous + [q["question"] for q in processed_quiz]
+            await seen_store.record_attempt(student_id, "quick", subtopic, [q["question"] for q in processed_quiz])
 
         logger.info(f"Generated {len(processed_quiz)} questions for subtopic: {subtopic} in {language}")
        
@@ -1681,15 +2857,286 @@ def get_quiz(
             "quiz": processed_quiz
         })
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+# -------------------------------
+# AI Assistant prompt templates
+# -------------------------------
+# The formatting rules are a fixed system prefix (cacheable by the provider);
+# only the per-request values go in the user turn
+prompts.register(
+    "assistant_chat",
+    system="""
+    You are an AI Learning Assistant for school students. Answer the student's question with a helpful, educational response with EXCELLENT STRUCTURE and CHILD-FRIENDLY formatting, for the class, subject and chapter given with the question.
+
+    **CRITICAL FORMATTING RULES:**
+    1. Use CLEAR HEADINGS with emojis
+    2. Use BULLET POINTS and NUMBERED LISTS
+    3. Use SIMPLE LANGUAGE for children
+    4. Add VISUAL SEPARATORS like lines between sections
+    5. Use LARGE FONT indicators for important points
+    6. Include PRACTICAL EXAMPLES
+    7. Add SUMMARY TABLES where helpful
+    8. Use COLOR INDICATORS (🔴 🟢 🔵 🟡)
+
+    **RESPONSE TYPES:**
+
+    1. STUDY PLAN Response Structure:
+       🗓️ WEEKLY STUDY PLAN
+       ───────────────────
+       📅 Day 1: [Topic]
+       • Time: [Duration]
+       • Activities: [List]
+       • Practice: [Specific tasks]
+       ───────────────────
+
+    2. NOTES Response Structure:
+       📚 CHAPTER NOTES
+       ───────────────
+       🔹 Key Concept 1
+       • Definition: [Simple definition]
+       • Example: [Real-world example]
+       • Remember: [Important point]
+       ───────────────
+
+    3. EXPLANATION Response Structure:
+       💡 CONCEPT EXPLANATION
+       ────────────────────
+       🎯 What is it?
+       [Simple definition]
+
+       👀 How it works:
+       [Step-by-step]
+
+       🌍 Real Example:
+       [Child-friendly example]
+       ────────────────────
+
+    4. PRACTICE QUESTIONS Structure:
+       📝 PRACTICE TIME
+       ───────────────
+       🟢 EASY Question:
+       [Question]
+
+       🟡 MEDIUM Question:
+       [Question]
+
+       🔴 CHALLENGE Question:
+       [Question]
+
+       ✅ SOLUTIONS:
+       [Step-by-step solutions]
+       ───────────────
+
+    Make it VISUALLY APPEALING and EASY TO READ for a child!
+    """,
+    user="""
+    Class: {class_level}
+    Subject: {subject}
+    Chapter: {chapter}
+
+    Student's Question: "{student_question}"
+    """,
+    max_input_tokens=PROMPT_BUDGETS["assistant_chat"],
+)
+
+prompts.register(
+    "study_plan",
+    system="""
+    Create a SUPER STRUCTURED and CHILD-FRIENDLY study plan for the student, class, subject, chapter and schedule given.
+
+    **FORMATTING REQUIREMENTS:**
+
+    🗓️ [DAYS]-DAY STUDY PLAN FOR [CHAPTER IN CAPITALS]
+    ═══════════════════════════════════════
+
+    📊 QUICK OVERVIEW:
+    • Total Days: [days]
+    • Daily Study: [hours] hours
+    • Subject: [subject]
+    • Chapter: [chapter]
+
+    📅 DAILY BREAKDOWN (one block for every day):
+    ───────────────────
+
+    DAY 1: [Main Topic]
+    🕐 Time: [Specific time allocation]
+    📚 What to Study:
+    • Topic 1: [Details]
+    • Topic 2: [Details]
+    ✍️ Practice:
+    • [Specific practice tasks]
+    ✅ Check: [Self-check points]
+
+    🎯 WEEKLY GOALS:
+    • Goal 1: [Specific achievement]
+    • Goal 2: [Specific achievement]
+
+    💡 STUDY TIPS:
+    • Tip 1: [Practical tip]
+    • Tip 2: [Practical tip]
+
+    Make it COLORFUL and EASY TO FOLLOW for a child!
+    Use EMOJIS and CLEAR SECTIONS!
+    """,
+    user="""
+    Class: {class_level}
+    Subject: {subject}
+    Chapter: {chapter}
+    Days available: {days_available}
+    Hours per day: {hours_per_day}
+    """,
+    max_input_tokens=PROMPT_BUDGETS["study_plan"],
+)
+
+prompts.register(
+    "notes",
+    system="""
+    Generate SUPER ORGANIZED and CHILD-FRIENDLY study notes for the student, class, subject, chapter and topic given.
+
+    **REQUIRED FORMAT:**
+
+    📚 [CHAPTER IN CAPITALS] - STUDY NOTES
+    ═══════════════════════════
+
+    🎯 CHAPTER AT A GLANCE:
+    • Main Topics: [List 3-4 main topics]
+    • Key Skills: [What they'll learn]
+    • Difficulty: 🟢 Easy / 🟡 Medium / 🔴 Hard
+
+    🔍 KEY CONCEPTS:
+    ─────────────────
+
+    🔹 Concept 1: [Concept Name]
+    • What it is: [Simple definition]
+    • Example: 🌟 [Real example]
+    • Remember: 💡 [Key point]
+    • Formula: 📐 [If applicable]
+
+    🔹 Concept 2: [Concept Name]
+    • What it is: [Simple definition]
+    • Example: 🌟 [Real example]
+    • Remember: 💡 [Key point]
+    • Formula: 📐 [If applicable]
+
+    📋 IMPORTANT POINTS TABLE:
+    ─────────────────────────
+    | Point | Description | Remember |
+    |-------|-------------|----------|
+    | [1] | [Description] | [Memory tip] |
+    | [2] | [Description] | [Memory tip] |
+
+    💪 PRACTICE READY:
+    • Quick Questions: [2-3 simple questions]
+    • Think About: [1 critical thinking question]
+
+    📝 SUMMARY:
+    • Main Idea 1: [Summary point]
+    • Main Idea 2: [Summary point]
+    • Main Idea 3: [Summary point]
+
+    Use LOTS OF EMOJIS, CLEAR SECTIONS, and CHILD-FRIENDLY LANGUAGE!
+    Make it VISUALLY APPEALING!
+    """,
+    user="""
+    Class: {class_level}
+    Subject: {subject}
+    Chapter: {chapter}
+    {topic}
+    """,
+    max_input_tokens=PROMPT_BUDGETS["notes"],
+)
+
+def _history_messages(chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Prior turns as chat messages; entries without a user/assistant role or text are skipped"""
+    return [
+        {"role": turn["role"], "content": turn["content"]}
+        for turn in chat_history
+        if turn.get("role") in ("user", "assistant") and turn.get("content")
+    ]
+
+# -------------------------------
+# Conversation memory
+# -------------------------------
+prompts.register(
+    "conversation_summary",
+    system="""
+    You maintain the running summary of a tutoring conversation between a school student and an AI tutor.
+    Merge the new messages into the current summary. Keep what the student asked, what was explained,
+    where they struggled and anything they said about themselves or their goals. Drop greetings and formatting.
+    Reply with the updated summary only, in plain sentences, in at most 150 words, in the conversation's language.
+    """,
+    user="""
+    Current summary:
+    {summary}
+
+    New messages:
+    {messages}
+    """,
+    max_input_tokens=PROMPT_BUDGETS["conversation_summary"],
+)
+
+async def _summarize_conversation(summary: str, messages: List[Dict[str, str]]) -> str:
+    prompt = prompts.render(
+        "conversation_summary",
+        summary=summary or "(none yet)",
+        messages="\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages),
+    )
+    async with _admission_for(DEFAULT_MODEL).slot("background"):
+        return await llm_complete("summary", prompt.messages, 0.2)
+
+conversation_memory = ConversationMemory(
+    _summarize_conversation,
+    redis_url=os.getenv("REDIS_URL"),
+    keep_messages=CHAT_MEMORY_MESSAGES,
+    ttl=CHAT_MEMORY_TTL,
+)
+
+async def _conversation_context(
+    namespace: str, session_id: Optional[str], chat_history: Optional[List[Dict[str, str]]], max_tokens: int
+) -> List[Dict[str, str]]:
+    """Prior context for a chat turn, within ``max_tokens``
+
+    With a session: its summary and recent messages.  Without one: the
+    client's own history, keeping as many of the latest messages as fit.
+    """
+    history = _history_messages(chat_history or [])
+    if not session_id:
+        return fit_history(history, max_tokens)
+    summary, recent = await conversation_memory.context(f"{namespace}:{session_id}", seed=history)
+    if summary:
+        recent = [{"role": "system", "content": f"Summary of the conversation so far: {summary}"}] + recent
+    return fit_history(recent, max_tokens)
+
+async def _remember_turn(namespace: str, session_id: Optional[str], question: str, answer: str):
+    if session_id and answer:
+        await conversation_memory.append(
+            f"{namespace}:{session_id}",
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer},
+        )
+
+@app.get("/memory/stats")
+def get_memory_stats():
+    return JSONResponse(content=conversation_memory.stats())
+
+@app.on_event("shutdown")
+async def close_conversation_memory():
+    await conversation_memory.aclose()
+
+@app.get("/prompts/stats")
+def get_prompt_stats():
+    return JSONResponse(content=prompts.stats())
+
 # -------------------------------
 # AI Assistant Endpoints
 # -------------------------------
 @app.post("/ai-assistant/chat")
-async def ai_assistant_chat(request: ChatRequest):
+async def ai_assistant_chat(request: ChatRequest, http_request: Request):
     try:
         class_level = request.class_level
         subject = request.subject
@@ -1697,102 +3144,41 @@ async def ai_assistant_chat(request: ChatRequest):
         student_question = request.student_question
         chat_history = request.chat_history or []
        
-        # Get language preference
-        language = "English"
-       
-        # Enhanced prompt with better formatting instructions
-        prompt = f"""
-        You are an AI Learning Assistant for a {class_level} student studying {subject}, specifically chapter: {chapter}.
-       
-        Student's Question: "{student_question}"
-       
-        Previous conversation context: {chat_history[-5:] if chat_history else "No previous context"}
-       
-        Based on the student's question, provide a helpful, educational response with EXCELLENT STRUCTURE and CHILD-FRIENDLY formatting.
-       
-        **CRITICAL FORMATTING RULES:**
-        1. Use CLEAR HEADINGS with emojis
-        2. Use BULLET POINTS and NUMBERED LISTS
-        3. Use SIMPLE LANGUAGE for children
-        4. Add VISUAL SEPARATORS like lines between sections
-        5. Use LARGE FONT indicators for important points
-        6. Include PRACTICAL EXAMPLES
-        7. Add SUMMARY TABLES where helpful
-        8. Use COLOR INDICATORS (🔴 🟢 🔵 🟡)
-       
-        **RESPONSE TYPES:**
-       
-        1. STUDY PLAN Response Structure:
-           🗓️ WEEKLY STUDY PLAN
-           ───────────────────
-           📅 Day 1: [Topic]
-           • Time: [Duration]
-           • Activities: [List]
-           • Practice: [Specific tasks]
-           ───────────────────
-           
-        2. NOTES Response Structure:
-           📚 CHAPTER NOTES
-           ───────────────
-           🔹 Key Concept 1
-           • Definition: [Simple definition]
-           • Example: [Real-world example]
-           • Remember: [Important point]
-           ───────────────
-           
-        3. EXPLANATION Response Structure:
-           💡 CONCEPT EXPLANATION
-           ────────────────────
-           🎯 What is it?
-           [Simple definition]
-           
-           👀 How it works:
-           [Step-by-step]
-           
-           🌍 Real Example:
-           [Child-friendly example]
-           ────────────────────
-           
-        4. PRACTICE QUESTIONS Structure:
-           📝 PRACTICE TIME
-           ───────────────
-           🟢 EASY Question:
-           [Question]
-           
-           🟡 MEDIUM Question:
-           [Question]
-           
-           🔴 CHALLENGE Question:
-           [Question]
-           
-           ✅ SOLUTIONS:
-           [Step-by-step solutions]
-           ───────────────
-       
-        Make it VISUALLY APPEALING and EASY TO READ for a child!
-        """
-       
-        response = client.chat.completions.create(
-            model="google/gemini-2.0-flash-001",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        prompt_values = dict(
+            class_level=class_level,
+            subject=subject,
+            chapter=chapter,
+            student_question=student_question,
+        )
+        history_budget = prompts.get("assistant_chat").history_budget(**prompt_values)
+        prompt = prompts.render(
+            "assistant_chat",
+            history=await _conversation_context("assistant", request.session_id, chat_history, history_budget),
+            **prompt_values,
         )
+
+        if request.stream:
+            return await _stream_completion(
+                prompt, 0.7, {"type": _classify_question_type(student_question)},
+                namespace="chat", no_cache=request.no_cache,
+                requester=_requester(request.student_id, http_request),
+                on_complete=lambda text: _remember_turn("assistant", request.session_id, student_question, text)
+            )
        
-        message_content = response.choices[0].message.content
-        text = ""
-        if isinstance(message_content, list):
-            for block in message_content:
-                if block.get("type") == "text":
-                    text += block.get("text", "")
-        else:
-            text = str(message_content)
+        text, cached = await _cached_completion(
+            "chat", prompt, 0.7, no_cache=request.no_cache, requester=_requester(request.student_id, http_request)
+        )
+        await _remember_turn("assistant", request.session_id, student_question, text)
        
         return JSONResponse(content={
             "success": True,
             "response": text,
-            "type": _classify_question_type(student_question)
+            "type": _classify_question_type(student_question),
+            "cached": cached
         })
        
+    except (AdmissionRejected, PromptBudgetExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error in AI assistant: {str(e)}")
         return JSONResponse(content={
@@ -1802,7 +3188,7 @@ async def ai_assistant_chat(request: ChatRequest):
         }, status_code=500)
 
 @app.post("/ai-assistant/generate-study-plan")
-async def generate_study_plan(request: StudyPlanRequest):
+async def generate_study_plan(request: StudyPlanRequest, http_request: Request):
     """Generate a detailed study plan for a specific chapter"""
     try:
         class_level = request.class_level
@@ -1810,68 +3196,35 @@ async def generate_study_plan(request: StudyPlanRequest):
         chapter = request.chapter
         days_available = request.days_available
         hours_per_day = request.hours_per_day
-       
-        prompt = f"""
-        Create a SUPER STRUCTURED and CHILD-FRIENDLY {days_available}-day study plan for a {class_level} student studying {subject}, chapter: {chapter}.
-       
-        **FORMATTING REQUIREMENTS:**
-       
-        🗓️ {days_available}-DAY STUDY PLAN FOR {chapter.upper()}
-        ═══════════════════════════════════════
-       
-        📊 QUICK OVERVIEW:
-        • Total Days: {days_available}
-        • Daily Study: {hours_per_day} hours
-        • Subject: {subject}
-        • Chapter: {chapter}
-       
-        📅 DAILY BREAKDOWN:
-        ───────────────────
-       
-        DAY 1: [Main Topic]
-        🕐 Time: [Specific time allocation]
-        📚 What to Study:
-        • Topic 1: [Details]
-        • Topic 2: [Details]
-        ✍️ Practice:
-        • [Specific practice tasks]
-        ✅ Check: [Self-check points]
-       
-        DAY 2: [Main Topic]
-        🕐 Time: [Specific time allocation]
-        📚 What to Study:
-        • Topic 1: [Details]
-        • Topic 2: [Details]
-        ✍️ Practice:
-        • [Specific practice tasks]
-        ✅ Check: [Self-check points]
-       
-        🎯 WEEKLY GOALS:
-        • Goal 1: [Specific achievement]
-        • Goal 2: [Specific achievement]
-       
-        💡 STUDY TIPS:
-        • Tip 1: [Practical tip]
-        • Tip 2: [Practical tip]
-       
-        Make it COLORFUL and EASY TO FOLLOW for a child!
-        Use EMOJIS and CLEAR SECTIONS!
-        """
-       
-        response = client.chat.completions.create(
-            model="google/gemini-2.0-flash-001",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+
+        prompt = prompts.render(
+            "study_plan",
+            class_level=class_level,
+            subject=subject,
+            chapter=chapter,
+            days_available=days_available,
+            hours_per_day=hours_per_day,
         )
+
+        if request.stream:
+            return await _stream_completion(
+                prompt, 0.7, {"type": "study_plan", "chapter": chapter, "days_available": days_available},
+                namespace="study_plan", no_cache=request.no_cache,
+                requester=_requester(request.student_id, http_request)
+            )
        
-        message_content = response.choices[0].message.content
-        text = str(message_content) if not isinstance(message_content, list) else message_content[0].get("text", "")
+        text, cached = await _cached_completion(
+            "study_plan", prompt, 0.7, no_cache=request.no_cache, requester=_requester(request.student_id, http_request)
+        )
        
         return JSONResponse(content={
             "success": True,
-            "study_plan": text
+            "study_plan": text,
+            "cached": cached
         })
        
+    except (AdmissionRejected, PromptBudgetExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error generating study plan: {str(e)}")
         return JSONResponse(content={
@@ -1880,78 +3233,41 @@ async def generate_study_plan(request: StudyPlanRequest):
         }, status_code=500)
 
 @app.post("/ai-assistant/generate-notes")
-async def generate_notes(request: NotesRequest):
+async def generate_notes(request: NotesRequest, http_request: Request):
     """Generate comprehensive notes for a chapter or specific topic"""
     try:
         class_level = request.class_level
         subject = request.subject
         chapter = request.chapter
         specific_topic = request.specific_topic
-       
-        topic_specific = f" on {specific_topic}" if specific_topic else ""
-       
-        prompt = f"""
-        Generate SUPER ORGANIZED and CHILD-FRIENDLY study notes for a {class_level} student studying {subject}, chapter: {chapter}{topic_specific}.
-       
-        **REQUIRED FORMAT:**
-       
-        📚 {chapter.upper()} - STUDY NOTES
-        ═══════════════════════════
-       
-        🎯 CHAPTER AT A GLANCE:
-        • Main Topics: [List 3-4 main topics]
-        • Key Skills: [What they'll learn]
-        • Difficulty: 🟢 Easy / 🟡 Medium / 🔴 Hard
-       
-        🔍 KEY CONCEPTS:
-        ─────────────────
-       
-        🔹 Concept 1: [Concept Name]
-        • What it is: [Simple definition]
-        • Example: 🌟 [Real example]
-        • Remember: 💡 [Key point]
-        • Formula: 📐 [If applicable]
-       
-        🔹 Concept 2: [Concept Name]
-        • What it is: [Simple definition]
-        • Example: 🌟 [Real example]
-        • Remember: 💡 [Key point]
-        • Formula: 📐 [If applicable]
-       
-        📋 IMPORTANT POINTS TABLE:
-        ─────────────────────────
-        | Point | Description | Remember |
-        |-------|-------------|----------|
-        | [1] | [Description] | [Memory tip] |
-        | [2] | [Description] | [Memory tip] |
-       
-        💪 PRACTICE READY:
-        • Quick Questions: [2-3 simple questions]
-        • Think About: [1 critical thinking question]
-       
-        📝 SUMMARY:
-        • Main Idea 1: [Summary point]
-        • Main Idea 2: [Summary point]
-        • Main Idea 3: [Summary point]
-       
-        Use LOTS OF EMOJIS, CLEAR SECTIONS, and CHILD-FRIENDLY LANGUAGE!
-        Make it VISUALLY APPEALING!
-        """
-       
-        response = client.chat.completions.create(
-            model="google/gemini-2.0-flash-001",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+
+        prompt = prompts.render(
+            "notes",
+            class_level=class_level,
+            subject=subject,
+            chapter=chapter,
+            topic=f"Topic: {specific_topic}" if specific_topic else "Topic: the whole chapter",
         )
+
+        if request.stream:
+            return await _stream_completion(
+                prompt, 0.7, {"type": "notes", "chapter": chapter, "specific_topic": specific_topic},
+                namespace="notes", no_cache=request.no_cache,
+                requester=_requester(request.student_id, http_request)
+            )
        
-        message_content = response.choices[0].message.content
-        text = str(message_content) if not isinstance(message_content, list) else message_content[0].get("text", "")
+        text, cached = await _cached_completion(
+            "notes", prompt, 0.7, no_cache=request.no_cache, requester=_requester(request.student_id, http_request)
+        )
        
         return JSONResponse(content={
             "success": True,
-            "notes": text
+            "notes": text,
+            "cached": cached
         })
        
+    except (AdmissionRejected, PromptBudgetExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error generating notes: {str(e)}")
         return JSONResponse(content={
@@ -1965,16 +3281,16 @@ async def generate_notes(request: NotesRequest):
 @app.get("/mock_classes")
 def get_mock_classes():
     logger.info("Fetching available classes for mock test")
-    return JSONResponse(content={"classes": list(CHAPTERS_SIMPLE.keys())})
+    return Response(content=CURRICULUM.mock_classes_body, media_type="application/json")
 
 @app.get("/mock_subjects")
 def get_mock_subjects(class_name: str):
     logger.info(f"Fetching subjects for class: {class_name}")
-    subjects = CHAPTERS_SIMPLE.get(class_name)
-    if not subjects:
+    body = CURRICULUM.mock_subjects_body.get(class_name)
+    if body is None:
         logger.error(f"Invalid class: {class_name}")
         raise HTTPException(status_code=400, detail="Invalid class")
-    return JSONResponse(content={"subjects": list(subjects.keys())})
+    return Response(content=body, media_type="application/json")
 
 @app.get("/quick-practice")
 def get_quick_practice():
@@ -1988,7 +3304,7 @@ def get_quick_practice():
         "message": "Quick Practice endpoint is working!",
         "status": "success",
         "data": {
-            "available_classes": list(CHAPTERS_SIMPLE.keys()),
+            "available_classes": CURRICULUM.mock_classes,
             "subjects": ["Computers", "English", "Mathematics", "Science", "History", "Geography", "Civics", "Economics"],
             "quick_practice_available": True
         }
@@ -1997,172 +3313,108 @@ def get_quick_practice():
 @app.get("/mock_chapters")
 def get_mock_chapters(class_name: str, subject: str):
     logger.info(f"Fetching chapters for class: {class_name}, subject: {subject}")
-    subjects = CHAPTERS_SIMPLE.get(class_name)
-    if not subjects or subject not in subjects:
+    body = CURRICULUM.mock_chapters_body.get((class_name, subject))
+    if body is None:
         logger.error(f"Invalid subject: {subject} or class: {class_name}")
         raise HTTPException(status_code=400, detail="Invalid subject or class")
-    chapters = subjects[subject]
-    if isinstance(chapters, dict):
-        chapters = [chapter for sublist in chapters.values() for chapter in sublist]
-    return JSONResponse(content={"chapters": chapters})
+    return Response(content=body, media_type="application/json")
 
 @app.get("/mock_test")
-def get_mock_test(
+async def get_mock_test(
+    http_request: Request,
     class_name: str,
     subject: str,
     chapter: str,
     retry: bool = False,
     language: str = "English",
-    num_questions: int = 50
+    num_questions: int = Query(MOCK_TEST_SIZE, ge=1, le=MOCK_TEST_SIZE),
+    student_id: Optional[str] = None
 ):
     try:
-        previous = PREVIOUS_QUESTIONS_MOCK.get(chapter, []) if not retry else []
-
-        # Automatic difficulty progression
-        num_prev = len(previous)
-        if num_prev == 0:
-            current_level = 1
-            difficulty = "simple"
-        elif num_prev == 1:
-            current_level = 2
-            difficulty = "medium"
+        requester = _requester(student_id, http_request)
+        student_id = student_id or ANONYMOUS_STUDENT
+        if retry:
+            seen, attempts = set(), 0
         else:
-            current_level = 3
-            difficulty = "hard"
+            seen, attempts = await seen_store.history(student_id, "mock", chapter)
+        dedupe = NearDuplicateFilter.from_fingerprints(seen, NEAR_DUPLICATE_THRESHOLD)
+
+        # Automatic difficulty progression from the student's own attempts
+        current_level = _level_for_attempts(attempts)
+        difficulty = {1: "simple", 2: "medium", 3: "hard"}[current_level]
        
         logger.info(f"Generating mock test for class: {class_name}, subject: {subject}, chapter: {chapter}, difficulty: {difficulty}, language: {language}, retry: {retry}, num_questions: {num_questions}")
 
-        subjects = CHAPTERS_SIMPLE.get(class_name)
-        if not subjects or subject not in subjects:
+        is_valid_chapter = CURRICULUM.is_mock_chapter(class_name, subject, chapter)
+        if is_valid_chapter is None:
             logger.error(f"Invalid subject: {subject} or class: {class_name}")
             raise HTTPException(status_code=400, detail="Invalid subject or class")
-
-        chapters = subjects[subject]
-        if isinstance(chapters, dict):
-            for key, chapter_list in chapters.items():
-                if chapter in chapter_list:
-                    break
-            else:
-                logger.error(f"Invalid chapter: {chapter} for subject: {subject}")
-                raise HTTPException(status_code=400, detail="Invalid chapter")
-        elif chapter not in chapters:
+        if not is_valid_chapter:
             logger.error(f"Invalid chapter: {chapter} for subject: {subject}")
             raise HTTPException(status_code=400, detail="Invalid chapter")
 
-        if len(previous) > MAX_PREVIOUS_QUESTIONS:
-            previous = previous[-MAX_PREVIOUS_QUESTIONS:]
-            logger.info(f"Truncated previous questions for chapter: {chapter} to {MAX_PREVIOUS_QUESTIONS}")
-
-        # Get language instruction
-        language_instruction = LANGUAGE_INSTRUCTIONS.get(language, LANGUAGE_INSTRUCTIONS["English"])
-
-        prompt = f"""
-        Generate {num_questions} multiple-choice questions for "{chapter}" in {subject} for class {class_name}.
-        Difficulty: {difficulty}.
-        {language_instruction}
-       
-        IMPORTANT INSTRUCTIONS:
-        - ALL questions, options, and content MUST be in {language} language only.
-        - Do NOT mix English with the target language.
-        - Use proper script for the selected language.
-        - Avoid repeating these questions: {previous}.
-       
-        FORMAT REQUIREMENTS:
-        - Each question must have exactly 4 options as a JSON object {{"A": "option text", "B": "another option", "C": "third option", "D": "fourth option"}}.
-        - The answer must be the label "A", "B", "C", or "D".
-        - Return ONLY a JSON array of objects with keys: question, options, answer.
-       
-        Example format (in {language}):
-        [
-          {{
-            "question": "[Question text in {language}]",
-            "options": {{
-              "A": "[Option A in {language}]",
-              "B": "[Option B in {language}]",
-              "C": "[Option C in {language}]",
-              "D": "[Option D in {language}]"
-            }},
-            "answer": "C"
-          }}
-        ]
-        """
-
-        logger.info(f"Sending prompt to AI for chapter: {chapter} in {language}")
-        response = client.chat.completions.create(
-            model="google/gemini-2.0-flash-001",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.9
+        seen_before = lambda q: dedupe.is_duplicate(q["question"])
+        upstream_down = _breaker_for(DEFAULT_MODEL).is_open()
+        processed_quiz = None
+        if question_bank is not None:
+            scope = mock_scope(class_name, subject, chapter)
+            processed_quiz = question_bank.take(MOCK, scope, difficulty, language, num_questions, exclude=seen_before)
+            if processed_quiz is None and upstream_down:
+                # Upstream is failing: stored questions the student may have seen beat waiting on it
+                processed_quiz = question_bank.take(MOCK, scope, difficulty, language, num_questions)
+        if processed_quiz is None and QUESTION_POOL_ENABLED and _mock_poolable(language):
+            pool_key = ("mock_test", class_name, subject, chapter, difficulty, language)
+            processed_quiz = mock_pool.take(pool_key, num_questions, exclude=seen_before)
+            if processed_quiz is None and upstream_down:
+                processed_quiz = mock_pool.take(pool_key, num_questions)
+
+        if processed_quiz is None:
+            async def generate():
+                # One admission unit per shard; coalesced followers share the leader's slot, but not its rejection
+                shards = -(-num_questions // MOCK_SHARD_SIZE)
+                async with _admission_for(DEFAULT_MODEL).slot("mock_test", requester, weight=shards):
+                    return await generate_mock_questions_sharded(
+                        class_name, subject, chapter, difficulty, language, num_questions
+                    )
+
+            try:
+                if retry:
+                    processed_quiz = await generate()
+                else:
+                    processed_quiz = await inflight.do(
+                        ("mock_test", class_name, subject, chapter, difficulty, language, num_questions), generate,
+                        leader_errors=(AdmissionRejected,),
+                    )
+            except AdmissionRejected:
+                raise
+            except Exception as api_error:
+                logger.error(f"Mock test generation failed, using fallback questions: {api_error}")
+                fallback_responses.inc("mock_test")
+                fallback_quiz = get_fallback_mock_test(chapter, difficulty, language)
+                return JSONResponse(content={
+                    "currentLevel": current_level,
+                    "quiz": fallback_quiz,
+                    "source": "fallback"
+                })
+
+        processed_quiz = await _fill_unique(
+            processed_quiz, num_questions, dedupe,
+            lambda n: generate_mock_questions_sharded(class_name, subject, chapter, difficulty, language, n)
         )
 
-        message_content = response.choices[0].message.content
-        text = ""
-        if isinstance(message_content, list):
-            for block in message_content:
-                if block.get("type") == "text":
-                    text += block.get("text", "")
-        else:
-            text = str(message_content)
-
-        text = text.strip()
-        if text.startswith("```json"):
-            text = text[7:].strip()
-        if text.endswith("```"):
-            text = text[:-3].strip()
-
-        try:
-            quiz_json = json.loads(text)
-        except json.JSONDecodeError:
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-            if not match:
-                return JSONResponse(content={"currentLevel": current_level, "quiz": []}, status_code=200)
-            quiz_json = json.loads(match.group(0))
-
-        if not isinstance(quiz_json, list):
-            return JSONResponse(content={"currentLevel": current_level, "quiz": []}, status_code=200)
-
-        processed_quiz = []
-        for q in quiz_json:
-            if not all(key in q for key in ["question", "options", "answer"]):
-                continue
-            if isinstance(q["options"], list) and len(q["options"]) == 4:
-                q["options"] = {chr(65 + i): opt for i, opt in enumerate(q["options"])}
-            elif not isinstance(q["options"], dict) or len(q["options"]) != 4:
-                continue
-            if q["answer"] not in q["options"]:
-                continue
-
-            items = list(q["options"].items())
-            random.shuffle(items)
-            new_options = {}
-            new_answer = None
-            for new_idx, (old_label, text_opt) in enumerate(items):
-                new_label = chr(65 + new_idx)
-                new_options[new_label] = text_opt
-                if old_label == q["answer"]:
-                    new_answer = new_label
-            q["options"] = new_options
-            q["answer"] = new_answer
-            processed_quiz.append(q)
-
-        while len(processed_quiz) < 50:
-            processed_quiz.append({
-                "id": len(processed_quiz),
-                "question": f"Placeholder Question {len(processed_quiz) + 1}",
-                "options": {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"},
-                "answer": "A"
-            })
+        processed_quiz = _shuffle_mock_options(processed_quiz)
+        if len(processed_quiz) < num_questions:
+            mock_tests_short.inc()
 
         if not retry:
-            PREVIOUS_QUESTIONS_MOCK[chapter] = previous + [q["question"] for q in processed_quiz]
-            if len(PREVIOUS_QUESTIONS_MOCK[chapter]) > MAX_PREVIOUS_QUESTIONS:
-                PREVIOUS_QUESTIONS_MOCK[chapter] = PREVIOUS_QUESTIONS_MOCK[chapter][-MAX_PREVIOUS_QUESTIONS:]
+            await seen_store.record_attempt(student_id, "mock", chapter, [q["question"] for q in processed_quiz])
 
         return JSONResponse(content={
             "currentLevel": current_level,
             "quiz": processed_quiz
         })
 
-    except HTTPException as e:
+    except (HTTPException, AdmissionRejected):
         raise
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
@@ -2171,6 +3423,23 @@ def get_mock_test(
 # -------------------------------
 # Global error handler
 # -------------------------------
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    logger.warning(f"Rejected {request.url.path}: {exc.reason}")
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Too many requests", "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(PromptBudgetExceeded)
+async def prompt_budget_exceeded_handler(request: Request, exc: PromptBudgetExceeded):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=413,
+        content={"error": "Request too large", "template": exc.template, "tokens": exc.tokens, "budget": exc.budget},
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled error: {exc}")
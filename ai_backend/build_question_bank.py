@@ -0,0 +1,227 @@
+"""
+Offline builder for the question bank the API serves from.
+
+Walks every quick-practice subtopic (CHAPTERS_DETAILED) and mock-test chapter
+(CHAPTERS_SIMPLE) for every language in LANGUAGE_INSTRUCTIONS and all three
+difficulty levels, and tops each one up to a target number of validated,
+near-duplicate-free questions in a SQLite file.  Generation uses the same
+prompts, validation and repair as the API, with a fixed number of concurrent
+upstream calls.
+
+Runs are resumable and idempotent: scopes that already hold enough questions
+are skipped, and storing a question twice is a no-op, so an interrupted build
+simply continues where it stopped when run again.
+
+    python build_question_bank.py --db question_bank.sqlite3 --concurrency 8
+    python build_question_bank.py --kinds quick --languages English,Hindi --difficulties simple
+"""
+import argparse
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, List, NamedTuple
+
+from app import (
+    CURRICULUM,
+    DEFAULT_MODEL,
+    LANGUAGE_INSTRUCTIONS,
+    NEAR_DUPLICATE_THRESHOLD,
+    _breaker_for,
+    client,
+    generate_mock_questions,
+    generate_quiz_questions,
+)
+from near_duplicates import NearDuplicateFilter
+from question_bank import MOCK, QUICK, QuestionBank, mock_scope
+
+logger = logging.getLogger("build_question_bank")
+
+DIFFICULTIES = ["simple", "medium", "hard"]
+
+
+class Job(NamedTuple):
+    kind: str
+    scope: str
+    difficulty: str
+    language: str
+    target: int
+    generate: Callable[[int, int], Awaitable[List[dict]]]
+
+
+class Progress:
+    def __init__(self, total_jobs: int):
+        self.total_jobs = total_jobs
+        self.started = time.monotonic()
+        self.jobs_done = 0
+        self.jobs_skipped = 0
+        self.jobs_short = 0
+        self.calls = 0
+        self.failed_calls = 0
+        self.written = 0
+        self._last_report = 0.0
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.written / elapsed if elapsed else 0.0
+        generated_jobs = self.jobs_done - self.jobs_skipped
+        remaining = self.total_jobs - self.jobs_done
+        eta = remaining * (elapsed / generated_jobs) if generated_jobs else float("nan")
+        return (
+            f"{self.jobs_done}/{self.total_jobs} scopes ({self.jobs_skipped} already full, {self.jobs_short} short) | "
+            f"{self.written} questions written, {rate:.2f} q/s | "
+            f"{self.calls} calls, {self.failed_calls} failed, {self.calls / elapsed if elapsed else 0.0:.2f} calls/s | "
+            f"elapsed {elapsed:.0f}s, eta {eta:.0f}s"
+        )
+
+    def report(self, force: bool = False):
+        now = time.monotonic()
+        if force or now - self._last_report >= 5:
+            self._last_report = now
+            print(self.line(), flush=True)
+
+
+def _quick_generator(subtopic: str, difficulty: str, language: str):
+    async def generate(count: int, batch_no: int) -> List[dict]:
+        return await generate_quiz_questions(subtopic, difficulty, language, count)
+    return generate
+
+
+def _mock_generator(class_name: str, subject: str, chapter: str, difficulty: str, language: str, batches: int):
+    async def generate(count: int, batch_no: int) -> List[dict]:
+        # The shard hint steers successive batches of one chapter towards different concepts
+        return await generate_mock_questions(
+            class_name, subject, chapter, difficulty, language, count, shard=(batch_no, batches)
+        )
+    return generate
+
+
+def plan_jobs(args) -> List[Job]:
+    languages = args.languages or list(LANGUAGE_INSTRUCTIONS.keys())
+    difficulties = args.difficulties or DIFFICULTIES
+    jobs = []
+    for language in languages:
+        for difficulty in difficulties:
+            if QUICK in args.kinds:
+                for subtopic in CURRICULUM.subtopic_to_chapters:
+                    jobs.append(Job(
+                        QUICK, subtopic, difficulty, language, args.quick_target,
+                        _quick_generator(subtopic, difficulty, language)
+                    ))
+            if MOCK in args.kinds:
+                batches = math.ceil(args.mock_target / args.batch_size)
+                for (class_name, subject), chapters in CURRICULUM.mock_chapters.items():
+                    for chapter in chapters:
+                        jobs.append(Job(
+                            MOCK, mock_scope(class_name, subject, chapter), difficulty, language, args.mock_target,
+                            _mock_generator(class_name, subject, chapter, difficulty, language, batches)
+                        ))
+    return jobs
+
+
+async def build_scope(bank: QuestionBank, job: Job, batch_size: int, progress: Progress):
+    """Top one scope up to its target, a batch at a time"""
+    have = bank.count(job.kind, job.scope, job.difficulty, job.language)
+    if have >= job.target:
+        progress.jobs_skipped += 1
+        return
+
+    dedupe = NearDuplicateFilter.from_fingerprints(
+        bank.fingerprints(job.kind, job.scope, job.difficulty, job.language), NEAR_DUPLICATE_THRESHOLD
+    )
+    max_batches = math.ceil(job.target / batch_size) + 2
+    batch_no = 0
+    while have < job.target and batch_no < max_batches:
+        batch_no += 1
+        # Wait out an open circuit instead of burning through the remaining scopes with failures
+        while _breaker_for(DEFAULT_MODEL).is_open():
+            await asyncio.sleep(1)
+        try:
+            questions = await job.generate(min(batch_size, job.target - have), batch_no)
+        except Exception as e:
+            progress.failed_calls += 1
+            logger.warning(f"{job.kind} {job.scope} ({job.difficulty}, {job.language}) batch {batch_no} failed: {e}")
+            continue
+        progress.calls += 1
+        fresh = [q for q in questions if dedupe.add(q["question"])]
+        added = bank.add(job.kind, job.scope, job.difficulty, job.language, fresh)
+        have += added
+        progress.written += added
+
+    if have < job.target:
+        progress.jobs_short += 1
+
+
+async def run(args) -> Progress:
+    jobs = plan_jobs(args)
+    if args.limit:
+        jobs = jobs[:args.limit]
+    bank = QuestionBank(args.db)
+    progress = Progress(len(jobs))
+    print(f"Planned {len(jobs)} scopes into {args.db} with {args.concurrency} concurrent calls", flush=True)
+
+    if args.dry_run:
+        missing = sum(max(0, job.target - bank.count(job.kind, job.scope, job.difficulty, job.language)) for job in jobs)
+        print(f"Dry run: {missing} questions to generate; bank holds {bank.totals()}", flush=True)
+        bank.close()
+        return progress
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await build_scope(bank, job, args.batch_size, progress)
+            progress.jobs_done += 1
+            progress.report()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        progress.report(force=True)
+        print(f"Bank now holds {bank.totals()}", flush=True)
+        bank.close()
+        if client is not None:
+            await client.aclose()
+    return progress
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate the question bank served by the AI backend")
+    parser.add_argument("--db", default="question_bank.sqlite3", help="SQLite file to create or extend")
+    parser.add_argument("--kinds", default="quick,mock", type=lambda v: v.split(","), help="quick, mock or both")
+    parser.add_argument("--languages", type=lambda v: v.split(","), help="comma-separated; default all")
+    parser.add_argument("--difficulties", type=lambda v: v.split(","), help="comma-separated; default simple,medium,hard")
+    parser.add_argument("--quick-target", type=int, default=30, help="questions per subtopic/difficulty/language")
+    parser.add_argument("--mock-target", type=int, default=100, help="questions per chapter/difficulty/language")
+    parser.add_argument("--batch-size", type=int, default=10, help="questions requested per upstream call")
+    parser.add_argument("--concurrency", type=int, default=8, help="upstream calls in flight")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N scopes (0 = all)")
+    parser.add_argument("--dry-run", action="store_true", help="report what is missing without generating")
+    parser.add_argument("--verbose", action="store_true", help="keep the API's per-request logging")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.kinds) - {QUICK, MOCK}
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+    if args.languages:
+        unknown = set(args.languages) - set(LANGUAGE_INSTRUCTIONS)
+        if unknown:
+            parser.error(f"unknown languages: {', '.join(sorted(unknown))}")
+    if args.difficulties:
+        unknown = set(args.difficulties) - set(DIFFICULTIES)
+        if unknown:
+            parser.error(f"unknown difficulties: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if not arguments.verbose:
+        logging.getLogger("app").setLevel(logging.WARNING)
+    asyncio.run(run(arguments))
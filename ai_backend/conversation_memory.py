@@ -0,0 +1,207 @@
+"""
+Bounded per-session conversation memory for the chat endpoints.
+
+For each session the memory keeps the last ``keep_messages`` messages
+verbatim (user and assistant messages count one each) and folds everything
+older into a running summary.  Folding is incremental (the previous summary
+plus only the newly aged-out messages) and runs in the background once
+``fold_batch`` messages have aged out, so a chat turn never waits for it.
+Only the summary and the last ``keep_messages`` messages (each cut to
+``max_message_chars``) are handed out, so the context sent upstream stays the
+same size however long a session runs.  If folding keeps failing, aged
+messages beyond ``max_pending`` are dropped.
+
+With ``REDIS_URL`` set the session state (summary and recent messages) is a
+JSON value in Redis with a sliding expiry, shared by every worker; otherwise
+an in-process LRU of sessions is used.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; the local store works on its own
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+# summarize(previous_summary, messages) -> new summary
+Summarizer = Callable[[str, List[Message]], Awaitable[str]]
+
+
+def _empty_state() -> dict:
+    return {"summary": "", "messages": []}
+
+
+def _upgrade(state: dict) -> dict:
+    # Sessions stored before the key was renamed
+    if "turns" in state:
+        state["messages"] = state.pop("turns")
+    return state
+
+
+class ConversationMemory:
+    """Last K messages verbatim plus a rolling summary of the rest, per session"""
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        redis_url: Optional[str] = None,
+        keep_messages: int = 4,
+        fold_batch: int = 2,
+        max_pending: int = 8,
+        max_message_chars: int = 1500,
+        max_summary_chars: int = 1500,
+        ttl: int = 24 * 3600,
+        max_local_sessions: int = 10000,
+        key_prefix: str = "ai_backend:memory:",
+    ):
+        self.summarize = summarize
+        self.keep_messages = keep_messages
+        self.fold_batch = fold_batch
+        self.max_pending = max_pending
+        self.max_message_chars = max_message_chars
+        self.max_summary_chars = max_summary_chars
+        self.ttl = ttl
+        self.max_local_sessions = max_local_sessions
+        self.key_prefix = key_prefix
+        self._local: "OrderedDict[str, dict]" = OrderedDict()
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        self._folding: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.folds = 0
+        self.fold_failures = 0
+        self.dropped_messages = 0
+        self.redis_errors = 0
+
+    def _clip(self, message: Message) -> Message:
+        content = message["content"]
+        if len(content) > self.max_message_chars:
+            content = content[:self.max_message_chars] + " …"
+        return {"role": message["role"], "content": content}
+
+    async def _load(self, session: str) -> Optional[dict]:
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self.key_prefix + session)
+                return _upgrade(json.loads(raw)) if raw else None
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Conversation memory read failed, using local state: {e}")
+        state = self._local.get(session)
+        if state is not None:
+            self._local.move_to_end(session)
+        return state
+
+    async def _save(self, session: str, state: dict):
+        if self._redis is not None:
+            try:
+                await self._redis.set(self.key_prefix + session, json.dumps(state, ensure_ascii=False), ex=self.ttl)
+                return
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Conversation memory write failed, keeping state locally: {e}")
+        self._local[session] = state
+        self._local.move_to_end(session)
+        while len(self._local) > self.max_local_sessions:
+            self._local.popitem(last=False)
+
+    async def context(self, session: str, seed: Optional[List[Message]] = None) -> Tuple[str, List[Message]]:
+        """Return (summary, recent messages) for a session
+
+        ``seed`` (the client's own history) is used only for a session the
+        memory has not seen yet; after that the memory's state is authoritative.
+        """
+        state = await self._load(session)
+        if state is None:
+            state = _empty_state()
+            if seed:
+                state["messages"] = [self._clip(m) for m in seed[-(self.keep_messages + self.max_pending):]]
+                await self._save(session, state)
+                self._maybe_fold(session, state)
+        return state["summary"], state["messages"][-self.keep_messages:]
+
+    async def append(self, session: str, *messages: Message):
+        """Record the messages of a finished turn and fold older ones if enough have aged out"""
+        state = await self._load(session) or _empty_state()
+        state["messages"].extend(self._clip(m) for m in messages)
+        overflow = len(state["messages"]) - (self.keep_messages + self.max_pending)
+        if overflow > 0:
+            # Summarising has fallen behind: drop the oldest rather than let the context grow
+            del state["messages"][:overflow]
+            self.dropped_messages += overflow
+        await self._save(session, state)
+        self._maybe_fold(session, state)
+
+    def _maybe_fold(self, session: str, state: dict):
+        if len(state["messages"]) - self.keep_messages < self.fold_batch or session in self._folding:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._folding.add(session)
+        task = loop.create_task(self._fold(session))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session: str):
+        state = None
+        try:
+            state = await self._load(session)
+            if state is None:
+                return
+            aged = state["messages"][:-self.keep_messages]
+            if not aged:
+                return
+            try:
+                summary = (await self.summarize(state["summary"], aged)).strip()
+            except Exception as e:
+                self.fold_failures += 1
+                logger.warning(f"Conversation summary failed for session {session}: {e}")
+                return
+            if not summary:
+                self.fold_failures += 1
+                return
+            # Messages may have been appended (or dropped) while the summary was written
+            latest = await self._load(session) or state
+            messages = latest["messages"]
+            if messages[:len(aged)] == aged:
+                messages = messages[len(aged):]
+            else:
+                messages = messages[-self.keep_messages:]
+            state = {"summary": summary[:self.max_summary_chars], "messages": messages}
+            await self._save(session, state)
+            self.folds += 1
+        finally:
+            self._folding.discard(session)
+        # Fold again straight away if enough messages aged out meanwhile
+        self._maybe_fold(session, state)
+
+    def stats(self) -> dict:
+        return {
+            "redis_enabled": self._redis is not None,
+            "redis_errors": self.redis_errors,
+            "local_sessions": len(self._local),
+            "keep_messages": self.keep_messages,
+            "fold_batch": self.fold_batch,
+            "folds": self.folds,
+            "folds_running": len(self._folding),
+            "fold_failures": self.fold_failures,
+            "dropped_messages": self.dropped_messages,
+        }
+
+    async def aclose(self):
+        """Cancel running folds and close the Redis connection"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._redis is not None:
+            await self._redis.close()
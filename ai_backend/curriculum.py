@@ -0,0 +1,102 @@
+"""
+Curriculum indexes compiled once at startup.
+
+``CHAPTERS_DETAILED`` (quick practice: class -> subject -> chapter -> subtopics)
+and ``CHAPTERS_SIMPLE`` (mock tests: class -> subject -> chapters) are walked
+a single time to build lookup tables, pre-serialised JSON bodies for the
+curriculum endpoints, and a gzip-compressed catalog bundle with strong ETags.
+"""
+import gzip
+import hashlib
+import json
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _flatten_chapters(chapters) -> List[str]:
+    if isinstance(chapters, dict):
+        return [chapter for sublist in chapters.values() for chapter in sublist]
+    return list(chapters)
+
+
+class CurriculumIndex:
+    """Read-only lookup tables and pre-rendered bodies for the curriculum data"""
+
+    def __init__(self, detailed: dict, simple: dict):
+        # Quick practice: class -> subjects -> {chapter: [subtopics]}
+        self.quick_classes: List[str] = list(detailed.keys())
+        self.quick_subjects: Dict[str, List[str]] = {
+            class_name: list(subjects.keys()) for class_name, subjects in detailed.items()
+        }
+        self.quick_subtopics: Dict[Tuple[str, str], dict] = {
+            (class_name, subject): chapters
+            for class_name, subjects in detailed.items()
+            for subject, chapters in subjects.items()
+        }
+        # subtopic -> every (class, subject, chapter) it appears under
+        self.subtopic_to_chapters: Dict[str, List[Tuple[str, str, str]]] = {}
+        for (class_name, subject), chapters in self.quick_subtopics.items():
+            for chapter, subtopics in chapters.items():
+                for subtopic in subtopics:
+                    self.subtopic_to_chapters.setdefault(subtopic, []).append(
+                        (class_name, subject, chapter.strip())
+                    )
+
+        # Mock tests: class -> subjects -> [chapters]
+        self.mock_classes: List[str] = list(simple.keys())
+        self.mock_subjects: Dict[str, List[str]] = {
+            class_name: list(subjects.keys()) for class_name, subjects in simple.items()
+        }
+        self.mock_chapters: Dict[Tuple[str, str], List[str]] = {
+            (class_name, subject): _flatten_chapters(chapters)
+            for class_name, subjects in simple.items()
+            for subject, chapters in subjects.items()
+        }
+        self.mock_chapter_sets: Dict[Tuple[str, str], FrozenSet[str]] = {
+            key: frozenset(chapters) for key, chapters in self.mock_chapters.items()
+        }
+        # (class, chapter) -> subject
+        self.chapter_to_subject: Dict[Tuple[str, str], str] = {
+            (class_name, chapter): subject
+            for (class_name, subject), chapters in self.mock_chapters.items()
+            for chapter in chapters
+        }
+
+        # Pre-serialised response bodies
+        self.quick_classes_body = _dumps({"classes": self.quick_classes})
+        self.quick_subjects_body = {
+            class_name: _dumps({"chapters": subjects}) for class_name, subjects in self.quick_subjects.items()
+        }
+        self.quick_subtopics_body = {
+            key: _dumps({"subtopics": chapters}) for key, chapters in self.quick_subtopics.items()
+        }
+        self.mock_classes_body = _dumps({"classes": self.mock_classes})
+        self.mock_subjects_body = {
+            class_name: _dumps({"subjects": subjects}) for class_name, subjects in self.mock_subjects.items()
+        }
+        self.mock_chapters_body = {
+            key: _dumps({"chapters": chapters}) for key, chapters in self.mock_chapters.items()
+        }
+
+        # Whole-tree bundle, identity and gzip, each with its own strong ETag
+        self.catalog_body = _dumps({
+            "quick_practice": detailed,
+            "mock_test": {
+                class_name: {subject: _flatten_chapters(chapters) for subject, chapters in subjects.items()}
+                for class_name, subjects in simple.items()
+            },
+        })
+        self.catalog_gzip = gzip.compress(self.catalog_body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.catalog_body).hexdigest()[:32]
+        self.catalog_etag = f'"{digest}"'
+        self.catalog_gzip_etag = f'"{digest}-gzip"'
+
+    def is_mock_chapter(self, class_name: str, subject: str, chapter: str) -> Optional[bool]:
+        """None if the class/subject pair is unknown, else whether the chapter belongs to it"""
+        chapters = self.mock_chapter_sets.get((class_name, subject))
+        if chapters is None:
+            return None
+        return chapter in chapters
@@ -0,0 +1,154 @@
+"""
+Async LLM client shared by every ai_backend generation endpoint.
+
+Wraps ``AsyncOpenAI`` with a single pooled ``httpx.AsyncClient`` so that all
+requests to OpenRouter reuse keep-alive connections, applies a per-call
+timeout, and bounds the number of upstream calls in flight with a semaphore.
+Nothing here blocks the event loop, so one uvicorn worker can keep hundreds
+of completions outstanding at once.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Called as on_usage(model, label, prompt_tokens, completion_tokens) for every completion that reports usage
+UsageHook = Callable[[str, str, int, int], None]
+
+
+def extract_text(message_content) -> str:
+    """Flatten a chat completion message content (str or list of blocks) into plain text"""
+    if message_content is None:
+        return ""
+    if isinstance(message_content, list):
+        text = ""
+        for block in message_content:
+            if block.get("type") == "text":
+                text += block.get("text", "")
+        return text
+    return str(message_content)
+
+
+class LLMClient:
+    """Pooled, concurrency-bounded async wrapper around the OpenAI-compatible API"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        max_connections: int = 200,
+        max_concurrency: int = 100,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        max_retries: int = 1,
+        on_usage: Optional[UsageHook] = None,
+    ):
+        self.timeout = timeout
+        self.on_usage = on_usage
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        )
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self._http_client,
+            max_retries=max_retries,
+        )
+
+    def _report_usage(self, model: str, label: str, usage):
+        if self.on_usage is None or usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt_tokens = getattr(usage, "prompt_tokens", None)
+            completion_tokens = getattr(usage, "completion_tokens", None)
+        self.on_usage(model, label, prompt_tokens or 0, completion_tokens or 0)
+
+    async def create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        label: str = "",
+        **kwargs,
+    ):
+        """Run one chat completion, waiting for a free concurrency slot first"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                response = await self._client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=timeout or self.timeout,
+                    **kwargs,
+                )
+            finally:
+                self.in_flight -= 1
+        self._report_usage(model, label, getattr(response, "usage", None))
+        return response
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        label: str = "",
+        **kwargs,
+    ) -> str:
+        """Run one chat completion and return the text of the first choice"""
+        response = await self.create(model, messages, temperature=temperature, timeout=timeout, label=label, **kwargs)
+        return extract_text(response.choices[0].message.content)
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        label: str = "",
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Run one streaming chat completion and yield text deltas as they arrive"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                response = await self._client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=timeout or self.timeout,
+                    stream=True,
+                    # Ask for token usage in the final chunk
+                    extra_body={"stream_options": {"include_usage": True}},
+                    **kwargs,
+                )
+                async for chunk in response:
+                    usage = getattr(chunk, "usage", None)
+                    if usage:
+                        self._report_usage(model, label, usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self):
+        """Close the underlying connection pool"""
+        await self._client.close()
@@ -0,0 +1,402 @@
+"""
+Offline load test for the AI backend.
+
+Starts the LLM stub (``stub_llm_server.py``) in-process, launches the API
+under uvicorn with ``OPENROUTER_BASE_URL`` pointed at the stub, and drives
+``/quiz`` (plain and streamed), ``/mock_test`` and the assistant endpoints at
+a fixed concurrency.  At the end it prints throughput and p50/p95/p99
+latency per scenario (and time to first byte for streamed ones), and can
+write the figures as JSON and fail the run when a p95 exceeds a limit, so a
+regression is caught before deployment.
+
+By default the warm pools, the question bank and the response caches are
+bypassed so every request exercises generation; ``--warm`` keeps them.
+
+    python load_test.py --requests 500 --concurrency 32
+    python load_test.py --duration 60 --concurrency 64 --scenarios quiz=3,mock_test=1,assistant_chat=2 \\
+        --latency lognormal:0.8:0.5 --malformed-rate 0.05 --error-rate 0.02 --json results.json --max-p95-ms 4000
+    python load_test.py --app-url http://127.0.0.1:8000 --stub-port 0   # an API already pointed at a stub
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from stub_llm_server import add_stub_arguments, config_from_args, create_stub_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LANGUAGES = ["English", "Hindi", "Telugu", "Tamil", "Kannada", "Malayalam"]
+
+
+class Result(NamedTuple):
+    scenario: str
+    status: int
+    latency: float
+    first_byte: Optional[float]
+    error: Optional[str]
+
+
+class Curriculum:
+    """Subtopics and mock-test chapters to draw requests from, read from /catalog"""
+
+    def __init__(self, catalog: dict):
+        self.subtopics: List[Tuple[str, str, str]] = []
+        for class_name, subjects in catalog["quick_practice"].items():
+            for subject, chapters in subjects.items():
+                for chapter, subtopics in chapters.items():
+                    for subtopic in subtopics:
+                        self.subtopics.append((class_name, subject, subtopic))
+        self.chapters: List[Tuple[str, str, str]] = []
+        for class_name, subjects in catalog["mock_test"].items():
+            for subject, chapters in subjects.items():
+                if isinstance(chapters, dict):
+                    chapters = [chapter for group in chapters.values() for chapter in group]
+                for chapter in chapters:
+                    self.chapters.append((class_name, subject, chapter.strip()))
+
+
+# -------------------------------
+# Scenarios
+# -------------------------------
+def _student() -> str:
+    return f"load-{uuid.uuid4().hex[:12]}"
+
+
+def _quiz(curriculum: Curriculum, args, stream: bool = False) -> Tuple[str, str, dict]:
+    _, _, subtopic = random.choice(curriculum.subtopics)
+    params = {"subtopic": subtopic, "language": random.choice(args.languages), "student_id": _student()}
+    if not args.warm:
+        params["retry"] = "true"
+    if stream:
+        params["stream"] = "true"
+    return "GET", "/quiz", params
+
+
+def _mock_test(curriculum: Curriculum, args) -> Tuple[str, str, dict]:
+    class_name, subject, chapter = random.choice(curriculum.chapters)
+    params = {
+        "class_name": class_name, "subject": subject, "chapter": chapter,
+        "language": random.choice(args.languages), "num_questions": args.mock_questions, "student_id": _student(),
+    }
+    if not args.warm:
+        params["retry"] = "true"
+    return "GET", "/mock_test", params
+
+
+def _assistant_body(curriculum: Curriculum, args) -> dict:
+    class_name, subject, chapter = random.choice(curriculum.chapters)
+    return {
+        "class_level": class_name, "subject": subject, "chapter": chapter,
+        "student_id": _student(), "no_cache": not args.warm,
+    }
+
+
+def _assistant_chat(curriculum: Curriculum, args, stream: bool = False) -> Tuple[str, str, dict]:
+    body = dict(_assistant_body(curriculum, args), student_question="Can you explain the main idea with an example?", stream=stream)
+    return "POST", "/ai-assistant/chat", body
+
+
+def _notes(curriculum: Curriculum, args) -> Tuple[str, str, dict]:
+    return "POST", "/ai-assistant/generate-notes", _assistant_body(curriculum, args)
+
+
+def _study_plan(curriculum: Curriculum, args) -> Tuple[str, str, dict]:
+    return "POST", "/ai-assistant/generate-study-plan", dict(_assistant_body(curriculum, args), days_available=5)
+
+
+SCENARIOS: Dict[str, Callable[[Curriculum, argparse.Namespace], Tuple[str, str, dict]]] = {
+    "quiz": _quiz,
+    "quiz_stream": lambda curriculum, args: _quiz(curriculum, args, stream=True),
+    "mock_test": _mock_test,
+    "assistant_chat": _assistant_chat,
+    "assistant_chat_stream": lambda curriculum, args: _assistant_chat(curriculum, args, stream=True),
+    "notes": _notes,
+    "study_plan": _study_plan,
+}
+
+
+async def _send(http: httpx.AsyncClient, scenario: str, method: str, path: str, payload: dict) -> Result:
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        if method == "GET":
+            request = http.build_request("GET", path, params=payload)
+        else:
+            request = http.build_request("POST", path, json=payload)
+        response = await http.send(request, stream=True)
+        try:
+            async for _ in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        finally:
+            await response.aclose()
+        error = None
+        if response.status_code >= 400:
+            error = f"HTTP {response.status_code}"
+        return Result(scenario, response.status_code, time.perf_counter() - started, first_byte, error)
+    except Exception as e:
+        return Result(scenario, 0, time.perf_counter() - started, first_byte, type(e).__name__)
+
+
+async def drive(base_url: str, curriculum: Curriculum, args) -> Tuple[List[Result], float]:
+    names, weights = zip(*args.scenarios.items())
+    deadline = time.monotonic() + args.duration if args.duration else None
+    remaining = [args.requests]
+    results: List[Result] = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        async def worker():
+            while True:
+                if deadline is not None:
+                    if time.monotonic() >= deadline:
+                        return
+                else:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                scenario = random.choices(names, weights)[0]
+                method, path, payload = SCENARIOS[scenario](curriculum, args)
+                results.append(await _send(http, scenario, method, path, payload))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+# -------------------------------
+# Reporting
+# -------------------------------
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(results: List[Result], elapsed: float) -> dict:
+    groups: Dict[str, List[Result]] = defaultdict(list)
+    for result in results:
+        groups[result.scenario].append(result)
+    groups["all"] = results
+
+    summary = {}
+    for scenario, group in groups.items():
+        latencies = [r.latency * 1000 for r in group if r.error is None]
+        first_bytes = [r.first_byte * 1000 for r in group if r.error is None and r.first_byte is not None]
+        errors = defaultdict(int)
+        for r in group:
+            if r.error is not None:
+                errors[r.error] += 1
+        summary[scenario] = {
+            "requests": len(group),
+            "ok": len(latencies),
+            "errors": dict(errors),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(max(latencies), 1) if latencies else 0.0,
+            "ttfb_p50_ms": round(percentile(first_bytes, 50), 1),
+            "ttfb_p95_ms": round(percentile(first_bytes, 95), 1),
+        }
+    return summary
+
+
+def print_report(summary: dict, elapsed: float):
+    print(f"\nCompleted in {elapsed:.1f}s")
+    header = f"{'scenario':<24}{'reqs':>7}{'ok':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ttfb p95':>10}  errors"
+    print(header)
+    print("-" * len(header))
+    for scenario in sorted(summary, key=lambda name: (name == "all", name)):
+        row = summary[scenario]
+        errors = ", ".join(f"{kind}: {count}" for kind, count in sorted(row["errors"].items())) or "-"
+        print(
+            f"{scenario:<24}{row['requests']:>7}{row['ok']:>7}{row['throughput_rps']:>9}"
+            f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}{row['ttfb_p95_ms']:>10}  {errors}"
+        )
+
+
+# -------------------------------
+# Processes
+# -------------------------------
+async def start_stub(args) -> Tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(
+        create_stub_app(config_from_args(args)), host="127.0.0.1", port=args.stub_port, log_level="warning"
+    ))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def start_app(args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+        OPENROUTER_API_KEY="stub-key",
+        PYTHONUNBUFFERED="1",
+    )
+    env.pop("REDIS_URL", None)
+    if not args.warm:
+        env.update(QUESTION_POOL_ENABLED="false", QUESTION_BANK_PATH="")
+    for assignment in args.app_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    command = [
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    log = open(args.app_log, "ab") if args.app_log else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_up(base_url: str, process: Optional[subprocess.Popen], timeout: float = 60):
+    give_up = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as http:
+        while time.monotonic() < give_up:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"API exited with code {process.returncode} during startup")
+            try:
+                if (await http.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"API at {base_url} did not come up within {timeout:.0f}s")
+
+
+async def run(args) -> dict:
+    stub = stub_task = None
+    app_process = None
+    if args.stub_port:
+        stub, stub_task = await start_stub(args)
+        print(f"LLM stub listening on http://127.0.0.1:{args.stub_port}/v1 (latency {args.latency})", flush=True)
+    base_url = args.app_url
+    try:
+        if base_url is None:
+            app_process = start_app(args)
+            base_url = f"http://127.0.0.1:{args.app_port}"
+        await wait_until_up(base_url, app_process)
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=10) as http:
+            curriculum = Curriculum((await http.get("/catalog")).json())
+
+        for _ in range(args.warmup):
+            await drive(base_url, curriculum, argparse.Namespace(**{**vars(args), "requests": args.concurrency, "duration": 0}))
+
+        budget = f"{args.duration}s" if args.duration else f"{args.requests} requests"
+        print(f"Driving {base_url} with {args.concurrency} concurrent clients for {budget}: {args.scenarios}", flush=True)
+        results, elapsed = await drive(base_url, curriculum, args)
+        summary = summarize(results, elapsed)
+        print_report(summary, elapsed)
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=10) as http:
+            try:
+                upstream = (await http.get("/upstream/status")).json()
+                generation = upstream.get("generation", {})
+                print(f"\nGeneration: requested {generation.get('requested')}, usable {generation.get('usable')}, "
+                      f"malformed {generation.get('malformed')}, repairs {generation.get('repair_requests')}")
+            except (httpx.HTTPError, ValueError):
+                pass
+        if stub is not None:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.stub_port}", timeout=10) as http:
+                print(f"Stub: {(await http.get('/stats')).json()}")
+        return {"elapsed_seconds": round(elapsed, 3), "config": _config_snapshot(args), "scenarios": summary}
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            try:
+                app_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app_process.kill()
+        if stub is not None:
+            stub.should_exit = True
+            await stub_task
+
+
+def _config_snapshot(args) -> dict:
+    keys = ("requests", "duration", "concurrency", "scenarios", "languages", "warm", "workers", "latency",
+            "chunk_delay", "malformed_rate", "error_rate", "hang_rate", "replay")
+    return {key: getattr(args, key) for key in keys}
+
+
+def _parse_scenarios(value: str) -> Dict[str, float]:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the AI backend against a local LLM stub")
+    parser.add_argument("--requests", type=int, default=200, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="run for this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--scenarios", type=_parse_scenarios,
+                        default="quiz=3,quiz_stream=1,mock_test=1,assistant_chat=2,notes=1,study_plan=1",
+                        help="weighted mix, e.g. quiz=3,mock_test=1")
+    parser.add_argument("--languages", type=lambda v: v.split(","), default=["English"], help="comma-separated")
+    parser.add_argument("--mock-questions", type=int, default=50)
+    parser.add_argument("--warm", action="store_true", help="keep pools, question bank and caches enabled")
+    parser.add_argument("--warmup", type=int, default=0, help="rounds of --concurrency requests before measuring")
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout per request (seconds)")
+    parser.add_argument("--app-url", help="drive an API that is already running instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started API")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the started API (repeatable)")
+    parser.add_argument("--app-log", help="append the started API's output to this file (default: discard)")
+    parser.add_argument("--stub-port", type=int, default=9100, help="0 to not start the stub")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit with status 1 if the overall p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="exit with status 1 if the error share exceeds this")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    if isinstance(args.scenarios, str):
+        args.scenarios = _parse_scenarios(args.scenarios)
+    if args.app_url is None and not args.stub_port:
+        parser.error("--stub-port 0 needs --app-url")
+    return args
+
+
+def check_thresholds(report: dict, args) -> List[str]:
+    overall = report["scenarios"]["all"]
+    failures = []
+    if args.max_p95_ms is not None and overall["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 {overall['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and overall["requests"]:
+        error_rate = 1 - overall["ok"] / overall["requests"]
+        if error_rate > args.max_error_rate:
+            failures.append(f"error rate {error_rate:.3f} > {args.max_error_rate}")
+    return failures
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = asyncio.run(run(arguments))
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    failed = check_thresholds(report, arguments)
+    for failure in failed:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,133 @@
+"""
+Near-duplicate detection for generated questions.
+
+Each question is reduced to a compact MinHash signature over the character
+trigrams of its NFKC-normalised, case-folded text with punctuation removed.
+Character n-grams need no tokeniser, so the same code works for English,
+Telugu, Hindi, Tamil, Kannada and Malayalam (combining vowel signs are kept).
+Signatures use 32 BLAKE2b-derived hash functions and keep the low 8 bits of
+each minimum (b-bit MinHash), so one signature is 32 bytes (64 hex chars).
+
+Two questions whose estimated trigram Jaccard similarity is at least
+``threshold`` count as the same question.  ``NearDuplicateFilter`` indexes
+signatures in LSH bands so a lookup only compares against signatures that
+share a band, not against the whole history.
+"""
+import hashlib
+import re
+import struct
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set
+
+NGRAM = 3
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Each 64-byte BLAKE2b digest yields 16 independent 32-bit hash values; two
+# personalised digests give the 32 hash functions.  They are keyless and
+# deterministic, so signatures stored in Redis match across workers and restarts.
+_UNPACK_16 = struct.Struct(">16I").unpack
+_PERSONS = (b"novya-minhash-1", b"novya-minhash-2")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalise, case-fold, drop punctuation/symbols and collapse whitespace"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(
+        " " if unicodedata.category(ch)[0] in ("P", "S") else ch
+        for ch in text
+    )
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@lru_cache(maxsize=8192)
+def minhash_signature(text: str) -> bytes:
+    """32-byte b-bit MinHash signature of a question's character trigrams"""
+    normalized = normalize_text(text)
+    if len(normalized) <= NGRAM:
+        grams = {normalized}
+    else:
+        grams = {normalized[i:i + NGRAM] for i in range(len(normalized) - NGRAM + 1)}
+    rows = []
+    for gram in grams:
+        data = gram.encode("utf-8")
+        row = ()
+        for person in _PERSONS:
+            row += _UNPACK_16(hashlib.blake2b(data, digest_size=64, person=person).digest())
+        rows.append(row)
+    return bytes(min(column) & 0xFF for column in zip(*rows))
+
+
+def question_fingerprint(text: str) -> str:
+    """Hex MinHash signature, the form stored in the seen-question history"""
+    return minhash_signature(text).hex()
+
+
+def estimated_similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures, corrected for 8-bit collisions"""
+    matches = sum(x == y for x, y in zip(a, b)) / NUM_PERMUTATIONS
+    return max(0.0, (matches - 1 / 256) / (1 - 1 / 256))
+
+
+class NearDuplicateFilter:
+    """Set of MinHash signatures with an LSH band index for near-duplicate lookups"""
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self._index: Dict[tuple, Set[bytes]] = defaultdict(set)
+        self._size = 0
+
+    @classmethod
+    def from_fingerprints(cls, fingerprints: Iterable[str], threshold: float = 0.8) -> "NearDuplicateFilter":
+        """Build a filter from stored hex fingerprints (as produced by ``question_fingerprint``)"""
+        dedupe = cls(threshold)
+        for fingerprint in fingerprints:
+            try:
+                signature = bytes.fromhex(fingerprint)
+            except ValueError:
+                continue
+            if len(signature) == NUM_PERMUTATIONS:
+                dedupe.add_signature(signature)
+        return dedupe
+
+    @staticmethod
+    def _band_keys(signature: bytes) -> List[tuple]:
+        return [
+            (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for band in range(BANDS)
+        ]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def contains_signature(self, signature: bytes) -> bool:
+        checked = set()
+        for key in self._band_keys(signature):
+            for candidate in self._index.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if estimated_similarity(signature, candidate) >= self.threshold:
+                    return True
+        return False
+
+    def add_signature(self, signature: bytes):
+        for key in self._band_keys(signature):
+            self._index[key].add(signature)
+        self._size += 1
+
+    def is_duplicate(self, text: str) -> bool:
+        return self.contains_signature(minhash_signature(text))
+
+    def add(self, text: str) -> bool:
+        """Add ``text`` unless it is a near-duplicate; returns True if it was added"""
+        signature = minhash_signature(text)
+        if self.contains_signature(signature):
+            return False
+        self.add_signature(signature)
+        return True
@@ -0,0 +1,152 @@
+"""
+Registry of prompt templates with a fixed system prefix and a token budget.
+
+Each ``PromptTemplate`` splits a prompt into a static system message (the
+formatting rules, identical on every call, so provider-side prompt caching
+can reuse it) and a short user message holding only the per-request values.
+The static text is dedented once at registration instead of being rebuilt
+with f-strings on every request.
+
+``render`` estimates the input tokens before anything is sent and raises
+``PromptBudgetExceeded`` when a prompt would go over the template's budget.
+The registry keeps per-template token statistics for ``/prompts/stats``.
+"""
+import hashlib
+import math
+import textwrap
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; a character-based estimate is used without it
+    tiktoken = None
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:  # the encoding file could not be fetched or loaded
+        _encoding = None
+
+# Per-message framing tokens added by chat formats (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text``: exact with tiktoken, otherwise a conservative estimate"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # About four characters per token for English; non-Latin scripts take a token for every character or two
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil((len(text) - non_ascii) / 4 + non_ascii / 1.5)
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def fit_history(history: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+    """The most recent messages of ``history`` whose tokens fit in ``max_tokens``, oldest first"""
+    kept, used = [], 0
+    for message in reversed(history):
+        used += estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if used > max_tokens:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when a rendered prompt would exceed its template's input token budget"""
+
+    def __init__(self, template: str, tokens: int, budget: int):
+        super().__init__(f"Prompt for {template} needs ~{tokens} input tokens, over its budget of {budget}")
+        self.template = template
+        self.tokens = tokens
+        self.budget = budget
+
+
+class RenderedPrompt(NamedTuple):
+    template: str
+    messages: List[Dict[str, str]]
+    input_tokens: int
+
+    @property
+    def cache_text(self) -> str:
+        """Stable text identifying this prompt, for response-cache keys"""
+        return "\n".join(f"{m['role']}: {m['content']}" for m in self.messages)
+
+
+class PromptTemplate:
+    """A static system prefix plus a ``str.format`` user template, with an input token budget"""
+
+    def __init__(self, name: str, system: str, user: str, max_input_tokens: int):
+        self.name = name
+        self.system = textwrap.dedent(system).strip()
+        self.user = textwrap.dedent(user).strip()
+        self.max_input_tokens = max_input_tokens
+        self.system_tokens = estimate_tokens(self.system) + MESSAGE_OVERHEAD_TOKENS
+        # Changes whenever the template text changes, so cached responses to an old version are not reused
+        self.version = hashlib.sha256(f"{self.system}\n{self.user}".encode("utf-8")).hexdigest()[:12]
+        self.renders = 0
+        self.rejected = 0
+        self.input_tokens_total = 0
+        self._recent: Deque[int] = deque(maxlen=500)
+
+    def history_budget(self, **values) -> int:
+        """Tokens left for prior turns once the system prefix and this user turn are counted"""
+        user_tokens = estimate_tokens(self.user.format(**values)) + MESSAGE_OVERHEAD_TOKENS
+        return max(0, self.max_input_tokens - self.system_tokens - user_tokens)
+
+    def render(self, history: Optional[List[Dict[str, str]]] = None, **values) -> RenderedPrompt:
+        """Messages for one call: system prefix, optional prior turns, then the user turn"""
+        messages = [{"role": "system", "content": self.system}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": self.user.format(**values)})
+        tokens = self.system_tokens + count_message_tokens(messages[1:])
+        if tokens > self.max_input_tokens:
+            self.rejected += 1
+            raise PromptBudgetExceeded(self.name, tokens, self.max_input_tokens)
+        self.renders += 1
+        self.input_tokens_total += tokens
+        self._recent.append(tokens)
+        return RenderedPrompt(self.name, messages, tokens)
+
+    def stats(self) -> dict:
+        recent = sorted(self._recent)
+        return {
+            "version": self.version,
+            "budget_tokens": self.max_input_tokens,
+            "system_prefix_tokens": self.system_tokens,
+            "renders": self.renders,
+            "rejected_over_budget": self.rejected,
+            "avg_input_tokens": round(self.input_tokens_total / self.renders, 1) if self.renders else 0.0,
+            "p95_input_tokens": recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0,
+            "max_input_tokens": recent[-1] if recent else 0,
+        }
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, system: str, user: str, max_input_tokens: int) -> PromptTemplate:
+        if name in self._templates:
+            raise ValueError(f"Prompt template {name} is already registered")
+        template = self._templates[name] = PromptTemplate(name, system, user, max_input_tokens)
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, history: Optional[List[Dict[str, str]]] = None, **values) -> RenderedPrompt:
+        return self._templates[name].render(history, **values)
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": "tiktoken/cl100k_base" if _encoding is not None else "estimate",
+            "templates": {name: template.stats() for name, template in self._templates.items()},
+        }
@@ -0,0 +1,167 @@
+"""
+On-disk bank of pre-generated, validated questions.
+
+The bank is a single SQLite file built offline by ``build_question_bank.py``
+and read by the API, so covered topics are served without any LLM call.
+Each row is one question, keyed by kind (``quick`` or ``mock``), scope
+(the subtopic for quick practice, the class/subject/chapter for mock tests),
+difficulty and language.  A unique index on the question fingerprint makes
+re-running the builder idempotent.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from near_duplicates import question_fingerprint
+
+logger = logging.getLogger(__name__)
+
+QUICK = "quick"
+MOCK = "mock"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    language TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS questions_identity
+    ON questions (kind, scope, difficulty, language, fingerprint);
+"""
+
+
+def mock_scope(class_name: str, subject: str, chapter: str) -> str:
+    """Scope key for a mock-test chapter"""
+    return json.dumps([class_name, subject, chapter], ensure_ascii=False)
+
+
+class QuestionBank:
+    """SQLite question store: bulk writes for the builder, cached random reads for the API"""
+
+    def __init__(self, path: str, readonly: bool = False, max_cached_scopes: int = 2048):
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        self._cache: "OrderedDict[Tuple[str, str, str, str], List[dict]]" = OrderedDict()
+        self.max_cached_scopes = max_cached_scopes
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open_if_exists(cls, path: Optional[str]) -> Optional["QuestionBank"]:
+        """Read-only bank at ``path``, or None if no bank has been built there"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls(path, readonly=True)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open question bank {path}: {e}")
+            return None
+
+    # Builder side
+
+    def count(self, kind: str, scope: str, difficulty: str, language: str) -> int:
+        row = self._db.execute(
+            "SELECT COUNT(*) FROM questions WHERE kind = ? AND scope = ? AND difficulty = ? AND language = ?",
+            (kind, scope, difficulty, language),
+        ).fetchone()
+        return row[0]
+
+    def fingerprints(self, kind: str, scope: str, difficulty: str, language: str) -> List[str]:
+        rows = self._db.execute(
+            "SELECT fingerprint FROM questions WHERE kind = ? AND scope = ? AND difficulty = ? AND language = ?",
+            (kind, scope, difficulty, language),
+        )
+        return [row[0] for row in rows]
+
+    def add(self, kind: str, scope: str, difficulty: str, language: str, questions: List[dict]) -> int:
+        """Insert questions, ignoring ones already stored; returns how many were new"""
+        now = time.time()
+        rows = [
+            (kind, scope, difficulty, language, question_fingerprint(q["question"]),
+             json.dumps(q, ensure_ascii=False, separators=(",", ":")), now)
+            for q in questions
+        ]
+        with self._db:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO questions (kind, scope, difficulty, language, fingerprint, body, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return cursor.rowcount
+
+    def totals(self) -> dict:
+        rows = self._db.execute("SELECT kind, COUNT(*) FROM questions GROUP BY kind").fetchall()
+        return {kind: total for kind, total in rows}
+
+    # API side
+
+    def _load(self, key: Tuple[str, str, str, str]) -> List[dict]:
+        questions = self._cache.get(key)
+        if questions is not None:
+            self._cache.move_to_end(key)
+            return questions
+        rows = self._db.execute(
+            "SELECT body FROM questions WHERE kind = ? AND scope = ? AND difficulty = ? AND language = ?",
+            key,
+        )
+        questions = [json.loads(row[0]) for row in rows]
+        self._cache[key] = questions
+        while len(self._cache) > self.max_cached_scopes:
+            self._cache.popitem(last=False)
+        return questions
+
+    def take(
+        self,
+        kind: str,
+        scope: str,
+        difficulty: str,
+        language: str,
+        count: int,
+        exclude: Optional[Callable[[dict], bool]] = None,
+    ) -> Optional[List[dict]]:
+        """A random selection of ``count`` stored questions, or None if the bank cannot cover it"""
+        try:
+            stored = self._load((kind, scope, difficulty, language))
+        except sqlite3.Error as e:
+            logger.warning(f"Question bank read failed: {e}")
+            stored = []
+        chosen = []
+        for q in random.sample(stored, len(stored)):
+            if exclude is None or not exclude(q):
+                chosen.append(dict(q))
+                if len(chosen) == count:
+                    break
+        if len(chosen) < count:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return chosen
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cached_scopes": len(self._cache),
+        }
+
+    def close(self):
+        self._db.close()
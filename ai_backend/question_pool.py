@@ -0,0 +1,165 @@
+"""
+Warm pool of pre-generated, validated questions.
+
+Questions are bucketed by an arbitrary hashable key (for example
+``("quiz", subtopic, difficulty, language)``).  Requests take questions out of
+their bucket without touching the LLM; whenever a bucket drops below its
+low-water mark a background task tops it back up to capacity, with a global
+bound on how many refills run at once.  Questions older than ``max_age``
+seconds are evicted before every read.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Generator = Callable[[Hashable], Awaitable[List[dict]]]
+
+
+class QuestionPool:
+    """Per-key question buckets served instantly and refilled in the background"""
+
+    def __init__(
+        self,
+        name: str,
+        generator: Generator,
+        capacity: int = 30,
+        low_water: int = 10,
+        refill_concurrency: int = 4,
+        max_age: float = 3600.0,
+        max_refill_attempts: int = 3,
+    ):
+        self.name = name
+        self.generator = generator
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_age = max_age
+        self.max_refill_attempts = max_refill_attempts
+        self._buckets: Dict[Hashable, Deque[Tuple[float, dict]]] = {}
+        self._refilling: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._refill_semaphore = asyncio.Semaphore(refill_concurrency)
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.evicted = 0
+        self.refill_failures = 0
+
+    def _evict_stale(self, key: Hashable):
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return
+        cutoff = time.monotonic() - self.max_age
+        while bucket and bucket[0][0] < cutoff:
+            bucket.popleft()
+            self.evicted += 1
+
+    def size(self, key: Hashable) -> int:
+        bucket = self._buckets.get(key)
+        return len(bucket) if bucket else 0
+
+    def take(
+        self,
+        key: Hashable,
+        count: int,
+        exclude: Optional[Callable[[dict], bool]] = None,
+    ) -> Optional[List[dict]]:
+        """Pop ``count`` questions for ``key``, or return None (a miss) if the bucket is short
+
+        Questions for which ``exclude`` returns True are skipped and left in the
+        bucket for other callers.
+        """
+        self._evict_stale(key)
+        bucket = self._buckets.setdefault(key, deque())
+        chosen = []
+        for index, (_, q) in enumerate(bucket):
+            if exclude is None or not exclude(q):
+                chosen.append(index)
+                if len(chosen) == count:
+                    break
+        if len(chosen) == count:
+            picked = set(chosen)
+            questions = [bucket[i][1] for i in chosen]
+            self._buckets[key] = bucket = deque(item for i, item in enumerate(bucket) if i not in picked)
+            self.hits += 1
+        else:
+            questions = None
+            self.misses += 1
+        if len(bucket) < self.low_water:
+            self.schedule_refill(key)
+        return questions
+
+    def put(self, key: Hashable, questions: List[dict]) -> int:
+        """Add questions to a bucket, skipping duplicates and anything past capacity"""
+        bucket = self._buckets.setdefault(key, deque())
+        seen = {q["question"] for _, q in bucket}
+        now = time.monotonic()
+        added = 0
+        for q in questions:
+            if len(bucket) >= self.capacity:
+                break
+            if q["question"] in seen:
+                continue
+            seen.add(q["question"])
+            bucket.append((now, q))
+            added += 1
+        self.generated += added
+        return added
+
+    def schedule_refill(self, key: Hashable):
+        """Start a background refill for ``key`` unless one is already running"""
+        if key in self._refilling:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refilling.add(key)
+        task = loop.create_task(self._refill(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, key: Hashable):
+        try:
+            async with self._refill_semaphore:
+                attempts = 0
+                while self.size(key) < self.capacity and attempts < self.max_refill_attempts:
+                    attempts += 1
+                    try:
+                        questions = await self.generator(key)
+                    except Exception as e:
+                        self.refill_failures += 1
+                        logger.warning(f"[{self.name} pool] refill failed for {key}: {e}")
+                        continue
+                    added = self.put(key, questions)
+                    logger.info(f"[{self.name} pool] refilled {key} with {added} questions ({self.size(key)}/{self.capacity})")
+        finally:
+            self._refilling.discard(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "miss_rate": round(self.misses / lookups, 4) if lookups else 0.0,
+            "buckets": len(self._buckets),
+            "pooled_questions": sum(len(b) for b in self._buckets.values()),
+            "generated": self.generated,
+            "evicted": self.evicted,
+            "refills_in_progress": len(self._refilling),
+            "refill_failures": self.refill_failures,
+            "capacity": self.capacity,
+            "low_water": self.low_water,
+            "max_age_seconds": self.max_age,
+        }
+
+    async def aclose(self):
+        """Cancel any refills still running"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,184 @@
+"""
+Resilience around upstream LLM calls: deadline budgets, a circuit breaker and
+optional hedged requests.
+
+``CircuitBreaker`` keeps a rolling window of call outcomes.  When enough calls
+in the window failed, or were slower than ``slow_call_seconds``, it opens and
+rejects calls immediately with ``CircuitOpenError`` so endpoints can serve
+fallback or pooled content instead of waiting on a struggling upstream.
+After ``reset_timeout`` it lets a single trial call through (half-open); a
+success closes it again, a failure re-opens it.
+
+``call_with_resilience`` runs one call under a breaker and a total deadline,
+and can hedge: if the first attempt has not finished after ``hedge_delay``
+(normally the breaker's observed p95), a second identical attempt is started
+and whichever succeeds first wins.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Rolling-window error/latency circuit breaker for one upstream"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        slow_call_rate: float = 0.8,
+        reset_timeout: float = 30.0,
+        min_hedge_samples: int = 20,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.reset_timeout = reset_timeout
+        self.min_hedge_samples = min_hedge_samples
+        self.state = self.CLOSED
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def record(self, ok: bool, latency: float):
+        if ok:
+            self._latencies.append(latency)
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+            if ok and latency < self.slow_call_seconds:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append((ok, latency))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for succeeded, _ in self._outcomes if not succeeded)
+        slow = sum(1 for _, elapsed in self._outcomes if elapsed >= self.slow_call_seconds)
+        if (failures / len(self._outcomes) >= self.failure_rate
+                or slow / len(self._outcomes) >= self.slow_call_rate):
+            self._open()
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected, without claiming a half-open trial"""
+        return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def release(self):
+        """Forget a call that was cancelled before it produced an outcome"""
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def p95(self) -> Optional[float]:
+        """95th-percentile latency of recent successful calls, once enough are recorded"""
+        if len(self._latencies) < self.min_hedge_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def status(self) -> dict:
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_failures": failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_seconds": (
+                max(0.0, round(self.reset_timeout - (time.monotonic() - self._opened_at), 1))
+                if self.state == self.OPEN else 0.0
+            ),
+            "p95_latency_seconds": round(p95, 3) if p95 is not None else None,
+            "hedged_calls": self.hedged_calls,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+async def _hedged(breaker: CircuitBreaker, fn: Callable[[], Awaitable], hedge_delay: Optional[float]):
+    primary = asyncio.ensure_future(fn())
+    tasks = [primary]
+    try:
+        if hedge_delay is None:
+            return await primary
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            breaker.hedged_calls += 1
+            tasks.append(asyncio.ensure_future(fn()))
+
+        last_error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        breaker.hedge_wins += 1
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_resilience(
+    breaker: CircuitBreaker,
+    fn: Callable[[], Awaitable],
+    deadline: float,
+    hedge_delay: Optional[float] = None,
+):
+    """Run ``fn`` under ``breaker`` within ``deadline`` seconds, optionally hedging after ``hedge_delay``"""
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit for {breaker.name} is open")
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(_hedged(breaker, fn, hedge_delay), deadline)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(True, time.monotonic() - started)
+    return result
@@ -0,0 +1,156 @@
+"""
+Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 of the whitespace-normalised prompt, model and temperature,
+prefixed with a namespace (``notes``, ``study_plan`` ...) so each endpoint can
+be invalidated on its own.  Lookups go to a bounded in-process LRU first and
+then to an optional shared Redis tier; Redis hits are copied into the LRU.
+Entries in the LRU live at most ``local_ttl`` seconds so an invalidation in
+one worker reaches the others quickly.  Any Redis failure degrades to the
+local tier instead of failing the request.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; the local tier works on its own
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in prompt templates don't split the cache"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class ResponseCache:
+    """Two-tier (LRU + Redis) TTL cache for generated text"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        local_ttl: float = 300.0,
+        redis_url: Optional[str] = None,
+        key_prefix: str = "ai_backend:llm:",
+    ):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.key_prefix = key_prefix
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        elif redis_url:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using local cache only")
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str, model: str, temperature: float) -> str:
+        digest = hashlib.sha256(
+            f"{model}\n{temperature}\n{normalize_prompt(prompt)}".encode("utf-8")
+        ).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def _local_get(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: str, ttl: float):
+        self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self._local_get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(self.key_prefix + key)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.redis_hits += 1
+                self._local_set(key, value, self.local_ttl)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str, ttl: float):
+        if ttl <= 0:
+            return
+        self.sets += 1
+        self._local_set(key, value, ttl)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self.key_prefix + key, value, px=max(1, int(ttl * 1000)))
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis cache write failed: {e}")
+
+    async def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Drop every entry, or only those in ``namespace``; returns the number of local entries removed"""
+        prefix = f"{namespace}:" if namespace else ""
+        stale = [key for key in self._local if key.startswith(prefix)]
+        for key in stale:
+            del self._local[key]
+        self.invalidations += 1
+        if self._redis is not None:
+            try:
+                batch = []
+                async for redis_key in self._redis.scan_iter(match=f"{self.key_prefix}{prefix}*", count=500):
+                    batch.append(redis_key)
+                    if len(batch) >= 500:
+                        await self._redis.delete(*batch)
+                        batch = []
+                if batch:
+                    await self._redis.delete(*batch)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis cache invalidation failed: {e}")
+        return len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "sets": self.sets,
+            "entries": len(self._local),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "redis_enabled": self._redis is not None,
+            "redis_errors": self.redis_errors,
+        }
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.close()
@@ -0,0 +1,135 @@
+"""
+Per-student record of questions already served.
+
+For every (student, kind, scope) - e.g. ("42", "quick", subtopic) - the store
+keeps:
+
+* a capped set of question fingerprints (32-byte MinHash signatures from
+  ``near_duplicates``) so callers can build a near-duplicate filter, and
+* the number of attempts, which drives difficulty progression.
+
+With ``REDIS_URL`` set the data lives in Redis (a sorted set and a counter
+per scope, both with a sliding expiry) so every uvicorn worker sees the same
+history and it survives restarts.  Without Redis an in-process LRU of scopes
+is used instead.  Memory is bounded either way: at most ``max_seen``
+fingerprints per scope.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; the local store works on its own
+    aioredis = None
+
+from near_duplicates import question_fingerprint
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_STUDENT = "anonymous"
+
+
+class _LocalScope:
+    __slots__ = ("fingerprints", "attempts")
+
+    def __init__(self):
+        self.fingerprints: "OrderedDict[str, None]" = OrderedDict()
+        self.attempts = 0
+
+
+class SeenQuestionStore:
+    """Bounded per-student seen-question history, shared through Redis when available"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        max_seen: int = 500,
+        ttl: int = 90 * 24 * 3600,
+        max_local_scopes: int = 10000,
+        key_prefix: str = "ai_backend:seen:",
+    ):
+        self.max_seen = max_seen
+        self.ttl = ttl
+        self.max_local_scopes = max_local_scopes
+        self.key_prefix = key_prefix
+        self._local: "OrderedDict[Tuple[str, str, str], _LocalScope]" = OrderedDict()
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        self.redis_errors = 0
+
+    def _redis_key(self, student_id: str, kind: str, scope: str, field: str) -> str:
+        scope_hash = hashlib.blake2b(scope.encode("utf-8"), digest_size=8).hexdigest()
+        return f"{self.key_prefix}{student_id}:{kind}:{scope_hash}:{field}"
+
+    def _local_scope(self, student_id: str, kind: str, scope: str) -> _LocalScope:
+        key = (student_id, kind, scope)
+        entry = self._local.get(key)
+        if entry is None:
+            entry = _LocalScope()
+            self._local[key] = entry
+            while len(self._local) > self.max_local_scopes:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(key)
+        return entry
+
+    async def history(self, student_id: str, kind: str, scope: str) -> Tuple[Set[str], int]:
+        """Return (seen fingerprints, attempt count) in one round trip"""
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.zrange(self._redis_key(student_id, kind, scope, "fp"), 0, -1)
+                pipe.get(self._redis_key(student_id, kind, scope, "attempts"))
+                fingerprints, attempts = await pipe.execute()
+                return set(fingerprints), int(attempts or 0)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Seen-question store read failed, using local history: {e}")
+        entry = self._local_scope(student_id, kind, scope)
+        return set(entry.fingerprints), entry.attempts
+
+    async def record_attempt(self, student_id: str, kind: str, scope: str, questions: Iterable[str]):
+        """Remember the questions served in one attempt and count the attempt"""
+        fingerprints = [question_fingerprint(q) for q in questions]
+
+        if self._redis is not None:
+            try:
+                fp_key = self._redis_key(student_id, kind, scope, "fp")
+                attempts_key = self._redis_key(student_id, kind, scope, "attempts")
+                now = time.time()
+                pipe = self._redis.pipeline(transaction=False)
+                if fingerprints:
+                    pipe.zadd(fp_key, {fp: now for fp in fingerprints})
+                    pipe.zremrangebyrank(fp_key, 0, -(self.max_seen + 1))
+                pipe.incr(attempts_key)
+                for key in (fp_key, attempts_key):
+                    pipe.expire(key, self.ttl)
+                await pipe.execute()
+                return
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Seen-question store write failed, recording locally: {e}")
+
+        entry = self._local_scope(student_id, kind, scope)
+        for fp in fingerprints:
+            entry.fingerprints[fp] = None
+            entry.fingerprints.move_to_end(fp)
+        while len(entry.fingerprints) > self.max_seen:
+            entry.fingerprints.popitem(last=False)
+        entry.attempts += 1
+
+    def stats(self) -> dict:
+        return {
+            "redis_enabled": self._redis is not None,
+            "redis_errors": self.redis_errors,
+            "local_scopes": len(self._local),
+            "max_seen_per_scope": self.max_seen,
+        }
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.close()
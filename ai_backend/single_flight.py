@@ -0,0 +1,61 @@
+"""
+Single-flight coalescing of identical concurrent generations.
+
+The first caller for a key starts the work as its own task; callers that
+arrive with the same key while it is running await that task instead of
+starting another upstream call, and all of them receive the same result (or
+the same exception).  The task is shielded, so a leader whose client
+disconnects does not cancel the call for everyone else.
+
+Exceptions listed in ``leader_errors`` belong to the leader alone (an
+admission rejection of the leader's own requester, for instance): a
+follower that sees one runs the call again with its own ``fn``, as a new
+leader or by joining whoever got there first.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, Type
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]], leader_errors: Tuple[Type[BaseException], ...] = ()
+    ) -> Any:
+        while True:
+            task = self._calls.get(key)
+            leader = task is None
+            if leader:
+                self.leaders += 1
+                task = asyncio.ensure_future(fn())
+                self._calls[key] = task
+                task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            else:
+                self.coalesced += 1
+            try:
+                return await asyncio.shield(task)
+            except leader_errors:
+                if leader:
+                    raise
+                self.retried += 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "followers_retried": self.retried,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,122 @@
+"""
+Incremental parser for a JSON array of objects arriving as a token stream.
+
+LLM completions for quiz generation are a JSON array of question objects,
+often wrapped in markdown fences or preceded by a sentence of prose.
+``JSONArrayItemParser`` ignores everything before the first ``[`` and
+tracks brace depth and string/escape state character by character, so each
+top-level object is handed back the moment its closing brace arrives.  An
+object that fails to parse is dropped on its own; the rest of the array is
+still used.
+
+Positions are array indexes: every top-level element counts (objects that
+fail to parse, and non-object elements, included), so a logged position
+points at the element in the raw completion.
+"""
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+
+class JSONArrayItemParser:
+    """Feed text chunks in, get complete top-level array objects out"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._item_start = -1
+        self._in_string = False
+        self._escaped = False
+        self._element = 0
+        self._item_element = -1
+        self.parsed = 0
+        self.dropped = 0
+        self.dropped_positions = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume one chunk and return the objects it completed"""
+        return [item for _, item in self.feed_positioned(chunk)]
+
+    def feed_positioned(self, chunk: str) -> List[Tuple[int, dict]]:
+        """Consume one chunk and return (array index, object) for the objects it completed"""
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if not self._in_array:
+                if ch == "[" and not self._finished:
+                    self._in_array = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "," and self._depth == 1:
+                # Separator between top-level elements, whatever their kind
+                self._element += 1
+            elif ch in "{[":
+                if self._depth == 1 and ch == "{":
+                    self._item_start = i
+                    self._item_element = self._element
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and ch == "}" and self._item_start >= 0:
+                    item = self._decode(buffer[self._item_start:i + 1])
+                    if item is not None:
+                        items.append((self._item_element, item))
+                    else:
+                        self.dropped_positions.append(self._item_element)
+                    self._item_start = -1
+                elif self._depth <= 0:
+                    # End of the array; anything after it is ignored
+                    self._in_array = False
+                    self._finished = True
+                    self._depth = 0
+            i += 1
+
+        # Keep only the unfinished item (if any) so the buffer stays small
+        keep_from = self._item_start if self._item_start >= 0 else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._item_start >= 0:
+            self._item_start = 0
+        return items
+
+    def _decode(self, text: str):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            self.dropped += 1
+            return None
+        if not isinstance(item, dict):
+            self.dropped += 1
+            return None
+        self.parsed += 1
+        return item
+
+
+async def iter_json_array_items(deltas: AsyncIterator[str], parser: Optional[JSONArrayItemParser] = None) -> AsyncIterator[dict]:
+    """Yield each top-level object of a streamed JSON array as soon as it is complete"""
+    async for _, item in iter_json_array_positioned(deltas, parser):
+        yield item
+
+
+async def iter_json_array_positioned(deltas: AsyncIterator[str], parser: Optional[JSONArrayItemParser] = None) -> AsyncIterator[Tuple[int, dict]]:
+    """Like iter_json_array_items, with each object's index in the array"""
+    parser = parser or JSONArrayItemParser()
+    async for delta in deltas:
+        for positioned in parser.feed_positioned(delta):
+            yield positioned
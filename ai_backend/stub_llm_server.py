@@ -0,0 +1,365 @@
+"""
+Local OpenAI-compatible stub of ``/v1/chat/completions`` for load tests.
+
+Answers every request the API can make without calling a real provider:
+quiz and mock-test batches (as a bare JSON array, or wrapped in
+``{"questions": [...]}`` when a ``response_format`` is sent), question
+translations, conversation summaries and free-text assistant answers.  The
+kind of request is recognised from the prompt text.
+
+Behaviour is configurable so the API's resilience paths can be exercised:
+
+* latency: time to first token drawn from a fixed, uniform or lognormal
+  distribution, plus a per-chunk delay while streaming;
+* ``--malformed-rate``: the share of generated questions whose JSON is broken;
+* ``--error-rate`` / ``--error-status``: the share of calls answered with an
+  HTTP error, and ``--hang-rate`` for calls that never answer;
+* ``--replay``: serve recorded completions (JSONL of ``{"kind", "content"}``)
+  round-robin per kind instead of synthesising them, and ``--record-upstream``
+  with ``--record-to`` to capture such a file from a real provider.
+
+Streaming responses are SSE chunks in the OpenAI format, with a final usage
+chunk when ``stream_options.include_usage`` is set.
+
+    python stub_llm_server.py --port 9100 --latency lognormal:0.8:0.4 --malformed-rate 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger("stub_llm_server")
+
+WORDS = (
+    "energy force motion light sound matter cell plant animal water air soil number fraction angle "
+    "triangle equation variable program computer data memory sentence grammar poem story history "
+    "river mountain climate trade government citizen"
+).split()
+
+
+class LatencyModel:
+    """Seconds before the first token: ``fixed:S``, ``uniform:LO:HI`` or ``lognormal:MEDIAN:SIGMA``"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda: random.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            mu = math.log(values[0])
+            self._sample = lambda: random.lognormvariate(mu, values[1])
+        else:
+            raise ValueError(f"Unknown latency spec {spec!r}")
+
+    def sample(self) -> float:
+        return max(0.0, self._sample())
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: str = "fixed:0.2",
+        chunk_delay: float = 0.01,
+        chunk_chars: int = 24,
+        malformed_rate: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        hang_rate: float = 0.0,
+        replay: Optional[str] = None,
+        record_upstream: Optional[str] = None,
+        record_to: Optional[str] = None,
+        upstream_key: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = LatencyModel(latency)
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.replay = replay
+        self.record_upstream = record_upstream
+        self.record_to = record_to
+        self.upstream_key = upstream_key
+        if seed is not None:
+            random.seed(seed)
+
+
+# -------------------------------
+# Synthetic completions
+# -------------------------------
+def classify(messages: List[Dict[str, str]]) -> str:
+    text = "\n".join(m.get("content", "") for m in messages)
+    if "Target language:" in text and "Questions:" in text:
+        return "translation"
+    if "running summary of a tutoring conversation" in text:
+        return "summary"
+    if "multiple-choice questions" in text and re.search(r'"answer":\s*"C"', text):
+        return "mock_test"
+    if "multiple-choice questions" in text:
+        return "quiz"
+    return "text"
+
+
+def _sentence(n: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(n))
+
+
+def _requested_count(messages: List[Dict[str, str]], default: int = 10) -> int:
+    match = re.search(r"Generate (\d+) multiple-choice questions", messages[-1].get("content", ""))
+    return int(match.group(1)) if match else default
+
+
+def _question(kind: str) -> dict:
+    options = [_sentence(3) + f" ({i})" for i in range(4)]
+    correct = random.randrange(4)
+    if kind == "mock_test":
+        return {
+            "question": _sentence(9).capitalize() + "?",
+            "options": dict(zip("ABCD", options)),
+            "answer": "ABCD"[correct],
+        }
+    return {"question": _sentence(9).capitalize() + "?", "options": options, "answer": options[correct]}
+
+
+def _questions_json(kind: str, count: int, malformed_rate: float, wrapped: bool) -> str:
+    items = []
+    for _ in range(count):
+        item = json.dumps(_question(kind), ensure_ascii=False)
+        if random.random() < malformed_rate:
+            # Break the object but keep the braces balanced, as models typically do
+            item = item.replace('", "', '" "', 1)
+        items.append(item)
+    array = "[\n  " + ",\n  ".join(items) + "\n]"
+    if wrapped:
+        return '{"questions": ' + array + "}"
+    return "```json\n" + array + "\n```"
+
+
+def _translation(messages: List[Dict[str, str]]) -> str:
+    content = messages[-1]["content"]
+    language = re.search(r"Target language: ([^.\n]+)", content).group(1)
+    items = json.loads(content.split("Questions:", 1)[1].strip())
+    return json.dumps([
+        {
+            "id": item["id"],
+            "question": f"[{language}] {item['question']}",
+            "options": [f"[{language}] {option}" for option in item["options"]],
+        }
+        for item in items
+    ], ensure_ascii=False)
+
+
+def _text_answer() -> str:
+    sections = []
+    for heading in ("💡 CONCEPT EXPLANATION", "🎯 What is it?", "🌍 Real Example:", "📝 SUMMARY"):
+        sections.append(heading + "\n" + "\n".join(f"• {_sentence(10)}" for _ in range(4)))
+    return "\n───────────────\n".join(sections)
+
+
+def synthesize(kind: str, body: dict, config: StubConfig) -> str:
+    messages = body.get("messages", [])
+    if kind in ("quiz", "mock_test"):
+        return _questions_json(kind, _requested_count(messages), config.malformed_rate, "response_format" in body)
+    if kind == "translation":
+        return _translation(messages)
+    if kind == "summary":
+        return "The student asked about " + _sentence(12) + "."
+    return _text_answer()
+
+
+class Replayer:
+    """Recorded completions served round-robin per request kind"""
+
+    def __init__(self, path: str):
+        recorded: Dict[str, List[str]] = defaultdict(list)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recorded[entry["kind"]].append(entry["content"])
+        self._cycles = {kind: itertools.cycle(contents) for kind, contents in recorded.items()}
+
+    def next(self, kind: str) -> Optional[str]:
+        cycle = self._cycles.get(kind)
+        return next(cycle) if cycle is not None else None
+
+
+# -------------------------------
+# Wire format
+# -------------------------------
+def _usage(body: dict, content: str) -> dict:
+    prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+    prompt_tokens = prompt_chars // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _completion(body: dict, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(body, content),
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _pieces(content: str, size: int) -> Iterator[str]:
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    replayer = Replayer(config.replay) if config.replay else None
+    stats = defaultdict(int)
+    upstream = httpx.AsyncClient(timeout=120) if config.record_upstream else None
+
+    async def record(kind: str, body: dict) -> str:
+        """Fetch a real completion (non-streaming) and append it to the recording"""
+        response = await upstream.post(
+            config.record_upstream.rstrip("/") + "/chat/completions",
+            json={key: value for key, value in body.items() if key not in ("stream", "stream_options")},
+            headers={"Authorization": f"Bearer {config.upstream_key}"},
+        )
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        with open(config.record_to, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"kind": kind, "content": content}, ensure_ascii=False) + "\n")
+        return content
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        kind = classify(body.get("messages", []))
+        stats[f"requests_{kind}"] += 1
+
+        roll = random.random()
+        if roll < config.hang_rate:
+            stats["hung"] += 1
+            await asyncio.sleep(3600)
+        if roll < config.hang_rate + config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(config.latency.sample() / 4)
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"message": "Injected upstream error", "type": "stub_error"}},
+            )
+
+        content = None
+        if upstream is not None:
+            content = await record(kind, body)
+        elif replayer is not None:
+            content = replayer.next(kind)
+        if content is None:
+            content = synthesize(kind, body, config)
+
+        first_token_delay = config.latency.sample()
+        if not body.get("stream"):
+            # Non-streaming calls pay for the whole generation up front
+            pieces = max(1, len(content) // config.chunk_chars)
+            await asyncio.sleep(first_token_delay + pieces * config.chunk_delay)
+            return JSONResponse(content=_completion(body, content))
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "stub")
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            await asyncio.sleep(first_token_delay)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for piece in _pieces(content, config.chunk_chars):
+                yield _chunk(completion_id, model, {"content": piece})
+                if config.chunk_delay:
+                    await asyncio.sleep(config.chunk_delay)
+            yield _chunk(completion_id, model, {}, finish_reason="stop")
+            if include_usage:
+                yield _chunk(completion_id, model, {}, usage=_usage(body, content))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return JSONResponse(content=dict(stats))
+
+    @app.on_event("shutdown")
+    async def close_upstream():
+        if upstream is not None:
+            await upstream.aclose()
+
+    return app
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="fixed:0.2", help="fixed:S, uniform:LO:HI or lognormal:MEDIAN:SIGMA (seconds to first token)")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="characters per streamed chunk")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of generated questions with broken JSON")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of calls that never answer")
+    parser.add_argument("--replay", help="JSONL of recorded {kind, content} completions to serve")
+    parser.add_argument("--record-upstream", help="real API base URL to fetch (and record) completions from")
+    parser.add_argument("--record-to", default="recorded_completions.jsonl", help="file --record-upstream appends to")
+    parser.add_argument("--upstream-key", help="API key for --record-upstream")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        chunk_chars=args.chunk_chars,
+        malformed_rate=args.malformed_rate,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        replay=args.replay,
+        record_upstream=args.record_upstream,
+        record_to=args.record_to,
+        upstream_key=args.upstream_key,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    arg_parser = argparse.ArgumentParser(description="OpenAI-compatible stub for offline load tests")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(arg_parser)
+    arguments = arg_parser.parse_args()
+    uvicorn.run(create_stub_app(config_from_args(arguments)), host=arguments.host, port=arguments.port, log_level="warning")
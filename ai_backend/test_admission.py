@@ -0,0 +1,126 @@
+"""
+Tests for admission.AdmissionController: priority order, per-requester caps and latency budgets.
+
+    cd ai_backend && python -m unittest test_admission
+"""
+import asyncio
+import unittest
+
+from admission import AdmissionController, AdmissionRejected
+
+PRIORITIES = ["interactive", "generation", "mock_test", "background"]
+
+
+def controller(max_in_flight=1, budgets=None, **kwargs):
+    return AdmissionController(
+        "test-model",
+        max_in_flight=max_in_flight,
+        priorities=PRIORITIES,
+        budgets=budgets or {priority: None for priority in PRIORITIES},
+        **kwargs,
+    )
+
+
+class PriorityOrderTests(unittest.IsolatedAsyncioTestCase):
+    async def test_queued_requests_are_admitted_highest_priority_first(self):
+        admission = controller()
+        held = await admission.acquire("generation")
+        granted = []
+
+        async def wait_for_slot(priority, label):
+            async with admission.slot(priority):
+                granted.append(label)
+
+        waiters = []
+        for priority, label in (("background", "background"), ("mock_test", "mock"), ("interactive", "chat-1"),
+                                ("interactive", "chat-2")):
+            waiters.append(asyncio.ensure_future(wait_for_slot(priority, label)))
+            await asyncio.sleep(0)
+        self.assertEqual(admission.stats()["queue_depth"]["interactive"], 2)
+
+        held.release()
+        await asyncio.gather(*waiters)
+        # FIFO within a class, classes in priority order
+        self.assertEqual(granted, ["chat-1", "chat-2", "mock", "background"])
+        self.assertEqual(admission.in_flight, 0)
+
+    async def test_weighted_request_waits_for_enough_units(self):
+        admission = controller(max_in_flight=3)
+        small = await admission.acquire("generation")
+        large = asyncio.ensure_future(admission.acquire("mock_test", weight=3))
+        await asyncio.sleep(0)
+        self.assertFalse(large.done())
+        small.release()
+        ticket = await large
+        self.assertEqual(admission.in_flight, 3)
+        ticket.release()
+        self.assertEqual(admission.in_flight, 0)
+
+
+class RequesterLimitTests(unittest.IsolatedAsyncioTestCase):
+    async def test_requester_over_its_cap_is_rejected(self):
+        admission = controller(max_in_flight=10, per_requester_limit=2)
+        tickets = [await admission.acquire("interactive", "student:1") for _ in range(2)]
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await admission.acquire("interactive", "student:1")
+        self.assertEqual(rejected.exception.reason, "requester_limit")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+        # Other students, and requests with no requester, are not affected
+        other = await admission.acquire("interactive", "student:2")
+        anonymous = [await admission.acquire("interactive") for _ in range(5)]
+
+        tickets[0].release()
+        tickets.append(await admission.acquire("interactive", "student:1"))
+        for ticket in tickets[1:] + [other] + anonymous:
+            ticket.release()
+        self.assertEqual(admission.stats()["requesters_active"], 0)
+
+    async def test_requester_kind_can_have_its_own_cap(self):
+        admission = controller(max_in_flight=20, per_requester_limit=2, requester_limits={"address": 5})
+        tickets = [await admission.acquire("generation", "address:10.0.0.1") for _ in range(5)]
+        with self.assertRaises(AdmissionRejected):
+            await admission.acquire("generation", "address:10.0.0.1")
+        for ticket in tickets:
+            ticket.release()
+
+    async def test_rejected_or_cancelled_request_gives_back_its_requester_count(self):
+        admission = controller(per_requester_limit=1, budgets={**{p: None for p in PRIORITIES}, "interactive": 0.05},
+                               initial_service_time=0.01)
+        held = await admission.acquire("generation")
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await admission.acquire("interactive", "student:1")
+        self.assertEqual(rejected.exception.reason, "queue_timeout")
+
+        waiter = asyncio.ensure_future(admission.acquire("background", "student:1"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        held.release()
+        ticket = await admission.acquire("interactive", "student:1")
+        ticket.release()
+        self.assertEqual(admission.in_flight, 0)
+
+
+class BudgetTests(unittest.IsolatedAsyncioTestCase):
+    async def test_request_over_its_budget_is_rejected_straight_away(self):
+        admission = controller(budgets={**{p: None for p in PRIORITIES}, "generation": 1}, initial_service_time=10)
+        held = await admission.acquire("interactive")
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await admission.acquire("generation", "student:1")
+        self.assertEqual(rejected.exception.reason, "queue_over_budget")
+        self.assertEqual(rejected.exception.retry_after, 10)
+        self.assertEqual(admission.stats()["rejected"], {"queue_over_budget": 1})
+        self.assertEqual(admission.stats()["requesters_active"], 0)
+
+        # A class without a budget still queues
+        background = asyncio.ensure_future(admission.acquire("background"))
+        await asyncio.sleep(0)
+        held.release()
+        (await background).release()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Tests for resilience.CircuitBreaker and call_with_resilience (deadlines and hedging).
+
+    cd ai_backend && python -m unittest test_resilience
+"""
+import asyncio
+import time
+import unittest
+
+from resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+
+def breaker(**kwargs):
+    options = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0, slow_call_rate=0.75,
+                   reset_timeout=0.05, min_hedge_samples=3)
+    options.update(kwargs)
+    return CircuitBreaker("test-model", **options)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_when_the_failure_rate_is_reached(self):
+        circuit = breaker()
+        for ok in (True, True, False):
+            circuit.record(ok, 0.1)
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+        circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+        self.assertFalse(circuit.allow())
+        self.assertTrue(circuit.is_open())
+        self.assertEqual(circuit.status()["rejected"], 1)
+
+    def test_stays_closed_below_min_calls(self):
+        circuit = breaker()
+        for _ in range(3):
+            circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+
+    def test_opens_on_slow_calls(self):
+        circuit = breaker()
+        for elapsed in (2.0, 2.0, 2.0, 0.1):
+            circuit.record(True, elapsed)
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+
+    def test_half_open_allows_one_trial_and_closes_on_success(self):
+        circuit = breaker()
+        for _ in range(4):
+            circuit.record(False, 0.1)
+        time.sleep(0.06)
+        self.assertTrue(circuit.allow())
+        self.assertEqual(circuit.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(circuit.allow())  # the trial is already in flight
+        circuit.record(True, 0.1)
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+        self.assertEqual(circuit.status()["window_calls"], 0)
+
+    def test_failed_or_slow_trial_reopens(self):
+        circuit = breaker()
+        for _ in range(4):
+            circuit.record(False, 0.1)
+        for ok, elapsed in ((False, 0.1), (True, 2.0)):
+            time.sleep(0.06)
+            self.assertTrue(circuit.allow())
+            circuit.record(ok, elapsed)
+            self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+        self.assertEqual(circuit.times_opened, 3)
+
+    def test_released_trial_lets_the_next_call_through(self):
+        circuit = breaker()
+        for _ in range(4):
+            circuit.record(False, 0.1)
+        time.sleep(0.06)
+        self.assertTrue(circuit.allow())
+        circuit.release()
+        self.assertTrue(circuit.allow())
+
+    def test_p95_needs_enough_samples(self):
+        circuit = breaker()
+        circuit.record(True, 0.1)
+        self.assertIsNone(circuit.p95())
+        for elapsed in (0.2, 0.3, 0.4):
+            circuit.record(True, elapsed)
+        self.assertEqual(circuit.p95(), 0.4)
+
+
+class CallWithResilienceTests(unittest.IsolatedAsyncioTestCase):
+    async def test_success_is_recorded(self):
+        circuit = breaker()
+
+        async def call():
+            return "ok"
+
+        self.assertEqual(await call_with_resilience(circuit, call, deadline=1), "ok")
+        self.assertEqual(circuit.status()["window_calls"], 1)
+        self.assertEqual(circuit.status()["window_failures"], 0)
+
+    async def test_deadline_is_a_recorded_failure(self):
+        circuit = breaker()
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await call_with_resilience(circuit, hang, deadline=0.05)
+        self.assertEqual(circuit.status()["window_failures"], 1)
+
+    async def test_open_circuit_rejects_without_calling(self):
+        circuit = breaker()
+        for _ in range(4):
+            circuit.record(False, 0.1)
+        calls = []
+
+        async def call():
+            calls.append(1)
+
+        with self.assertRaises(CircuitOpenError):
+            await call_with_resilience(circuit, call, deadline=1)
+        self.assertEqual(calls, [])
+
+    async def test_hedge_wins_when_the_first_attempt_is_slow(self):
+        circuit = breaker()
+        attempts = []
+        cancelled = []
+
+        async def call():
+            attempt = len(attempts)
+            attempts.append(attempt)
+            try:
+                await asyncio.sleep(5 if attempt == 0 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(attempt)
+                raise
+            return attempt
+
+        self.assertEqual(await call_with_resilience(circuit, call, deadline=1, hedge_delay=0.05), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, [0])
+        self.assertEqual((circuit.hedged_calls, circuit.hedge_wins), (1, 1))
+
+    async def test_hedge_failure_falls_back_to_the_primary(self):
+        circuit = breaker()
+        attempts = []
+
+        async def call():
+            attempt = len(attempts)
+            attempts.append(attempt)
+            if attempt == 1:
+                raise RuntimeError("hedge failed")
+            await asyncio.sleep(0.1)
+            return "primary"
+
+        self.assertEqual(await call_with_resilience(circuit, call, deadline=1, hedge_delay=0.02), "primary")
+        self.assertEqual(circuit.hedge_wins, 0)
+
+    async def test_cancelled_trial_is_released(self):
+        circuit = breaker()
+        for _ in range(4):
+            circuit.record(False, 0.1)
+        await asyncio.sleep(0.06)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        call = asyncio.ensure_future(call_with_resilience(circuit, hang, deadline=5))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+        self.assertTrue(circuit.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
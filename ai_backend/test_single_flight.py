@@ -0,0 +1,119 @@
+"""
+Tests for single_flight.SingleFlight.
+
+    cd ai_backend && python -m unittest test_single_flight
+"""
+import asyncio
+import unittest
+
+from single_flight import SingleFlight
+
+
+class LeaderOnlyError(Exception):
+    pass
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"questions": [1, 2, 3]}
+
+        results = await asyncio.gather(*[flight.do("quiz", generate) for _ in range(5)])
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats(), {"leaders": 1, "coalesced": 4, "followers_retried": 0, "in_flight": 0})
+
+    async def test_different_keys_do_not_share(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(flight.do("a", generate), flight.do("b", generate))
+        self.assertEqual(len(calls), 2)
+
+    async def test_exception_is_shared_and_the_key_forgotten(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*[flight.do("quiz", fail) for _ in range(3)], return_exceptions=True)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertTrue(all(result is results[0] for result in results))
+
+        # A later call starts afresh instead of replaying the failure
+        async def succeed():
+            return "ok"
+
+        self.assertEqual(await flight.do("quiz", succeed), "ok")
+
+    async def test_leader_cancellation_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("quiz", generate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("quiz", generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual(await follower, "done")
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+    async def test_follower_reruns_after_a_leader_only_error(self):
+        flight = SingleFlight()
+        calls = []
+
+        def generate(caller):
+            async def run():
+                calls.append(caller)
+                await asyncio.sleep(0.01)
+                if caller == "leader":
+                    raise LeaderOnlyError("leader over its admission cap")
+                return caller
+            return run
+
+        leader = asyncio.ensure_future(flight.do("quiz", generate("leader"), leader_errors=(LeaderOnlyError,)))
+        await asyncio.sleep(0)
+        followers = [
+            asyncio.ensure_future(flight.do("quiz", generate(f"follower-{i}"), leader_errors=(LeaderOnlyError,)))
+            for i in range(2)
+        ]
+        with self.assertRaises(LeaderOnlyError):
+            await leader
+        # The first follower to retry leads the second call; the other joins it
+        self.assertEqual(await asyncio.gather(*followers), ["follower-0", "follower-0"])
+        self.assertEqual(calls, ["leader", "follower-0"])
+        self.assertEqual(flight.stats()["followers_retried"], 2)
+
+    async def test_other_errors_are_still_shared_with_followers(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(
+            *[flight.do("quiz", fail, leader_errors=(LeaderOnlyError,)) for _ in range(3)], return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.stats()["followers_retried"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
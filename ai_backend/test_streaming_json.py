@@ -0,0 +1,96 @@
+"""
+Tests for streaming_json.JSONArrayItemParser on partial, chunked and garbled completions.
+
+    cd ai_backend && python -m unittest test_streaming_json
+"""
+import json
+import unittest
+
+from streaming_json import JSONArrayItemParser, iter_json_array_items, iter_json_array_positioned
+
+QUESTIONS = [
+    {"question": "What is 2 + 2?", "options": {"A": "3", "B": "4"}, "answer": "4"},
+    {"question": "Which brace closes an object: } or ]?", "options": ["}", "]"], "answer": "}"},
+    {"question": "A \"quoted\" word and a backslash \\", "options": [], "answer": ""},
+]
+
+
+def feed_in_chunks(parser, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+class JSONArrayItemParserTests(unittest.TestCase):
+    def test_objects_are_returned_as_soon_as_they_close(self):
+        parser = JSONArrayItemParser()
+        text = json.dumps(QUESTIONS)
+        first_end = text.index("}, {") + 1
+        self.assertEqual(parser.feed(text[:first_end]), [QUESTIONS[0]])
+        self.assertEqual(parser.feed(text[first_end:]), QUESTIONS[1:])
+
+    def test_any_chunking_gives_the_same_objects(self):
+        text = json.dumps(QUESTIONS, indent=2)
+        for size in (1, 2, 7, 64, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(feed_in_chunks(JSONArrayItemParser(), text, size), QUESTIONS)
+
+    def test_prose_and_fences_around_the_array_are_ignored(self):
+        text = "Here are your questions:\n```json\n" + json.dumps(QUESTIONS[:1]) + "\n```\nGood luck! [1]"
+        parser = JSONArrayItemParser()
+        self.assertEqual(feed_in_chunks(parser, text, 5), QUESTIONS[:1])
+        # Anything after the array closes is ignored
+        self.assertEqual(parser.feed('[{"late": 1}]'), [])
+
+    def test_garbled_object_is_dropped_and_the_rest_kept(self):
+        text = '[{"question": "ok 1"}, {"question": "broken", "options": [1, 2,]}, {"question": "ok 2"}]'
+        parser = JSONArrayItemParser()
+        self.assertEqual(feed_in_chunks(parser, text, 3), [{"question": "ok 1"}, {"question": "ok 2"}])
+        self.assertEqual((parser.parsed, parser.dropped), (2, 1))
+
+    def test_truncated_stream_returns_only_complete_objects(self):
+        text = json.dumps(QUESTIONS)
+        cut = text.index('"answer": "}"')
+        parser = JSONArrayItemParser()
+        self.assertEqual(feed_in_chunks(parser, text[:cut], 4), QUESTIONS[:1])
+        self.assertEqual((parser.parsed, parser.dropped), (1, 0))
+
+    def test_no_array_yields_nothing(self):
+        parser = JSONArrayItemParser()
+        self.assertEqual(parser.feed('{"question": "not in an array"}'), [])
+        self.assertEqual(parser.feed("I cannot help with that."), [])
+
+    def test_positions_count_dropped_and_non_object_elements(self):
+        text = '[{"q": 0}, {"q": 1, "bad": [1,]}, "a string", [2, {"nested": 3}], {"q": 4}, {"q": 5}]'
+        parser = JSONArrayItemParser()
+        positioned = []
+        for start in range(0, len(text), 4):
+            positioned.extend(parser.feed_positioned(text[start:start + 4]))
+        self.assertEqual(positioned, [(0, {"q": 0}), (4, {"q": 4}), (5, {"q": 5})])
+        self.assertEqual(parser.dropped_positions, [1])
+
+
+class IterJSONArrayItemsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_async_deltas(self):
+        text = json.dumps(QUESTIONS)
+
+        async def deltas():
+            for start in range(0, len(text), 10):
+                yield text[start:start + 10]
+
+        self.assertEqual([item async for item in iter_json_array_items(deltas())], QUESTIONS)
+
+    async def test_async_deltas_with_positions(self):
+        text = json.dumps(QUESTIONS)
+
+        async def deltas():
+            for start in range(0, len(text), 10):
+                yield text[start:start + 10]
+
+        positioned = [item async for item in iter_json_array_positioned(deltas())]
+        self.assertEqual(positioned, list(enumerate(QUESTIONS)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Translate-many side of the multilingual question pipeline.
+
+Questions are generated once in a canonical language and translated into the
+others.  ``QuestionTranslator`` looks up every question in a cache keyed by
+(content fingerprint, language) first, sends only the misses upstream in
+batches of ``batch_size`` (all batches in parallel, up to ``concurrency`` at
+once), and retries the items a batch failed to translate once in a fresh
+batch.
+
+Options are translated in their canonical order and the answer is carried
+over by position (the option index for quick practice, the A-D label for mock
+tests), so a translated question grades the same as its source.  Questions
+that still cannot be translated are left out rather than served in the wrong
+language; the result keeps the input order.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from question_bank import MOCK, QUICK
+from response_cache import ResponseCache
+from streaming_json import JSONArrayItemParser
+
+logger = logging.getLogger(__name__)
+
+# translate_batch(items, language) -> raw completion text holding a JSON array of
+# {"id", "question", "options"} objects; items are {"id", "question", "options": [4 strings]}
+BatchTranslator = Callable[[List[dict], str], Awaitable[str]]
+
+
+def content_fingerprint(question: str, options: List[str]) -> str:
+    """Identity of a question's translatable text; options in order, since answers follow their index"""
+    payload = json.dumps([question, options], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _options_list(kind: str, q: dict) -> List[str]:
+    """Options in canonical order: a list for QUICK questions, A-D label order for MOCK ones"""
+    if kind == MOCK:
+        return [q["options"][label] for label in sorted(q["options"])]
+    return list(q["options"])
+
+
+def _apply(kind: str, source: dict, translated: dict) -> dict:
+    """The source question with its text replaced by the translation, answer kept at the same position"""
+    question = dict(source, question=translated["question"])
+    if kind == MOCK:
+        labels = sorted(source["options"])
+        question["options"] = dict(zip(labels, translated["options"]))
+    else:
+        question["options"] = list(translated["options"])
+        question["answer"] = translated["options"][source["options"].index(source["answer"])]
+    return question
+
+
+def _valid_translation(item) -> Optional[dict]:
+    if not isinstance(item, dict) or not isinstance(item.get("question"), str) or not item["question"].strip():
+        return None
+    options = item.get("options")
+    if not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(o, str) and o.strip() for o in options) or len(set(options)) != 4:
+        # Quick-practice answers are option text, so translated options must stay distinct
+        return None
+    return {"question": item["question"], "options": options}
+
+
+class QuestionTranslator:
+    """Cached, batched, parallel translation of validated questions"""
+
+    def __init__(
+        self,
+        translate_batch: BatchTranslator,
+        cache: ResponseCache,
+        ttl: float,
+        batch_size: int = 5,
+        concurrency: int = 4,
+        namespace: str = "translation",
+    ):
+        self.translate_batch = translate_batch
+        self.cache = cache
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.namespace = namespace
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.translated = 0
+        self.cache_hits = 0
+        self.calls = 0
+        self.failed_calls = 0
+        self.failed_items = 0
+
+    def _key(self, fingerprint: str, language: str) -> str:
+        return f"{self.namespace}:{language}:{fingerprint}"
+
+    async def translate(self, kind: str, questions: List[dict], language: str) -> List[dict]:
+        """Translations of ``questions`` into ``language``, in input order, omitting any that failed"""
+        sources = [(content_fingerprint(q["question"], _options_list(kind, q)), q) for q in questions]
+        results: Dict[int, dict] = {}
+        missing = []
+        for index, (fingerprint, q) in enumerate(sources):
+            cached = await self.cache.get(self._key(fingerprint, language))
+            if cached is not None:
+                self.cache_hits += 1
+                results[index] = _apply(kind, q, json.loads(cached))
+            else:
+                missing.append(index)
+
+        # One retry, in fresh batches, for items a batch failed to translate
+        for _ in range(2):
+            if not missing:
+                break
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            outcomes = await asyncio.gather(
+                *(self._translate_indices(kind, sources, batch, language) for batch in batches)
+            )
+            missing = []
+            for batch, translated in zip(batches, outcomes):
+                for index in batch:
+                    if index in translated:
+                        results[index] = translated[index]
+                    else:
+                        missing.append(index)
+
+        if missing:
+            self.failed_items += len(missing)
+            logger.warning(f"Could not translate {len(missing)} of {len(questions)} {kind} questions into {language}")
+        return [results[index] for index in sorted(results)]
+
+    async def _translate_indices(self, kind: str, sources: list, indices: List[int], language: str) -> Dict[int, dict]:
+        items = [
+            {"id": index, "question": sources[index][1]["question"], "options": _options_list(kind, sources[index][1])}
+            for index in indices
+        ]
+        async with self._semaphore:
+            self.calls += 1
+            try:
+                text = await self.translate_batch(items, language)
+            except Exception as e:
+                self.failed_calls += 1
+                logger.warning(f"Translation batch into {language} failed: {e}")
+                return {}
+
+        parser = JSONArrayItemParser()
+        returned = parser.feed(text)
+        translated = {}
+        wanted = set(indices)
+        for position, item in enumerate(returned):
+            index = item.get("id") if isinstance(item, dict) else None
+            if index not in wanted and position < len(indices) and len(returned) == len(indices):
+                # Some models drop or rename the id; fall back to position when the counts line up
+                index = indices[position]
+            translation = _valid_translation(item)
+            if index not in wanted or translation is None or index in translated:
+                continue
+            fingerprint, source = sources[index]
+            translated[index] = _apply(kind, source, translation)
+            await self.cache.set(
+                self._key(fingerprint, language), json.dumps(translation, ensure_ascii=False), self.ttl
+            )
+        self.translated += len(translated)
+        return translated
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.translated + self.failed_items
+        return {
+            "translated": self.translated,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "calls": self.calls,
+            "failed_calls": self.failed_calls,
+            "failed_items": self.failed_items,
+            "batch_size": self.batch_size,
+        }
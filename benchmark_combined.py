@@ -0,0 +1,137 @@
+"""
+Latency benchmark for the Django mount in combined_app.py.
+
+Starts ``combined_app:app`` under uvicorn once per interface and sends the
+same requests to each at a fixed concurrency, printing throughput and
+p50/p95/p99 latency side by side.  The interfaces are:
+
+- ``wsgi``: the old WSGIMiddleware mount
+- ``asgi``: the default, Django's stock ASGI handler
+- ``asgi-sync``: the opt-in ``SyncASGIHandler``
+
+The default path is answered by DRF's authentication check (401), which needs
+no database, so the figures isolate the serving overhead.  Pass ``--header``
+with a bearer token and a data-backed path to include the views themselves.
+
+    python benchmark_combined.py
+    python benchmark_combined.py --requests 5000 --concurrency 64 --post-bytes 20000
+    python benchmark_combined.py --path /django/api/quizzes/recent-attempts/ --header "Authorization: Bearer <token>"
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INTERFACES = {
+    "wsgi": {"DJANGO_INTERFACE": "wsgi"},
+    "asgi": {"DJANGO_INTERFACE": "asgi", "DJANGO_ASGI_HANDLER": "django"},
+    "asgi-sync": {"DJANGO_INTERFACE": "asgi", "DJANGO_ASGI_HANDLER": "sync"},
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+async def wait_until_up(base_url, process, timeout=60):
+    give_up = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as http:
+        while time.monotonic() < give_up:
+            if process.poll() is not None:
+                raise RuntimeError(f"combined_app exited with code {process.returncode} during startup")
+            try:
+                if (await http.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"combined_app did not come up within {timeout}s")
+
+
+async def measure(base_url, args):
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    body = b"x" * args.post_bytes if args.post_bytes else None
+    latencies, statuses = [], {}
+    remaining = [args.requests]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits, headers=headers) as http:
+        async def one():
+            started = time.perf_counter()
+            if body is None:
+                response = await http.get(args.path)
+            else:
+                response = await http.post(args.path, content=body, headers={"Content-Type": "application/json"})
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                await one()
+
+        for _ in range(args.warmup):
+            await one()
+        latencies.clear()
+        statuses.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def run(args):
+    results = {}
+    for interface in args.interfaces:
+        env = dict(os.environ, DJANGO_MAX_CONCURRENCY=str(args.max_concurrency), **INTERFACES[interface])
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "combined_app:app", "--host", "127.0.0.1",
+             "--port", str(args.port), "--log-level", "warning"],
+            cwd=HERE, env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            await wait_until_up(base_url, process)
+            results[interface] = await measure(base_url, args)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"\n{args.requests} requests to {args.path} at concurrency {args.concurrency}")
+    print(f"{'interface':<13}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+    for interface, row in results.items():
+        print(f"{interface:<13}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+              f"{row['max_ms']:>10}  {row['statuses']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the WSGI and ASGI Django mounts of combined_app.py")
+    parser.add_argument("--interfaces", type=lambda v: v.split(","), default=list(INTERFACES),
+                        help=f"comma-separated, from {', '.join(INTERFACES)}")
+    parser.add_argument("--path", default="/django/api/quizzes/")
+    parser.add_argument("--header", action="append", default=[], metavar="'Name: value'")
+    parser.add_argument("--post-bytes", type=int, default=0, help="POST a body of this size instead of GET")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-concurrency", type=int, default=32, help="DJANGO_MAX_CONCURRENCY for the app")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8777)
+    asyncio.run(run(parser.parse_args()))
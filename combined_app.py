@@ -1,14 +1,147 @@
 # combined_app.py
+"""
+Single deployment entry point serving FastAPI and Django together.
+
+Django is mounted under /django over ASGI, served by ``config.asgi.application``
+(Django's stock handler) instead of the old WSGIMiddleware mount, which moved
+every request through a body-buffering adapter on a fixed thread pool.  At most
+``DJANGO_MAX_CONCURRENCY`` Django requests are admitted at once; requests
+beyond it wait up to ``DJANGO_QUEUE_TIMEOUT`` seconds for a slot and are then
+answered with 503.
+
+Startup warmups run in one shared lifespan, because mounted apps do not
+receive lifespan events.
+
+``DJANGO_INTERFACE=wsgi`` restores the old mount.  ``DJANGO_ASGI_HANDLER=sync``
+opts in to the experimental ``SyncASGIHandler`` (``config/asgi_handler.py``),
+which runs each request in one hop on its own thread pool.
+``benchmark_combined.py`` compares all three.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from starlette.middleware.wsgi import WSGIMiddleware
-from config.wsgi import application as django_app
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+DJANGO_INTERFACE = os.getenv("DJANGO_INTERFACE", "asgi").lower()
+DJANGO_MAX_CONCURRENCY = int(os.getenv("DJANGO_MAX_CONCURRENCY", "32"))
+DJANGO_QUEUE_TIMEOUT = float(os.getenv("DJANGO_QUEUE_TIMEOUT", "10"))
+DJANGO_CHECK_DATABASE = os.getenv("DJANGO_CHECK_DATABASE", "false").lower() == "true"
+
+if DJANGO_INTERFACE == "wsgi":
+    from starlette.middleware.wsgi import WSGIMiddleware
+    from config.wsgi import application as django_wsgi_app
+    django_app = WSGIMiddleware(django_wsgi_app)
+elif os.getenv("DJANGO_ASGI_HANDLER", "django").lower() == "sync":
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup(set_prefix=False)
+    from config.asgi_handler import SyncASGIHandler
+    django_app = SyncASGIHandler(max_threads=DJANGO_MAX_CONCURRENCY)
+else:
+    from config.asgi import application as django_app
+
+
+class ConcurrencyLimit:
+    """ASGI wrapper letting at most ``limit`` HTTP requests into ``app`` at once"""
+
+    def __init__(self, app, limit: int, queue_timeout: float):
+        self.app = app
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry shortly"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.served += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+
+django_limited = ConcurrencyLimit(django_app, DJANGO_MAX_CONCURRENCY, DJANGO_QUEUE_TIMEOUT)
+
+
+def _check_database():
+    from django.db import connection
+    try:
+        connection.ensure_connection()
+    finally:
+        connection.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Import every URLconf and view module now instead of on the first request
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    if DJANGO_CHECK_DATABASE:
+        from asgiref.sync import sync_to_async
+        try:
+            await sync_to_async(_check_database, thread_sensitive=False)()
+        except Exception as e:
+            logger.warning(f"Database check failed at startup: {e}")
+    logger.info(
+        f"Django ({DJANGO_INTERFACE}) ready in {time.perf_counter() - started:.2f}s, "
+        f"max {DJANGO_MAX_CONCURRENCY} concurrent requests"
+    )
+    yield
+    if hasattr(django_app, "shutdown"):
+        django_app.shutdown()
+
 
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mount Django under /django (you can change this path)
-app.mount("/django", WSGIMiddleware(django_app))
+app.mount("/django", django_limited)
 
 @app.get("/")
 def home():
     return {"message": "Combined Django + FastAPI is running!"}
+
+@app.get("/status")
+def status():
+    """Django interface and request concurrency figures"""
+    interface = DJANGO_INTERFACE
+    if interface != "wsgi":
+        interface = f"asgi ({type(django_app).__name__})"
+    return {"django_interface": interface, "django_requests": django_limited.stats()}
@@ -0,0 +1,105 @@
+"""
+ASGI handler for a project whose views and middleware are all synchronous.
+
+Django's own ``ASGIHandler`` builds an async middleware chain.  It wraps every
+sync middleware and view in ``sync_to_async`` and starts a new thread per
+request, so one request makes several hops between the event loop and
+threads.  ``SyncASGIHandler`` reads the body on the event loop, then runs the
+whole sync request cycle on a bounded thread pool in a single hop: the
+request_started signal, middleware, view and ``response.close()``.  A
+request's database connection is therefore opened and closed on the same
+thread, as under WSGI.
+
+Streamed responses (such as ``FileResponse``) are sent from the worker thread
+too, so their content is read where the response was produced.
+
+Experimental, opt-in only (``DJANGO_ASGI_HANDLER=sync`` in combined_app.py).
+It builds on internals of ``ASGIHandler`` (``read_body``, ``create_request``,
+``chunk_bytes``) that change between Django releases.  Known gaps: the
+response is closed, firing request_finished, before a buffered body is sent;
+``http.disconnect`` is not watched, so an aborted request keeps its thread;
+and a streamed response holds a pool thread for its whole body.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.http import FileResponse
+from django.urls import set_script_prefix
+
+
+class SyncASGIHandler(ASGIHandler):
+    """Django over ASGI with the sync request cycle run in one hop on ``max_threads`` threads"""
+
+    def __init__(self, max_threads: int = 32):
+        BaseHandler.__init__(self)
+        self.load_middleware(is_async=False)
+        self.max_threads = max_threads
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="django")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(
+                "Django can only handle ASGI/HTTP connections, not %s." % scope["type"]
+            )
+        await self.handle(scope, receive, send)
+
+    async def handle(self, scope, receive, send):
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self._executor, self._serve, scope, body_file, send, loop)
+        if response is not None:
+            await send({"type": "http.response.start", "status": response.status_code, "headers": self._headers(response)})
+            for chunk, last in self.chunk_bytes(response.content):
+                await send({"type": "http.response.body", "body": chunk, "more_body": not last})
+
+    def _serve(self, scope, body_file, send, loop):
+        """Run one request on a worker thread; returns the closed response, or None if it was streamed"""
+        set_script_prefix(self.get_script_prefix(scope))
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        request, response = self.create_request(scope, body_file)
+        if request is None:
+            body_file.close()
+        else:
+            response = self.get_response(request)
+            response._handler_class = self.__class__
+        try:
+            if not response.streaming:
+                return response
+            if isinstance(response, FileResponse):
+                response.block_size = self.chunk_size
+
+            def send_sync(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            send_sync({"type": "http.response.start", "status": response.status_code, "headers": self._headers(response)})
+            for part in response:
+                for chunk, _ in self.chunk_bytes(part):
+                    send_sync({"type": "http.response.body", "body": chunk, "more_body": True})
+            send_sync({"type": "http.response.body"})
+            return None
+        finally:
+            # Fires request_finished, which closes this thread's database connection
+            response.close()
+
+    @staticmethod
+    def _headers(response):
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((b"Set-Cookie", cookie.output(header="").encode("ascii").strip()))
+        return headers
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
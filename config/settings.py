@@ -181,6 +181,17 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Redeliver a task whose worker died mid-run; submission processing is idempotent
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Fail fast when the broker is down; unqueued jobs stay pending for process_pending_submissions
+CELERY_TASK_PUBLISH_RETRY_POLICY = {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5}
+
+# SUBMISSION PROCESSING
+# 'inline' runs quiz/mock test post-processing right after the request commits (no broker needed);
+# 'celery' hands it to a worker (celery -A config worker) and must only be set where one is deployed
+SUBMISSION_PROCESSING = config('SUBMISSION_PROCESSING', default='inline')
+SUBMISSION_MAX_RETRIES = config('SUBMISSION_MAX_RETRIES', default=5, cast=int)
 
 # LOGGING CONFIGURATION
 LOGGING = {
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from authentication.models import StudentRegistration
+from courses.models import Course, Topic
+from quizzes.models import MockTest, MockTestAnswer, MockTestAttempt, MockTestQuestion
+from quizzes.submissions import parse_submitted_question, record_mock_test_answers
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-row and bulk ingestion of mock test submissions (queries and time). '
+        'Everything is written inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100', help='comma-separated question counts')
+        parser.add_argument('--repeat', type=int, default=5, help='runs per size and path')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        results = []
+        try:
+            with transaction.atomic():
+                student, mock_test = self._fixtures()
+                for size in sizes:
+                    for name, ingest in (('per-row', self._per_row), ('bulk', record_mock_test_answers)):
+                        timings, queries = [], 0
+                        for run in range(options['repeat']):
+                            # Unseen questions each run, the most expensive case for the shared question rows
+                            questions, answers = self._submission(size, f'{name} {run}')
+                            attempt = MockTestAttempt.objects.create(test_id=mock_test, student_id=student, score=0)
+                            with CaptureQueriesContext(connection) as captured:
+                                started = time.perf_counter()
+                                with transaction.atomic():
+                                    ingest(mock_test, attempt, questions, answers)
+                                timings.append((time.perf_counter() - started) * 1000)
+                            queries = len(captured.captured_queries)
+                        timings.sort()
+                        results.append((size, name, queries, timings[len(timings) // 2]))
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'questions':>10} {'path':>8} {'queries':>8} {'median ms':>10}")
+        for size, name, queries, median in results:
+            self.stdout.write(f"{size:>10} {name:>8} {queries:>8} {median:>10.1f}")
+
+    def _fixtures(self):
+        student = StudentRegistration.objects.create(
+            first_name='Benchmark', last_name='Student', student_username='__benchmark_submissions__',
+            parent_email='benchmark@example.com',
+        )
+        course, _ = Course.objects.get_or_create(
+            course_id=2, defaults={'course_name': 'AI Generated Mock Tests', 'course_price': 0.00}
+        )
+        topic = Topic.objects.create(topic_name='__benchmark_submissions__', course_id=course.course_id)
+        mock_test = MockTest.objects.create(title='Benchmark Mock Test', topic_id=topic)
+        return student, mock_test
+
+    def _submission(self, size, salt):
+        questions = [
+            {
+                'question': f'Benchmark question {i} ({salt})?',
+                'options': {letter: f'Option {letter} of {i}' for letter in 'ABCD'},
+                'answer': f'Option {"ABCD"[i % 4]} of {i}',
+            }
+            for i in range(size)
+        ]
+        answers = [f'Option {"ABCD"[(i * 3) % 4]} of {i}' for i in range(size)]
+        return questions, answers
+
+    def _per_row(self, mock_test, attempt, questions, answers):
+        """The previous ingestion path: two INSERTs per question"""
+        for question, answer in zip(questions, answers):
+            question_text, options, correct_letter, selected_letter = parse_submitted_question(question, answer)
+            mock_test_question = MockTestQuestion.objects.create(
+                test_id=mock_test,
+                question_text=question_text,
+                option_a=options[0],
+                option_b=options[1],
+                option_c=options[2],
+                option_d=options[3],
+                correct_option=correct_letter,
+            )
+            MockTestAnswer.objects.create(
+                attempt_id=attempt,
+                question_id=mock_test_question,
+                selected_option=selected_letter,
+                is_correct=selected_letter == correct_letter,
+            )
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from quizzes.models import MockTestAnswer, MockTestQuestion, QuizAnswer, QuizQuestion
+from quizzes.submissions import AI_MOCK_TEST_TITLE_PREFIX, AI_QUIZ_TITLE_PREFIX, question_content_hash
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill content_hash on AI-generated quiz and mock test questions and merge duplicates: '
+        'answers are repointed to one shared row per distinct question and the copies deleted. '
+        'Only rows under the AI placeholder quizzes and mock tests are touched; teacher-authored questions are left alone'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+
+    def handle(self, *args, **options):
+        for question_model, answer_model, placeholders in (
+            (QuizQuestion, QuizAnswer, {'quiz_id__title__startswith': AI_QUIZ_TITLE_PREFIX}),
+            (MockTestQuestion, MockTestAnswer, {'test_id__title__startswith': AI_MOCK_TEST_TITLE_PREFIX}),
+        ):
+            self._dedupe(question_model, answer_model, placeholders, options['batch_size'], options['dry_run'])
+
+    def _dedupe(self, question_model, answer_model, placeholders, batch_size, dry_run):
+        name = question_model._meta.verbose_name_plural
+        questions = question_model.objects.filter(**placeholders)
+        before = questions.count()
+        keepers = dict(questions.exclude(content_hash=None).values_list('content_hash', 'pk'))
+        hashed = merged = 0
+        last_pk = 0
+
+        while True:
+            batch = list(
+                questions.filter(content_hash=None, pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_option'
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            to_hash, duplicates = [], {}
+            for pk, text, option_a, option_b, option_c, option_d, correct_option in batch:
+                content_hash = question_content_hash(text, [option_a, option_b, option_c, option_d], correct_option)
+                if content_hash in keepers:
+                    duplicates[pk] = keepers[content_hash]
+                else:
+                    keepers[content_hash] = pk
+                    to_hash.append(question_model(pk=pk, content_hash=content_hash))
+            hashed += len(to_hash)
+            merged += len(duplicates)
+            if dry_run:
+                continue
+
+            with transaction.atomic():
+                question_model.objects.bulk_update(to_hash, ['content_hash'])
+                if duplicates:
+                    answer_model.objects.filter(question_id__in=list(duplicates)).update(
+                        question_id=Case(
+                            *[When(question_id=duplicate, then=Value(keeper)) for duplicate, keeper in duplicates.items()],
+                            output_field=IntegerField(),
+                        )
+                    )
+                    question_model.objects.filter(pk__in=list(duplicates)).delete()
+
+        action = 'Would hash' if dry_run else 'Hashed'
+        self.stdout.write(
+            f'AI-generated {name}: {action} {hashed} and merged {merged} duplicates '
+            f'({before} rows -> {before - merged})'
+        )
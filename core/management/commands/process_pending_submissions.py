@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from quizzes.models import SubmissionJob
+from quizzes.submissions import mark_submission_failed, process_submission_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Process quiz and mock test submission jobs that were never queued or that stalled '
+        '(pending or processing, untouched for --older-than seconds). Safe to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=300, help='seconds since the job was last updated')
+        parser.add_argument('--limit', type=int, default=500)
+        parser.add_argument('--include-failed', action='store_true', help='also retry jobs that ran out of retries')
+        parser.add_argument('--queue', action='store_true', help='hand the jobs to the Celery worker instead')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'processing'] + (['failed'] if options['include_failed'] else [])
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        job_ids = list(
+            SubmissionJob.objects.filter(status__in=statuses, updated_at__lt=cutoff)
+            .order_by('created_at').values_list('job_id', flat=True)[:options['limit']]
+        )
+
+        done = failed = 0
+        for job_id in job_ids:
+            if options['queue']:
+                from quizzes.tasks import process_submission
+                process_submission.delay(str(job_id))
+                continue
+            try:
+                process_submission_job(job_id)
+                done += 1
+            except Exception as e:
+                mark_submission_failed(job_id, e, final=False)
+                failed += 1
+                self.stderr.write(f'Submission job {job_id} failed: {e}')
+
+        if options['queue']:
+            self.stdout.write(self.style.SUCCESS(f'Queued {len(job_ids)} submission jobs'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Processed {done} submission jobs, {failed} failed'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from authentication.models import StudentRegistration, User
+from quizzes.performance import rebuild_student_performance
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute StudentPerformance rollups from quiz attempts (backfill, or repair after a data fix). '
+        'Safe to run while submissions are being processed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', action='append', default=[], metavar='USERNAME',
+                            help='only rebuild these students (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        students = StudentRegistration.objects.order_by('student_id')
+        if options['student']:
+            students = students.filter(student_username__in=options['student'])
+
+        rebuilt = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(students.filter(student_id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].student_id
+            user_ids = dict(
+                User.objects.filter(username__in=[s.student_username for s in batch]).values_list('username', 'pk')
+            )
+            for student_reg in batch:
+                user_id = user_ids.get(student_reg.student_username)
+                if user_id is None:
+                    skipped += 1
+                    continue
+                rebuild_student_performance(student_reg, user_id)
+                rebuilt += 1
+            self.stdout.write(f'{rebuilt} rebuilt so far')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rebuilt} student performance rows ({skipped} students without a login account skipped)'
+        ))
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Add content_hash (unique) to quiz_question and mock_test_question.
+
+    Both tables are managed outside the migration state, so the columns and
+    indexes are added with SQL only.  Existing rows keep a NULL hash until
+    ``python manage.py dedupe_questions`` backfills them and merges duplicates.
+    """
+
+    dependencies = [
+        ('quizzes', '0003_auto_20251013_0123'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'ALTER TABLE quiz_question ADD COLUMN content_hash varchar(64) NULL;',
+                'CREATE UNIQUE INDEX quiz_question_content_hash_uniq ON quiz_question (content_hash);',
+                'ALTER TABLE mock_test_question ADD COLUMN content_hash varchar(64) NULL;',
+                'CREATE UNIQUE INDEX mock_test_question_content_hash_uniq ON mock_test_question (content_hash);',
+            ],
+            reverse_sql=[
+                'DROP INDEX quiz_question_content_hash_uniq;',
+                'ALTER TABLE quiz_question DROP COLUMN content_hash;',
+                'DROP INDEX mock_test_question_content_hash_uniq;',
+                'ALTER TABLE mock_test_question DROP COLUMN content_hash;',
+            ],
+        ),
+    ]
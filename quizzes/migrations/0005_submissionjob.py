@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionJob',
+            fields=[
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('quiz', 'Quiz'), ('mock_test', 'Mock Test')], max_length=20)),
+                ('attempt_id', models.IntegerField()),
+                ('student_id', models.IntegerField(db_index=True)),
+                ('idempotency_key', models.CharField(blank=True, max_length=100, null=True)),
+                ('payload_json', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('tries', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Submission Job',
+                'verbose_name_plural': 'Submission Jobs',
+                'db_table': 'submission_job',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='submissionjob',
+            constraint=models.UniqueConstraint(fields=('student_id', 'idempotency_key'), name='submission_job_idempotency_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Add the attempt counters behind StudentPerformance's running averages.
+
+    student_performance is managed outside the migration state, so the columns
+    are added with SQL only.  Existing rows start at zero; 0007 flags them to
+    be rebuilt from the attempts, and ``python manage.py
+    rebuild_student_performance`` fills them all in at once.
+    """
+
+    dependencies = [
+        ('quizzes', '0005_submissionjob'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'ALTER TABLE student_performance ADD COLUMN scored_attempts integer NOT NULL DEFAULT 0 CHECK (scored_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN mathematics_attempts integer NOT NULL DEFAULT 0 CHECK (mathematics_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN science_attempts integer NOT NULL DEFAULT 0 CHECK (science_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN english_attempts integer NOT NULL DEFAULT 0 CHECK (english_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN computers_attempts integer NOT NULL DEFAULT 0 CHECK (computers_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN class_7_attempts integer NOT NULL DEFAULT 0 CHECK (class_7_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN class_8_attempts integer NOT NULL DEFAULT 0 CHECK (class_8_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN class_9_attempts integer NOT NULL DEFAULT 0 CHECK (class_9_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN class_10_attempts integer NOT NULL DEFAULT 0 CHECK (class_10_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN simple_difficulty_attempts integer NOT NULL DEFAULT 0 CHECK (simple_difficulty_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN medium_difficulty_attempts integer NOT NULL DEFAULT 0 CHECK (medium_difficulty_attempts >= 0);',
+                'ALTER TABLE student_performance ADD COLUMN hard_difficulty_attempts integer NOT NULL DEFAULT 0 CHECK (hard_difficulty_attempts >= 0);',
+            ],
+            reverse_sql=[
+                'ALTER TABLE student_performance DROP COLUMN scored_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN mathematics_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN science_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN english_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN computers_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN class_7_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN class_8_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN class_9_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN class_10_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN simple_difficulty_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN medium_difficulty_attempts;',
+                'ALTER TABLE student_performance DROP COLUMN hard_difficulty_attempts;',
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Flag the StudentPerformance rows written before the attempt counters of 0006.
+
+    Their averages have no counters behind them, so the first increment would
+    discard them.  A flagged row is rebuilt from the attempts on its student's
+    next submission (or by ``manage.py rebuild_student_performance``), which
+    clears the flag.  Every row with attempts is flagged once; rebuilding a
+    row that was already correct is harmless.
+    """
+
+    dependencies = [
+        ('quizzes', '0006_student_performance_counts'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'ALTER TABLE student_performance ADD COLUMN needs_rebuild boolean NOT NULL DEFAULT false;',
+                'UPDATE student_performance SET needs_rebuild = true WHERE total_quizzes_attempted > 0;',
+            ],
+            reverse_sql=[
+                'ALTER TABLE student_performance DROP COLUMN needs_rebuild;',
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from authentication.models import User, Student, StudentRegistration
 from courses.models import Topic
@@ -24,6 +26,10 @@ class Quiz(models.Model):
 class QuizQuestion(models.Model):
     """
     Quiz Question model matching new schema
+
+    Rows with a content_hash are shared by every submission of the same question
+    and keep the quiz_id of the submission that inserted them first (always an
+    AI placeholder). Teacher-authored rows have no content_hash and are never shared.
     """
     question_id = models.AutoField(primary_key=True)
     quiz_id = models.ForeignKey(Quiz, on_delete=models.CASCADE, db_column='quiz_id')
@@ -33,6 +39,8 @@ class QuizQuestion(models.Model):
     option_c = models.TextField()
     option_d = models.TextField()
     correct_option = models.CharField(max_length=1, choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')])
+    # Hash of the normalized question, options and correct option; one shared row per distinct question
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     def __str__(self):
         return f"Q{self.question_id}: {self.question_text[:50]}..."
@@ -140,6 +148,10 @@ class MockTest(models.Model):
 class MockTestQuestion(models.Model):
     """
     Mock Test Question model matching new schema
+
+    Rows with a content_hash are shared by every submission of the same question
+    and keep the test_id of the submission that inserted them first (always an
+    AI placeholder). Teacher-authored rows have no content_hash and are never shared.
     """
     question_id = models.AutoField(primary_key=True)
     test_id = models.ForeignKey(MockTest, on_delete=models.CASCADE, db_column='test_id')
@@ -149,6 +161,8 @@ class MockTestQuestion(models.Model):
     option_c = models.TextField()
     option_d = models.TextField()
     correct_option = models.CharField(max_length=1, choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')])
+    # Hash of the normalized question, options and correct option; one shared row per distinct question
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     def __str__(self):
         return f"MT Q{self.question_id}: {self.question_text[:50]}..."
@@ -332,7 +346,8 @@ class QuizAnalytics(models.Model):
 
 class StudentPerformance(models.Model):
     """
-    Student Performance model for tracking overall student progress
+    Student Performance model for tracking overall student progress.
+    Maintained incrementally per submission (see quizzes/performance.py).
     """
     student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='performance')
     
@@ -341,23 +356,35 @@ class StudentPerformance(models.Model):
     total_questions_answered = models.PositiveIntegerField(default=0)
     total_correct_answers = models.PositiveIntegerField(default=0)
     overall_average_score = models.FloatField(default=0.0)
+    scored_attempts = models.PositiveIntegerField(default=0)  # attempts behind overall_average_score
     
-    # Subject-wise performance
+    # Subject-wise performance (each average with the number of attempts behind it)
     mathematics_score = models.FloatField(default=0.0)
     science_score = models.FloatField(default=0.0)
     english_score = models.FloatField(default=0.0)
     computers_score = models.FloatField(default=0.0)
+    mathematics_attempts = models.PositiveIntegerField(default=0)
+    science_attempts = models.PositiveIntegerField(default=0)
+    english_attempts = models.PositiveIntegerField(default=0)
+    computers_attempts = models.PositiveIntegerField(default=0)
     
     # Class-wise performance
     class_7_score = models.FloatField(default=0.0)
     class_8_score = models.FloatField(default=0.0)
     class_9_score = models.FloatField(default=0.0)
     class_10_score = models.FloatField(default=0.0)
+    class_7_attempts = models.PositiveIntegerField(default=0)
+    class_8_attempts = models.PositiveIntegerField(default=0)
+    class_9_attempts = models.PositiveIntegerField(default=0)
+    class_10_attempts = models.PositiveIntegerField(default=0)
     
     # Difficulty-wise performance
     simple_difficulty_score = models.FloatField(default=0.0)
     medium_difficulty_score = models.FloatField(default=0.0)
     hard_difficulty_score = models.FloatField(default=0.0)
+    simple_difficulty_attempts = models.PositiveIntegerField(default=0)
+    medium_difficulty_attempts = models.PositiveIntegerField(default=0)
+    hard_difficulty_attempts = models.PositiveIntegerField(default=0)
     
     # Time and consistency
     average_time_per_question = models.FloatField(default=0.0)
@@ -371,6 +398,8 @@ class StudentPerformance(models.Model):
     # Last updated
     last_updated = models.DateTimeField(auto_now=True)
     last_quiz_date = models.DateTimeField(null=True, blank=True)
+    # Set by migration 0007 on rows written before the attempt counters; rebuilt on the next submission
+    needs_rebuild = models.BooleanField(default=False)
     
     def __str__(self):
         return f"{self.student.firstname} - Performance"
@@ -378,4 +407,48 @@ class StudentPerformance(models.Model):
     class Meta:
         db_table = 'student_performance'
         verbose_name = 'Student Performance'
-        verbose_name_plural = 'Student Performances'
\ No newline at end of file
+        verbose_name_plural = 'Student Performances'
+
+
+class SubmissionJob(models.Model):
+    """
+    Deferred post-processing of a quiz or mock test submission.
+
+    The submit endpoints save the attempt and this job, holding the raw
+    submitted questions and answers, and return at once.  A worker then writes
+    the answer rows and updates performance (see quizzes/submissions.py).
+    """
+    KIND_CHOICES = [
+        ('quiz', 'Quiz'),
+        ('mock_test', 'Mock Test'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    attempt_id = models.IntegerField()  # quiz_attempt or mock_test_attempt, depending on kind
+    student_id = models.IntegerField(db_index=True)  # student_registration
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+    payload_json = models.TextField(blank=True, default='')  # cleared once processed
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    tries = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} submission {self.job_id} ({self.status})"
+
+    class Meta:
+        db_table = 'submission_job'
+        verbose_name = 'Submission Job'
+        verbose_name_plural = 'Submission Jobs'
+        constraints = [
+            models.UniqueConstraint(fields=['student_id', 'idempotency_key'], name='submission_job_idempotency_key_uniq'),
+        ]
@@ -0,0 +1,213 @@
+"""
+Incrementally maintained StudentPerformance rollup.
+
+Each processed quiz submission folds its attempt into the student's
+StudentPerformance row with a single ``UPDATE`` of ``F()`` expressions.  The
+counters are bumped and every average becomes a running mean
+(``(average * count + score) / (count + 1)``), all computed by the database
+from the row's current values.  Concurrent submissions for the same student
+serialize on the row lock instead of overwriting each other's figures, and
+no attempts are rescanned.
+
+Each bucket (subject, class, difficulty) has a ``*_attempts`` counter next to
+its average, so the running mean has the right weight.
+``average_time_per_question`` is weighted by ``total_questions_answered``, and
+``completion_rate`` by ``total_quizzes_attempted``.
+
+Reads are served from the row alone.  ``rebuild_student_performance``
+recomputes a row exactly from the attempts; ``manage.py
+rebuild_student_performance`` runs it for every student (backfill).  A row
+written before the counters existed carries ``needs_rebuild`` (set by
+migration 0007) and is rebuilt on its student's next submission, so the
+first increment does not discard its averages.
+
+Mock tests are not part of the rollup, as before.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from authentication.models import User
+from .models import QuizAttempt, StudentPerformance, SubmissionJob
+
+# (average field, count field, keywords) - an attempt goes to the first bucket with a keyword in its value
+SUBJECT_BUCKETS = [
+    ('mathematics_score', 'mathematics_attempts', ('math',)),
+    ('science_score', 'science_attempts', ('science',)),
+    ('english_score', 'english_attempts', ('english',)),
+    ('computers_score', 'computers_attempts', ('computer', 'programming')),
+]
+CLASS_BUCKETS = [
+    ('class_7_score', 'class_7_attempts', ('7',)),
+    ('class_8_score', 'class_8_attempts', ('8',)),
+    ('class_9_score', 'class_9_attempts', ('9',)),
+    ('class_10_score', 'class_10_attempts', ('10',)),
+]
+DIFFICULTY_BUCKETS = [
+    ('simple_difficulty_score', 'simple_difficulty_attempts', 'simple'),
+    ('medium_difficulty_score', 'medium_difficulty_attempts', 'medium'),
+    ('hard_difficulty_score', 'hard_difficulty_attempts', 'hard'),
+]
+COMPLETED_PERCENTAGE = 80
+
+
+def _keyword_bucket(buckets, value):
+    value = (value or '').lower()
+    for average_field, count_field, keywords in buckets:
+        if any(keyword in value for keyword in keywords):
+            return average_field, count_field
+    return None
+
+
+def _difficulty_bucket(difficulty):
+    difficulty = difficulty or 'simple'
+    for average_field, count_field, level in DIFFICULTY_BUCKETS:
+        if difficulty == level:
+            return average_field, count_field
+    return None
+
+
+def _running_mean(average_field, count_field, value, weight=1):
+    return (F(average_field) * F(count_field) + value) / (F(count_field) + weight)
+
+
+def get_student_user_id(student_reg):
+    """
+    Id of the User a StudentRegistration logs in as (the rollup is keyed by User)
+    """
+    return User.objects.filter(username=student_reg.student_username).values_list('pk', flat=True).first()
+
+
+def _ensure_row(user_id):
+    try:
+        with transaction.atomic():
+            StudentPerformance.objects.get_or_create(student_id=user_id)
+    except IntegrityError:
+        pass  # created concurrently
+
+
+def update_student_performance(student_reg, attempt):
+    """
+    Fold a newly processed quiz attempt into the student's StudentPerformance row.
+    Must run once per attempt; the submission job guarantees that.
+    """
+    if not student_reg:
+        return
+    user_id = get_student_user_id(student_reg)
+    if user_id is None:
+        return  # student has no login account, nothing to roll up into
+
+    changes = {
+        'total_quizzes_attempted': F('total_quizzes_attempted') + 1,
+        'total_questions_answered': F('total_questions_answered') + attempt.total_questions,
+        'total_correct_answers': F('total_correct_answers') + attempt.correct_answers,
+        'completion_rate': _running_mean(
+            'completion_rate', 'total_quizzes_attempted',
+            100.0 if attempt.completion_percentage >= COMPLETED_PERCENTAGE else 0.0
+        ),
+        'last_quiz_date': Coalesce(Greatest(F('last_quiz_date'), Value(attempt.attempted_at)), Value(attempt.attempted_at)),
+    }
+    if attempt.total_questions > 0:
+        changes['average_time_per_question'] = _running_mean(
+            'average_time_per_question', 'total_questions_answered',
+            float(attempt.time_taken_seconds), attempt.total_questions
+        )
+    if attempt.score is not None:
+        score = float(attempt.score)
+        changes['overall_average_score'] = _running_mean('overall_average_score', 'scored_attempts', score)
+        changes['scored_attempts'] = F('scored_attempts') + 1
+        for bucket in (
+            _keyword_bucket(SUBJECT_BUCKETS, attempt.subject),
+            _keyword_bucket(CLASS_BUCKETS, attempt.class_name),
+            _difficulty_bucket(attempt.difficulty_level),
+        ):
+            if bucket:
+                average_field, count_field = bucket
+                changes[average_field] = _running_mean(average_field, count_field, score)
+                changes[count_field] = F(count_field) + 1
+
+    rows = StudentPerformance.objects.filter(student_id=user_id)
+    if not rows.filter(needs_rebuild=False).update(**changes):
+        if rows.filter(needs_rebuild=True).exists():
+            # Written before the counters existed: rebuild from the attempts processed so far, then add this one
+            rebuild_student_performance(student_reg, user_id)
+        else:
+            _ensure_row(user_id)
+        rows.update(**changes)
+
+
+def _keyword_bucket_filters(buckets, field):
+    """Q per keyword bucket matching the first-match rule of _keyword_bucket"""
+    filters, earlier = {}, Q()
+    for average_field, count_field, keywords in buckets:
+        matches = Q()
+        for keyword in keywords:
+            matches |= Q(**{f'{field}__icontains': keyword})
+        filters[(average_field, count_field)] = matches & ~earlier if earlier else matches
+        earlier |= matches
+    return filters
+
+
+def _bucket_filters():
+    filters = {}
+    filters.update(_keyword_bucket_filters(SUBJECT_BUCKETS, 'subject'))
+    filters.update(_keyword_bucket_filters(CLASS_BUCKETS, 'class_name'))
+    for average_field, count_field, level in DIFFICULTY_BUCKETS:
+        matches = Q(difficulty_level=level)
+        if level == 'simple':
+            matches |= Q(difficulty_level='') | Q(difficulty_level__isnull=True)
+        filters[(average_field, count_field)] = matches
+    return filters
+
+
+def rebuild_student_performance(student_reg, user_id=None):
+    """
+    Recompute a student's StudentPerformance row from their quiz attempts with one aggregate query.
+    Attempts whose submission is still being processed are left for the worker to add.
+    """
+    user_id = user_id or get_student_user_id(student_reg)
+    if user_id is None:
+        return None
+
+    _ensure_row(user_id)
+    with transaction.atomic():
+        # Lock first so a concurrent increment lands either before this read or after this write
+        performance = StudentPerformance.objects.select_for_update().get(student_id=user_id)
+        unprocessed = SubmissionJob.objects.filter(kind='quiz', student_id=student_reg.student_id).exclude(
+            status='done'
+        ).values('attempt_id')
+        attempts = QuizAttempt.objects.filter(student_id=student_reg).exclude(attempt_id__in=unprocessed)
+
+        scored = Q(score__isnull=False)
+        aggregates = {
+            'attempts': Count('pk'),
+            'questions': Sum('total_questions'),
+            'correct': Sum('correct_answers'),
+            'scored_attempts': Count('pk', filter=scored),
+            'average_score': Avg('score'),
+            'timed_seconds': Sum('time_taken_seconds', filter=Q(total_questions__gt=0)),
+            'completed': Count('pk', filter=Q(completion_percentage__gte=COMPLETED_PERCENTAGE)),
+            'last_quiz_date': Max('attempted_at'),
+        }
+        for (average_field, count_field), matches in _bucket_filters().items():
+            aggregates[count_field] = Count('pk', filter=scored & matches)
+            aggregates[average_field] = Avg('score', filter=matches)
+        totals = attempts.aggregate(**aggregates)
+
+        performance.total_quizzes_attempted = totals['attempts']
+        performance.total_questions_answered = totals['questions'] or 0
+        performance.total_correct_answers = totals['correct'] or 0
+        performance.scored_attempts = totals['scored_attempts']
+        performance.overall_average_score = totals['average_score'] or 0
+        performance.average_time_per_question = (
+            (totals['timed_seconds'] or 0) / performance.total_questions_answered
+            if performance.total_questions_answered else 0
+        )
+        performance.completion_rate = totals['completed'] / totals['attempts'] * 100 if totals['attempts'] else 0
+        performance.last_quiz_date = totals['last_quiz_date']
+        performance.needs_rebuild = False
+        for average_field, count_field in _bucket_filters():
+            setattr(performance, count_field, totals[count_field])
+            setattr(performance, average_field, totals[average_field] or 0)
+        performance.save()
+    return performance
@@ -0,0 +1,357 @@
+"""
+Bulk ingestion of the per-question rows of a quiz or mock test submission.
+
+Questions are content-addressed.  Each distinct question (by the hash of its
+normalized text, options and correct option) is stored once in
+QuizQuestion/MockTestQuestion, and every answer row (QuizAnswer/MockTestAnswer)
+points to that shared row.  A submission looks up its questions' hashes with
+one query, inserts only the unseen ones (``ON CONFLICT DO NOTHING`` against the
+unique index, so concurrent submissions cannot create duplicates) and writes
+all answers with one ``bulk_create``.  The query count is the same whatever
+the quiz length.  Callers run this inside a ``transaction.atomic()`` block, so
+a submission's rows are stored completely or not at all.
+
+A shared row keeps the quiz_id/test_id of the submission that inserted it
+first; every question ingested here hangs off an AI placeholder quiz or mock
+test, so teacher-authored questions are never shared or merged.
+
+The submit endpoints do none of this on the request path.  They save the
+attempt and a ``SubmissionJob`` holding the raw questions and answers, and
+``enqueue_submission`` hands the job to the Celery worker once the transaction
+commits.  ``process_submission_job`` then resolves the placeholder quiz,
+writes the answer rows and updates performance.  It is idempotent: the job
+is marked done in the same transaction as the rows it wrote, so a retried or
+redelivered job either finds it done or starts from a clean slate.
+"""
+import hashlib
+import json
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+
+from .models import (
+    MockTest, MockTestAnswer, MockTestAttempt, MockTestQuestion, Quiz, QuizAnalytics, QuizAnswer, QuizAttempt,
+    QuizQuestion, SubmissionJob
+)
+from .performance import update_student_performance
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+# Titles of the placeholder quizzes/mock tests that AI-generated questions are stored under
+AI_QUIZ_TITLE_PREFIX = 'AI Generated Quiz - '
+AI_MOCK_TEST_TITLE_PREFIX = 'AI Generated Mock Test - '
+
+
+def _normalize(text):
+    return ' '.join(unicodedata.normalize('NFKC', str(text)).split())
+
+
+def question_content_hash(question_text, options, correct_option):
+    """
+    Content address of a question: SHA-256 of its text, A-D options and correct
+    letter, after Unicode (NFKC) and whitespace normalization
+    """
+    payload = json.dumps(
+        [_normalize(question_text), [_normalize(option) for option in options], correct_option],
+        ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _as_text(value):
+    return '' if value is None else str(value)
+
+
+def parse_submitted_question(question, answer):
+    """
+    Parse one submitted question and the student's answer.
+
+    Returns (question_text, [option_a..option_d], correct_letter, selected_letter),
+    or None if the question cannot be read.  ``options`` may be a dict keyed A-D
+    or a list in A-D order.  Option values and answers are compared as text
+    (a list or dict value is stringified), and an unmatched answer falls back to 'A'.
+    """
+    if not isinstance(question, dict):
+        return None
+    options = question.get('options', {})
+    if isinstance(options, dict):
+        option_texts = [_as_text(options.get(letter, '')) for letter in OPTION_LETTERS]
+        letters_by_text = {}
+        for letter, text in options.items():
+            letters_by_text.setdefault(_as_text(text), letter)
+    elif isinstance(options, list):
+        option_texts = [_as_text(options[i]) if i < len(options) else '' for i in range(len(OPTION_LETTERS))]
+        letters_by_text = {}
+        for i, text in enumerate(options):
+            letters_by_text.setdefault(_as_text(text), chr(65 + i))
+    else:
+        return None
+
+    correct_letter = letters_by_text.get(_as_text(question.get('answer', '')), 'A')
+    selected_letter = letters_by_text.get(_as_text(answer), 'A')
+    return _as_text(question.get('question', '')), option_texts, correct_letter, selected_letter
+
+
+def _bulk_record(question_model, answer_model, parent_field, parent, attempt, questions, answers):
+    parsed = []
+    for i, (question, answer) in enumerate(zip(questions, answers)):
+        row = parse_submitted_question(question, answer)
+        if row is None:
+            print(f"Skipping unreadable question {i} in attempt {attempt.pk}")
+            continue
+        parsed.append(row)
+
+    hashes = []
+    new_rows = {}
+    for question_text, options, correct_letter, _ in parsed:
+        content_hash = question_content_hash(question_text, options, correct_letter)
+        hashes.append(content_hash)
+        if content_hash not in new_rows:
+            new_rows[content_hash] = question_model(**{
+                parent_field: parent,
+                'question_text': question_text,
+                'option_a': options[0],
+                'option_b': options[1],
+                'option_c': options[2],
+                'option_d': options[3],
+                'correct_option': correct_letter,
+                'content_hash': content_hash,
+            })
+
+    question_ids = dict(
+        question_model.objects.filter(content_hash__in=list(new_rows)).values_list('content_hash', 'pk')
+    )
+    missing = [row for content_hash, row in new_rows.items() if content_hash not in question_ids]
+    if missing:
+        question_model.objects.bulk_create(missing, ignore_conflicts=True)
+        # ignore_conflicts does not return keys, and a concurrent submission may have inserted some rows
+        question_ids.update(
+            question_model.objects.filter(content_hash__in=[row.content_hash for row in missing])
+            .values_list('content_hash', 'pk')
+        )
+
+    answer_model.objects.bulk_create([
+        answer_model(
+            attempt_id=attempt,
+            question_id_id=question_ids[content_hash],
+            selected_option=selected_letter,
+            is_correct=selected_letter == correct_letter,
+        )
+        for content_hash, (_, _, correct_letter, selected_letter) in zip(hashes, parsed)
+    ])
+    return len(parsed)
+
+
+def record_quiz_answers(quiz, attempt, questions, answers):
+    """
+    Record a quiz attempt's answers against shared QuizQuestion rows, inserting unseen questions.
+    Returns the number of questions recorded.
+    """
+    return _bulk_record(QuizQuestion, QuizAnswer, 'quiz_id', quiz, attempt, questions, answers)
+
+
+def record_mock_test_answers(mock_test, attempt, questions, answers):
+    """
+    Record a mock test attempt's answers against shared MockTestQuestion rows, inserting unseen questions.
+    Returns the number of questions recorded.
+    """
+    return _bulk_record(MockTestQuestion, MockTestAnswer, 'test_id', mock_test, attempt, questions, answers)
+
+
+def placeholder_quiz(subtopic):
+    """
+    Get or create the placeholder Quiz that AI-generated quiz questions hang off (required by foreign key)
+    """
+    from courses.models import Topic, Course
+    course, created = Course.objects.get_or_create(
+        course_id=1,
+        defaults={
+            'course_name': 'AI Generated Quizzes',
+            'course_price': 0.00
+        }
+    )
+    topic, created = Topic.objects.get_or_create(
+        topic_name=subtopic,
+        defaults={
+            'course_id': course.course_id
+        }
+    )
+    quiz, created = Quiz.objects.get_or_create(
+        title=f"{AI_QUIZ_TITLE_PREFIX}{subtopic}",
+        topic_id=topic
+    )
+    return quiz
+
+
+def placeholder_mock_test(subtopic):
+    """
+    Get or create the placeholder MockTest that AI-generated mock test attempts belong to (required by foreign key)
+    """
+    from courses.models import Topic, Course
+    course, created = Course.objects.get_or_create(
+        course_id=2,  # Use different ID for mock tests
+        defaults={
+            'course_name': 'AI Generated Mock Tests',
+            'course_price': 0.00
+        }
+    )
+    topic, created = Topic.objects.get_or_create(
+        topic_name=subtopic,
+        defaults={
+            'course_id': course.course_id
+        }
+    )
+    mock_test, created = MockTest.objects.get_or_create(
+        title=f"{AI_MOCK_TEST_TITLE_PREFIX}{subtopic}",
+        topic_id=topic
+    )
+    return mock_test
+
+
+# ============================================
+# Deferred submission processing
+# ============================================
+
+def create_submission_job(kind, attempt, student_reg, payload, idempotency_key=None):
+    """
+    Save the job for a just-created attempt and queue it once the surrounding transaction commits
+    """
+    job = SubmissionJob.objects.create(
+        kind=kind,
+        attempt_id=attempt.pk,
+        student_id=student_reg.student_id,
+        idempotency_key=idempotency_key or None,
+        payload_json=json.dumps(payload),
+    )
+    enqueue_submission(job.pk)
+    return job
+
+
+def enqueue_submission(job_id):
+    """
+    Hand a job to the worker after commit, or process it right away with SUBMISSION_PROCESSING=inline.
+    A job that cannot be queued stays pending for ``manage.py process_pending_submissions``.
+    """
+    def send():
+        if settings.SUBMISSION_PROCESSING == 'inline':
+            try:
+                process_submission_job(job_id)
+            except Exception as e:
+                mark_submission_failed(job_id, e, final=False)
+                print(f"Submission job {job_id} failed, left pending: {e}")
+            return
+        from .tasks import process_submission
+        try:
+            process_submission.delay(str(job_id))
+        except Exception as e:
+            print(f"Could not queue submission job {job_id}, left pending: {e}")
+
+    transaction.on_commit(send)
+
+
+def process_submission_job(job_id):
+    """
+    Run the deferred part of a submission and return the job's final status.
+    Safe to call more than once for the same job.
+    """
+    SubmissionJob.objects.filter(pk=job_id).exclude(status='done').update(
+        status='processing', tries=F('tries') + 1
+    )
+    with transaction.atomic():
+        job = SubmissionJob.objects.select_for_update().get(pk=job_id)
+        if job.status == 'done':
+            return job.status
+        payload = json.loads(job.payload_json or '{}')
+        questions = payload.get('questions', [])
+        answers = payload.get('answers', [])
+
+        if job.kind == 'quiz':
+            attempt = QuizAttempt.objects.select_related('student_id').get(pk=job.attempt_id)
+            if payload.get('quiz_type') == 'ai_generated':
+                record_quiz_answers(placeholder_quiz(payload.get('subtopic')), attempt, questions, answers)
+            update_student_performance(attempt.student_id, attempt)
+        else:
+            attempt = MockTestAttempt.objects.select_related('test_id').get(pk=job.attempt_id)
+            record_mock_test_answers(attempt.test_id, attempt, questions, answers)
+
+        job.status = 'done'
+        job.last_error = None
+        job.payload_json = ''
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'last_error', 'payload_json', 'completed_at', 'updated_at'])
+    return job.status
+
+
+def mark_submission_failed(job_id, error, final):
+    """
+    Record a failed try; the job goes back to pending unless this was the last retry
+    """
+    SubmissionJob.objects.filter(pk=job_id).exclude(status='done').update(
+        status='failed' if final else 'pending',
+        last_error=str(error)[:2000],
+        updated_at=timezone.now(),
+    )
+
+
+def submission_results(job):
+    """
+    Per-question results of a processed submission, in submission order
+    """
+    answer_model = QuizAnswer if job.kind == 'quiz' else MockTestAnswer
+    answers = answer_model.objects.filter(attempt_id=job.attempt_id).select_related('question_id').order_by('answer_id')
+    return [
+        {
+            'question': answer.question_id.question_text,
+            'options': {
+                'A': answer.question_id.option_a,
+                'B': answer.question_id.option_b,
+                'C': answer.question_id.option_c,
+                'D': answer.question_id.option_d,
+            },
+            'correct_option': answer.question_id.correct_option,
+            'selected_option': answer.selected_option,
+            'is_correct': answer.is_correct,
+        }
+        for answer in answers
+    ]
+
+
+def refresh_quiz_analytics(quiz_id, passing_score):
+    """
+    Recompute a quiz's QuizAnalytics from its attempts with a single aggregate query
+    """
+    totals = QuizAttempt.objects.filter(quiz_id=quiz_id).aggregate(
+        attempts=Count('pk'),
+        average_score=Avg('score'),
+        passed=Count('pk', filter=Q(score__gte=passing_score)),
+        average_time_seconds=Avg('time_taken_seconds'),
+    )
+    attempts = totals['attempts']
+    QuizAnalytics.objects.update_or_create(
+        quiz_id=quiz_id,
+        defaults={
+            'total_attempts': attempts,
+            'average_score': totals['average_score'] or 0,
+            'pass_rate': totals['passed'] / attempts * 100 if attempts else 0,
+            'average_time_minutes': (totals['average_time_seconds'] or 0) / 60,
+        },
+    )
+
+
+def enqueue_quiz_analytics(quiz_id, passing_score):
+    """
+    Refresh a quiz's analytics in the worker (or right away with SUBMISSION_PROCESSING=inline)
+    """
+    def send():
+        if settings.SUBMISSION_PROCESSING != 'inline':
+            from .tasks import refresh_quiz_analytics_task
+            try:
+                refresh_quiz_analytics_task.delay(quiz_id, passing_score)
+                return
+            except Exception as e:
+                print(f"Could not queue analytics refresh for quiz {quiz_id}, running it now: {e}")
+        refresh_quiz_analytics(quiz_id, passing_score)
+
+    transaction.on_commit(send)
@@ -0,0 +1,27 @@
+from celery import shared_task
+from django.conf import settings
+
+from .models import SubmissionJob
+from .submissions import mark_submission_failed, process_submission_job, refresh_quiz_analytics
+
+
+@shared_task(bind=True, max_retries=settings.SUBMISSION_MAX_RETRIES, ignore_result=True)
+def process_submission(self, job_id):
+    """
+    Write the answer rows and performance updates for a submission, retrying with backoff
+    """
+    try:
+        return process_submission_job(job_id)
+    except SubmissionJob.DoesNotExist:
+        return None
+    except Exception as e:
+        final = self.request.retries >= self.max_retries
+        mark_submission_failed(job_id, e, final)
+        if final:
+            return 'failed'
+        raise self.retry(exc=e, countdown=min(5 * 2 ** self.request.retries, 300))
+
+
+@shared_task(ignore_result=True)
+def refresh_quiz_analytics_task(quiz_id, passing_score):
+    refresh_quiz_analytics(quiz_id, passing_score)
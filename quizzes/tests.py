@@ -0,0 +1,329 @@
+"""
+Tests for quiz submission ingestion, the deferred submission jobs and the
+StudentPerformance rollup.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import StudentRegistration, User
+from .models import MockTestAttempt, QuizAnswer, QuizAttempt, QuizQuestion, StudentPerformance, SubmissionJob
+from .performance import rebuild_student_performance, update_student_performance
+from .submissions import (
+    placeholder_mock_test, placeholder_quiz, process_submission_job, question_content_hash, record_quiz_answers
+)
+
+OPTIONS = {'A': 'Paris', 'B': 'London', 'C': 'Rome', 'D': 'Berlin'}
+
+
+def create_student(username):
+    user = User.objects.create(username=username, firstname='Test', email=f'{username}@example.com', password='x')
+    student_reg = StudentRegistration.objects.create(
+        student_username=username, first_name='Test', last_name='Student', parent_email='parent@example.com'
+    )
+    return user, student_reg
+
+
+def quiz_payload(questions=3, correct=2, **overrides):
+    payload = {
+        'quizType': 'ai_generated',
+        'className': '7th',
+        'subject': 'Mathematics',
+        'subtopic': 'Fractions',
+        'difficultyLevel': 'simple',
+        'totalQuestions': questions,
+        'correctAnswers': correct,
+        'wrongAnswers': questions - correct,
+        'unansweredQuestions': 0,
+        'timeTakenSeconds': 30 * questions,
+        'score': round(correct / questions * 100, 2),
+        'quizQuestions': [
+            {'question': f'Question {i}', 'options': OPTIONS, 'answer': 'London'} for i in range(questions)
+        ],
+        'userAnswers': ['London'] * correct + ['Paris'] * (questions - correct),
+    }
+    payload.update(overrides)
+    return payload
+
+
+class BulkIngestionTests(TestCase):
+    def setUp(self):
+        _, self.student_reg = create_student('ingest')
+        self.quiz = placeholder_quiz('Fractions')
+
+    def record(self, questions, answers):
+        attempt = QuizAttempt.objects.create(student_id=self.student_reg, total_questions=len(questions))
+        return attempt, record_quiz_answers(self.quiz, attempt, questions, answers)
+
+    def test_malformed_question_is_skipped(self):
+        questions = [
+            {'question': 'Capital of the UK?', 'options': OPTIONS, 'answer': 'London'},
+            'not a question',
+            {'question': 'No options', 'options': 'A, B, C, D', 'answer': 'A'},
+            {'question': 'Capital of Italy?', 'options': ['Paris', 'London', 'Rome', 'Berlin'], 'answer': 'Rome'},
+            {'question': 'Nested option values', 'options': [['x'], {'y': 1}, 3, None], 'answer': {'y': 1}},
+        ]
+        answers = ['London', 'A', 'A', 'Paris', {'y': 1}]
+        attempt, recorded = self.record(questions, answers)
+
+        self.assertEqual(recorded, 3)
+        rows = list(
+            QuizAnswer.objects.filter(attempt_id=attempt).order_by('answer_id')
+            .values_list('question_id__question_text', 'question_id__correct_option', 'selected_option', 'is_correct')
+        )
+        self.assertEqual(rows, [
+            ('Capital of the UK?', 'B', 'B', True),
+            ('Capital of Italy?', 'C', 'A', False),
+            ('Nested option values', 'B', 'B', True),
+        ])
+
+    def test_repeated_questions_share_one_row(self):
+        questions = [{'question': 'Capital of the UK?', 'options': OPTIONS, 'answer': 'London'}]
+        first, _ = self.record(questions, ['London'])
+        # Same question after whitespace normalization, submitted in a later attempt
+        second, _ = self.record([{'question': '  Capital of  the UK? ', 'options': OPTIONS, 'answer': 'London'}], ['Rome'])
+
+        self.assertEqual(QuizQuestion.objects.count(), 1)
+        self.assertEqual(
+            QuizAnswer.objects.get(attempt_id=first).question_id_id,
+            QuizAnswer.objects.get(attempt_id=second).question_id_id,
+        )
+
+    def test_concurrent_insert_of_the_same_question(self):
+        question = {'question': 'Capital of the UK?', 'options': OPTIONS, 'answer': 'London'}
+        content_hash = question_content_hash('Capital of the UK?', list(OPTIONS.values()), 'B')
+        bulk_create = QuizQuestion.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Another submission inserts the same question between the lookup and this insert
+            QuizQuestion.objects.create(
+                quiz_id=self.quiz, question_text='Capital of the UK?', option_a='Paris', option_b='London',
+                option_c='Rome', option_d='Berlin', correct_option='B', content_hash=content_hash,
+            )
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(QuizQuestion.objects, 'bulk_create', side_effect=racing_bulk_create):
+            attempt, recorded = self.record([question], ['London'])
+
+        self.assertEqual(recorded, 1)
+        shared = QuizQuestion.objects.get()
+        self.assertEqual(shared.content_hash, content_hash)
+        self.assertEqual(QuizAnswer.objects.get(attempt_id=attempt).question_id_id, shared.pk)
+
+
+@override_settings(SUBMISSION_PROCESSING='inline')
+class SubmissionJobTests(TestCase):
+    def setUp(self):
+        self.user, self.student_reg = create_student('submitter')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, payload, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/quizzes/submit-attempt/', payload, format='json', headers=headers)
+
+    def test_repeated_idempotency_key_returns_the_first_submission(self):
+        first = self.submit(quiz_payload(), **{'Idempotency-Key': 'abc-123'})
+        second = self.submit(quiz_payload(), **{'Idempotency-Key': 'abc-123'})
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.data['job_id'], second.data['job_id'])
+        self.assertEqual(first.data['attempt_id'], second.data['attempt_id'])
+        self.assertEqual(second.data['processing_status'], 'done')
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+        self.assertEqual(SubmissionJob.objects.count(), 1)
+        self.assertEqual(QuizAnswer.objects.count(), 3)
+
+    def test_redelivered_job_is_not_applied_twice(self):
+        with mock.patch('quizzes.tasks.process_submission.delay') as delay, \
+                override_settings(SUBMISSION_PROCESSING='celery'):
+            response = self.submit(quiz_payload())
+        delay.assert_called_once_with(response.data['job_id'])
+        self.assertEqual(response.data['processing_status'], 'pending')
+
+        job_id = response.data['job_id']
+        self.assertEqual(process_submission_job(job_id), 'done')
+        self.assertEqual(process_submission_job(job_id), 'done')
+
+        job = SubmissionJob.objects.get(pk=job_id)
+        self.assertEqual(job.payload_json, '')
+        self.assertEqual(QuizAnswer.objects.count(), 3)
+        self.assertEqual(StudentPerformance.objects.get(student=self.user).total_quizzes_attempted, 1)
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data['processing_status'], 'done')
+        self.assertEqual(len(status_response.data['results']), 3)
+
+
+class PerformanceResponseTests(TestCase):
+    """
+    get_student_performance and get_quiz_statistics aggregate in the database;
+    the expected responses were produced by the per-attempt Python loops they replaced.
+    """
+    QUIZ_ATTEMPTS = [
+        # subject, class_name, difficulty_level, total_questions, correct_answers, score (newest first)
+        ('Mathematics', '7th', 'simple', 10, 8, 80.0),
+        ('Science', '8th', 'hard', 5, 2, 40.0),
+        ('Mathematics', '', 'medium', 4, 0, 0.0),
+        (None, '7th', '', 6, 3, None),
+        ('Science', None, 'hard', 8, 6, 75.0),
+    ]
+    MOCK_TEST_ATTEMPTS = [(62.5, 20, 12), (None, 10, 0), (0.0, 0, 0)]
+
+    def setUp(self):
+        self.user, student_reg = create_student('stats')
+        now = timezone.now()
+        for minutes, (subject, class_name, difficulty, total, correct, score) in enumerate(self.QUIZ_ATTEMPTS):
+            attempt = QuizAttempt.objects.create(
+                student_id=student_reg, subject=subject, class_name=class_name, difficulty_level=difficulty,
+                total_questions=total, correct_answers=correct, score=score,
+            )
+            QuizAttempt.objects.filter(pk=attempt.pk).update(attempted_at=now - timedelta(minutes=minutes))
+        mock_test = placeholder_mock_test('Algebra')
+        for score, total, correct in self.MOCK_TEST_ATTEMPTS:
+            MockTestAttempt.objects.create(
+                test_id=mock_test, student_id=student_reg, score=score, total_questions=total, correct_answers=correct
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSameResponse(self, data, expected):
+        self.assertEqual(data, expected)
+        # Breakdown groups keep their order (most recently attempted first)
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                self.assertEqual(list(data[key]), list(value))
+
+    def test_student_performance(self):
+        response = self.client.get('/api/quizzes/performance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertSameResponse(response.data, {
+            'total_quizzes_attempted': 5,
+            'total_mock_tests_attempted': 3,
+            'total_attempts': 8,
+            'total_questions_answered': 33,
+            'total_correct_answers': 19,
+            'overall_average_score': 64.38,
+            'accuracy_percentage': 57.58,
+            'quiz_average_score': 65.0,
+            'mock_test_average_score': 62.5,
+            'mock_test_questions_answered': 30,
+            'mock_test_correct_answers': 12,
+            'subject_wise_performance': {
+                'Mathematics': {'total_attempts': 2, 'total_questions': 14, 'correct_answers': 8, 'total_score': 80.0, 'average_score': 40.0},
+                'Science': {'total_attempts': 2, 'total_questions': 13, 'correct_answers': 8, 'total_score': 115.0, 'average_score': 57.5},
+                'Unknown': {'total_attempts': 1, 'total_questions': 6, 'correct_answers': 3, 'total_score': 0, 'average_score': 0.0},
+                'Mock Test': {'total_attempts': 3, 'total_questions': 30, 'correct_answers': 62, 'total_score': 62.5, 'average_score': 62.5 / 3},
+            },
+            'class_wise_performance': {
+                '7th': {'total_attempts': 2, 'total_questions': 16, 'correct_answers': 11, 'total_score': 80.0, 'average_score': 40.0},
+                '8th': {'total_attempts': 1, 'total_questions': 5, 'correct_answers': 2, 'total_score': 40.0, 'average_score': 40.0},
+                'Unknown': {'total_attempts': 2, 'total_questions': 12, 'correct_answers': 6, 'total_score': 75.0, 'average_score': 37.5},
+            },
+            'difficulty_wise_performance': {
+                'simple': {'total_attempts': 2, 'total_questions': 16, 'correct_answers': 11, 'total_score': 80.0, 'average_score': 40.0},
+                'hard': {'total_attempts': 2, 'total_questions': 13, 'correct_answers': 8, 'total_score': 115.0, 'average_score': 57.5},
+                'medium': {'total_attempts': 1, 'total_questions': 4, 'correct_answers': 0, 'total_score': 0, 'average_score': 0.0},
+            },
+        })
+
+    def test_quiz_statistics(self):
+        response = self.client.get('/api/quizzes/statistics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertSameResponse(response.data, {
+            'overall': {'total_attempts': 8, 'total_questions': 33, 'total_correct_answers': 19, 'average_score': 64.38, 'accuracy_percentage': 57.58},
+            'quiz': {'total_attempts': 5, 'total_questions': 33, 'total_correct_answers': 19, 'average_score': 48.75, 'accuracy_percentage': 57.58},
+            'mock_test': {'total_attempts': 3, 'total_questions': 30, 'total_correct_answers': 62.5, 'average_score': 20.83, 'accuracy_percentage': 208.33},
+            'subject_wise': {
+                'Mathematics': {'attempts': 2, 'total_score': 80.0, 'total_questions': 14, 'average_score': 40.0},
+                'Science': {'attempts': 2, 'total_score': 115.0, 'total_questions': 13, 'average_score': 57.5},
+                'Unknown': {'attempts': 1, 'total_score': 0, 'total_questions': 6, 'average_score': 0.0},
+                'Mock Test': {'attempts': 3, 'total_score': 62.5, 'total_questions': 30, 'average_score': 62.5 / 3},
+            },
+            'class_wise': {
+                '7th': {'attempts': 2, 'total_score': 80.0, 'average_score': 40.0},
+                '8th': {'attempts': 1, 'total_score': 40.0, 'average_score': 40.0},
+                'Unknown': {'attempts': 2, 'total_score': 75.0, 'average_score': 37.5},
+                'Mock Test Class': {'attempts': 3, 'total_score': 62.5, 'average_score': 62.5 / 3},
+            },
+            'difficulty_wise': {
+                'simple': {'attempts': 2, 'total_score': 80.0, 'average_score': 40.0},
+                'hard': {'attempts': 2, 'total_score': 115.0, 'average_score': 57.5},
+                'medium': {'attempts': 1, 'total_score': 0, 'average_score': 0.0},
+            },
+        })
+
+
+@override_settings(SUBMISSION_PROCESSING='inline')
+class StudentPerformanceRollupTests(TestCase):
+    SUBMISSIONS = [
+        # questions, correct, subject, className, difficultyLevel
+        (10, 9, 'Mathematics', '7th', 'simple'),
+        (4, 1, 'Science', 'Class 8', 'hard'),
+        (6, 6, 'Computer Science', '10th', 'medium'),
+        (5, 2, 'History', '9', 'simple'),
+        (8, 5, 'Mathematics', '8th', 'medium'),
+    ]
+
+    def setUp(self):
+        self.user, self.student_reg = create_student('rollup')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit_all(self, submissions):
+        for questions, correct, subject, class_name, difficulty in submissions:
+            payload = quiz_payload(questions, correct, subject=subject, className=class_name, difficultyLevel=difficulty)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/quizzes/submit-attempt/', payload, format='json')
+            self.assertEqual(response.status_code, 201)
+
+    def performance_values(self):
+        values = StudentPerformance.objects.filter(student=self.user).values().get()
+        for field in ('id', 'last_updated'):
+            values.pop(field, None)
+        return values
+
+    def assertMatchesRebuild(self):
+        incremental = self.performance_values()
+        rebuild_student_performance(self.student_reg)
+        rebuilt = self.performance_values()
+        self.assertEqual(set(incremental), set(rebuilt))
+        for field, value in rebuilt.items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(incremental[field], value, places=6, msg=field)
+            else:
+                self.assertEqual(incremental[field], value, msg=field)
+
+    def test_incremental_row_matches_rebuild(self):
+        self.submit_all(self.SUBMISSIONS)
+        self.assertEqual(self.performance_values()['total_quizzes_attempted'], len(self.SUBMISSIONS))
+        self.assertMatchesRebuild()
+
+    def test_row_from_before_the_counters_is_rebuilt(self):
+        self.submit_all(self.SUBMISSIONS[:3])
+        # As left by migrations 0006 and 0007: averages filled in, attempt counters at zero, flagged
+        StudentPerformance.objects.filter(student=self.user).update(
+            scored_attempts=0, mathematics_attempts=0, science_attempts=0, english_attempts=0, computers_attempts=0,
+            class_7_attempts=0, class_8_attempts=0, class_9_attempts=0, class_10_attempts=0,
+            simple_difficulty_attempts=0, medium_difficulty_attempts=0, hard_difficulty_attempts=0,
+            needs_rebuild=True,
+        )
+        self.submit_all(self.SUBMISSIONS[3:])
+        self.assertEqual(self.performance_values()['scored_attempts'], len(self.SUBMISSIONS))
+        self.assertFalse(self.performance_values()['needs_rebuild'])
+        self.assertMatchesRebuild()
+
+    def test_unscored_attempts_are_not_rebuilt_every_time(self):
+        # Attempts recorded without a score leave scored_attempts at zero on a current row
+        with mock.patch('quizzes.performance.rebuild_student_performance') as rebuild:
+            for _ in range(3):
+                attempt = QuizAttempt.objects.create(student_id=self.student_reg, total_questions=5, score=None)
+                update_student_performance(self.student_reg, attempt)
+        rebuild.assert_not_called()
+        values = self.performance_values()
+        self.assertEqual((values['total_quizzes_attempted'], values['scored_attempts']), (3, 0))
@@ -27,9 +27,12 @@ urlpatterns = [
     # NEW: Enhanced Quiz Tracking System
     path('submit-attempt/', views.submit_quiz_attempt, name='submit_quiz_attempt'),
     path('submit-mock-test/', views.submit_mock_test_attempt, name='submit_mock_test_attempt'),
+    path('submissions/<uuid:job_id>/', views.get_submission_status, name='submission_status'),
     path('recent-attempts/', views.get_recent_quiz_attempts, name='recent_quiz_attempts'),
     path('child-attempts/', views.get_child_quiz_attempts, name='child_quiz_attempts'),
     path('performance/', views.get_student_performance, name='student_performance'),
+    path('performance/summary/', views.get_student_performance_summary, name='student_performance_summary'),
+    path('performance/child-summary/', views.get_child_performance_summary, name='child_performance_summary'),
     path('statistics/', views.get_quiz_statistics, name='quiz_statistics'),
     
     # Static Quiz endpoints (7th Class Subjects)
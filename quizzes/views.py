@@ -1,7 +1,10 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Avg, Count, Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Avg, Count, Max, Sum
+from django.db.models.functions import Floor
+from django.urls import reverse
 from django.utils import timezone
 from datetime import datetime, timedelta
 import requests
@@ -9,9 +12,12 @@ import json
 
 from .models import (
     Quiz, QuizQuestion, QuizAttempt, QuizAnswer, MockTest, MockTestQuestion, MockTestAttempt, MockTestAnswer,
-    Question, QuestionOption, QuizResult, QuizAnalytics, StudentPerformance
+    Question, QuestionOption, QuizResult, QuizAnalytics, StudentPerformance, SubmissionJob
+)
+from authentication.models import StudentRegistration, User
+from .submissions import (
+    create_submission_job, enqueue_quiz_analytics, placeholder_mock_test, submission_results
 )
-from authentication.models import StudentRegistration
 
 def get_student_registration(user):
     """
@@ -246,13 +252,8 @@ def submit_quiz(request, pk):
                 time_per_question_seconds=attempt.time_taken_minutes * 60 / total_questions if total_questions > 0 else 0
             )
             
-            # Update analytics
-            analytics, created = QuizAnalytics.objects.get_or_create(quiz=attempt.quiz)
-            analytics.total_attempts += 1
-            analytics.average_score = (analytics.average_score * (analytics.total_attempts - 1) + score_percentage) / analytics.total_attempts
-            analytics.pass_rate = QuizAttempt.objects.filter(quiz=attempt.quiz, is_passed=True).count() / analytics.total_attempts * 100
-            analytics.average_time_minutes = QuizAttempt.objects.filter(quiz=attempt.quiz).aggregate(avg_time=Avg('time_taken_minutes'))['avg_time'] or 0
-            analytics.save()
+            # Update analytics in the background (one aggregate query, off the request path)
+            enqueue_quiz_analytics(attempt.quiz.pk, attempt.quiz.passing_score)
             
             return Response({
                 'message': 'Quiz submitted successfully',
@@ -411,6 +412,48 @@ class AvailableQuizzesView(generics.ListAPIView):
 # NEW API VIEWS FOR QUIZ TRACKING SYSTEM
 # ============================================
 
+def get_idempotency_key(request):
+    """
+    Helper function to read the optional Idempotency-Key header of a submission
+    """
+    key = request.headers.get('Idempotency-Key', '').strip()
+    return key[:100] or None
+
+
+def get_existing_submission(student_reg, idempotency_key):
+    """
+    Helper function to find the job of an earlier submission sent with the same Idempotency-Key
+    """
+    if not idempotency_key:
+        return None
+    return SubmissionJob.objects.filter(student_id=student_reg.student_id, idempotency_key=idempotency_key).first()
+
+
+def submission_accepted_response(request, job, message, attempt=None):
+    """
+    Helper function to build the 201 response of an accepted submission.
+    Detailed results are computed in the background and polled from status_url.
+    """
+    if attempt is None:
+        attempt_model = QuizAttempt if job.kind == 'quiz' else MockTestAttempt
+        attempt = attempt_model.objects.get(pk=job.attempt_id)
+    # Inline processing (or a fast worker) may already have finished the job
+    job.refresh_from_db(fields=['status'])
+    response_data = {
+        'message': message,
+        'attempt_id': attempt.attempt_id,
+        'score': attempt.score,
+    }
+    if job.kind == 'quiz':
+        response_data['completion_percentage'] = attempt.completion_percentage
+    response_data.update({
+        'job_id': str(job.job_id),
+        'processing_status': job.status,
+        'status_url': reverse('submission_status', args=[job.job_id]),
+    })
+    return Response(response_data, status=status.HTTP_201_CREATED)
+
+
 def submit_mock_test_logic(request, validated_data, student_reg):
     """
     Helper function to handle mock test submission logic
@@ -425,30 +468,10 @@ def submit_mock_test_logic(request, validated_data, student_reg):
     test_data_json = json.dumps(test_questions) if test_questions else ''
     answers_json = json.dumps(user_answers) if user_answers else ''
     
-    # Create a dummy MockTest record for AI-generated mock tests (required by foreign key)
-    from courses.models import Topic, Course
-    # Create a dummy course and topic for AI-generated mock tests
-    course, created = Course.objects.get_or_create(
-        course_id=2,  # Use different ID for mock tests
-        defaults={
-            'course_name': 'AI Generated Mock Tests',
-            'course_price': 0.00
-        }
-    )
-    
-    # Try to find or create a topic for this subtopic
-    topic, created = Topic.objects.get_or_create(
-        topic_name=validated_data['subtopic'],
-        defaults={
-            'course_id': course.course_id
-        }
-    )
-    
-    # Create a dummy mock test for this AI-generated mock test
-    dummy_mock_test, created = MockTest.objects.get_or_create(
-        title=f"AI Generated Mock Test - {validated_data['subtopic']}",
-        topic_id=topic
-    )
+    idempotency_key = get_idempotency_key(request)
+    existing_job = get_existing_submission(student_reg, idempotency_key)
+    if existing_job:
+        return submission_accepted_response(request, existing_job, 'Mock test attempt submitted successfully')
     
     # Sanitize and validate class_name for mock tests
     class_name = validated_data.get('class_name', '').strip()
@@ -459,98 +482,48 @@ def submit_mock_test_logic(request, validated_data, student_reg):
         else:
             class_name = 'Unknown Class'
     
-    # Create mock test attempt with all detailed information (same as quiz system)
-    attempt = MockTestAttempt.objects.create(
-        test_id=dummy_mock_test,
-        student_id=student_reg,
-        score=validated_data['score'],
-        answers_json=answers_json,
-        quiz_type=validated_data.get('quiz_type', 'mock_test'),
-        subject=validated_data.get('subject', ''),
-        chapter=validated_data.get('chapter', ''),
-        topic=validated_data.get('topic', ''),
-        subtopic=validated_data.get('subtopic', ''),
-        class_name=class_name,
-        difficulty_level=validated_data.get('difficulty_level', ''),
-        language=validated_data.get('language', ''),
-        total_questions=validated_data.get('total_questions', 0),
-        correct_answers=validated_data.get('correct_answers', 0),
-        wrong_answers=validated_data.get('wrong_answers', 0),
-        unanswered_questions=validated_data.get('unanswered_questions', 0),
-        time_taken_seconds=validated_data.get('time_taken_seconds', 0),
-        completion_percentage=validated_data['score'],
-        mock_test_data_json=test_data_json
-    )
-    
-    # Create individual mock test answers for detailed tracking
-    for i, (question, answer) in enumerate(zip(test_questions, user_answers)):
-        try:
-            # Handle the actual frontend data format
-            question_text = question.get('question', '')
-            options = question.get('options', {})
-            correct_answer = question.get('answer', '')
-            
-            # Extract options - handle both dict and array formats
-            if isinstance(options, dict):
-                option_a = options.get('A', '')
-                option_b = options.get('B', '')
-                option_c = options.get('C', '')
-                option_d = options.get('D', '')
-            elif isinstance(options, list):
-                option_a = options[0] if len(options) > 0 else ''
-                option_b = options[1] if len(options) > 1 else ''
-                option_c = options[2] if len(options) > 2 else ''
-                option_d = options[3] if len(options) > 3 else ''
-            else:
-                option_a = option_b = option_c = option_d = ''
-            
-            # Convert answer text to option letter (A, B, C, D)
-            def get_option_letter(answer_text, options_dict):
-                """Convert answer text to option letter"""
-                if isinstance(options_dict, list):
-                    options_dict = {chr(65 + i): opt for i, opt in enumerate(options_dict)}
-
-                for letter, text in options_dict.items():
-                    if text == answer_text:
-                        return letter
-                return 'A'  # Default fallback
-            
-            correct_option_letter = get_option_letter(correct_answer, options)
-            selected_option_letter = get_option_letter(str(answer), options)
-            
-            # Create a MockTestQuestion record for this attempt
-            mock_test_question = MockTestQuestion.objects.create(
+    # Save the attempt and its processing job; the answer rows are written in the background
+    try:
+        with transaction.atomic():
+            # Get the placeholder MockTest for AI-generated mock tests (the attempt's test is required)
+            dummy_mock_test = placeholder_mock_test(validated_data['subtopic'])
+        
+            # Create mock test attempt with all detailed information (same as quiz system)
+            attempt = MockTestAttempt.objects.create(
                 test_id=dummy_mock_test,
-                question_text=question_text,
-                option_a=option_a,
-                option_b=option_b,
-                option_c=option_c,
-                option_d=option_d,
-                correct_option=correct_option_letter
-            )
-            
-            # Create a MockTestAnswer record
-            is_correct = selected_option_letter == correct_option_letter
-            
-            MockTestAnswer.objects.create(
-                attempt_id=attempt,
-                question_id=mock_test_question,
-                selected_option=selected_option_letter,
-                is_correct=is_correct
+                student_id=student_reg,
+                score=validated_data['score'],
+                answers_json=answers_json,
+                quiz_type=validated_data.get('quiz_type', 'mock_test'),
+                subject=validated_data.get('subject', ''),
+                chapter=validated_data.get('chapter', ''),
+                topic=validated_data.get('topic', ''),
+                subtopic=validated_data.get('subtopic', ''),
+                class_name=class_name,
+                difficulty_level=validated_data.get('difficulty_level', ''),
+                language=validated_data.get('language', ''),
+                total_questions=validated_data.get('total_questions', 0),
+                correct_answers=validated_data.get('correct_answers', 0),
+                wrong_answers=validated_data.get('wrong_answers', 0),
+                unanswered_questions=validated_data.get('unanswered_questions', 0),
+                time_taken_seconds=validated_data.get('time_taken_seconds', 0),
+                completion_percentage=validated_data['score'],
+                mock_test_data_json=test_data_json
             )
-            
-        except Exception as e:
-            # Log error but continue processing other questions
-            print(f"Error processing mock test question {i}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-    
-    return Response({
-        'message': 'Mock test attempt submitted successfully',
-        'attempt_id': attempt.attempt_id,
-        'score': attempt.score
-    }, status=status.HTTP_201_CREATED)
+        
+            # Individual mock test questions and answers are recorded by the worker
+            job = create_submission_job('mock_test', attempt, student_reg, {
+                'questions': test_questions,
+                'answers': user_answers,
+            }, idempotency_key)
+    except IntegrityError:
+        # A concurrent request with the same Idempotency-Key got there first; this attempt was rolled back
+        existing_job = get_existing_submission(student_reg, idempotency_key)
+        if existing_job is None:
+            raise
+        return submission_accepted_response(request, existing_job, 'Mock test attempt submitted successfully')
+    
+    return submission_accepted_response(request, job, 'Mock test attempt submitted successfully', attempt)
 
 
 @api_view(['POST'])
@@ -600,128 +573,51 @@ def submit_quiz_attempt(request):
             else:
                 class_name = 'Unknown Class'
         
-        # Create quiz attempt
-        attempt = QuizAttempt.objects.create(
-            student_id=student_reg,
-            quiz_type=validated_data['quiz_type'],
-            subject=validated_data['subject'],
-            chapter=validated_data.get('chapter', ''),
-            topic=validated_data.get('topic', ''),
-            subtopic=validated_data['subtopic'],
-            class_name=class_name,
-            difficulty_level=validated_data['difficulty_level'],
-            language=validated_data['language'],
-            total_questions=validated_data['total_questions'],
-            correct_answers=validated_data['correct_answers'],
-            wrong_answers=validated_data['wrong_answers'],
-            unanswered_questions=validated_data['unanswered_questions'],
-            time_taken_seconds=validated_data['time_taken_seconds'],
-            score=validated_data['score'],
-            quiz_data_json=quiz_data_json,
-            answers_json=answers_json,
-            completion_percentage=(validated_data['correct_answers'] / validated_data['total_questions']) * 100
-        )
-        
-        # Create a dummy Quiz record for AI-generated questions (required by foreign key)
-        dummy_quiz = None
-        if validated_data['quiz_type'] == 'ai_generated':
-            from courses.models import Topic, Course
-            # Create a dummy course and topic for AI-generated quizzes
-            course, created = Course.objects.get_or_create(
-                course_id=1,
-                defaults={
-                    'course_name': 'AI Generated Quizzes',
-                    'course_price': 0.00
-                }
-            )
-            
-            # Try to find or create a topic for this subtopic
-            topic, created = Topic.objects.get_or_create(
-                topic_name=validated_data['subtopic'],
-                defaults={
-                    'course_id': course.course_id
-                }
-            )
-            
-            # Create a dummy quiz for this AI-generated quiz
-            dummy_quiz, created = Quiz.objects.get_or_create(
-                title=f"AI Generated Quiz - {validated_data['subtopic']}",
-                topic_id=topic
-            )
+        idempotency_key = get_idempotency_key(request)
+        existing_job = get_existing_submission(student_reg, idempotency_key)
+        if existing_job:
+            return submission_accepted_response(request, existing_job, 'Quiz attempt submitted successfully')
         
-        # Create individual quiz answers for detailed tracking
-        for i, (question, answer) in enumerate(zip(quiz_questions, user_answers)):
-            try:
-                # Handle the actual frontend data format
-                # question: {question: "...", options: {...}, answer: "..."}
-                # answer: string (selected answer text)
-                
-                question_text = question.get('question', '')
-                options = question.get('options', {})
-                correct_answer = question.get('answer', '')
-                
-                # Extract options - handle both dict and array formats
-                if isinstance(options, dict):
-                    option_a = options.get('A', '')
-                    option_b = options.get('B', '')
-                    option_c = options.get('C', '')
-                    option_d = options.get('D', '')
-                elif isinstance(options, list):
-                    option_a = options[0] if len(options) > 0 else ''
-                    option_b = options[1] if len(options) > 1 else ''
-                    option_c = options[2] if len(options) > 2 else ''
-                    option_d = options[3] if len(options) > 3 else ''
-                else:
-                    option_a = option_b = option_c = option_d = ''
-                
-                # Convert answer text to option letter (A, B, C, D)
-                def get_option_letter(answer_text, options_dict):
-                    """Convert answer text to option letter"""
-                    for letter, text in options_dict.items():
-                        if text == answer_text:
-                            return letter
-                    return 'A'  # Default fallback
-                
-                correct_option_letter = get_option_letter(correct_answer, options)
-                selected_option_letter = get_option_letter(str(answer), options)
-                
-                # Create a QuizQuestion record for this attempt
-                quiz_question = QuizQuestion.objects.create(
-                    quiz_id=dummy_quiz,  # Use dummy quiz for AI-generated quizzes
-                    question_text=question_text,
-                    option_a=option_a,
-                    option_b=option_b,
-                    option_c=option_c,
-                    option_d=option_d,
-                    correct_option=correct_option_letter  # Store the option letter
-                )
-                
-                # Create a QuizAnswer record
-                is_correct = selected_option_letter == correct_option_letter
-                
-                QuizAnswer.objects.create(
-                    attempt_id=attempt,
-                    question_id=quiz_question,
-                    selected_option=selected_option_letter,
-                    is_correct=is_correct
+        # Save the attempt and its processing job; answer rows and performance are updated in the background
+        try:
+            with transaction.atomic():
+                # Create quiz attempt
+                attempt = QuizAttempt.objects.create(
+                    student_id=student_reg,
+                    quiz_type=validated_data['quiz_type'],
+                    subject=validated_data['subject'],
+                    chapter=validated_data.get('chapter', ''),
+                    topic=validated_data.get('topic', ''),
+                    subtopic=validated_data['subtopic'],
+                    class_name=class_name,
+                    difficulty_level=validated_data['difficulty_level'],
+                    language=validated_data['language'],
+                    total_questions=validated_data['total_questions'],
+                    correct_answers=validated_data['correct_answers'],
+                    wrong_answers=validated_data['wrong_answers'],
+                    unanswered_questions=validated_data['unanswered_questions'],
+                    time_taken_seconds=validated_data['time_taken_seconds'],
+                    score=validated_data['score'],
+                    quiz_data_json=quiz_data_json,
+                    answers_json=answers_json,
+                    completion_percentage=(validated_data['correct_answers'] / validated_data['total_questions']) * 100
                 )
-                
-            except Exception as e:
-                # Log error but continue processing other questions
-                print(f"Error processing question {i}: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        # Update student performance
-        update_student_performance(student_reg, attempt)
+            
+                # The worker records individual quiz questions and answers and updates student performance
+                job = create_submission_job('quiz', attempt, student_reg, {
+                    'quiz_type': validated_data['quiz_type'],
+                    'subtopic': validated_data['subtopic'],
+                    'questions': quiz_questions,
+                    'answers': user_answers,
+                }, idempotency_key)
+        except IntegrityError:
+            # A concurrent request with the same Idempotency-Key got there first; this attempt was rolled back
+            existing_job = get_existing_submission(student_reg, idempotency_key)
+            if existing_job is None:
+                raise
+            return submission_accepted_response(request, existing_job, 'Quiz attempt submitted successfully')
         
-        return Response({
-            'message': 'Quiz attempt submitted successfully',
-            'attempt_id': attempt.attempt_id,
-            'score': attempt.score,
-            'completion_percentage': attempt.completion_percentage
-        }, status=status.HTTP_201_CREATED)
+        return submission_accepted_response(request, job, 'Quiz attempt submitted successfully', attempt)
     
     # Log validation errors for debugging
     print(f"❌ Validation errors:")
@@ -756,116 +652,78 @@ def submit_mock_test_attempt(request):
         test_data_json = json.dumps(test_questions) if test_questions else ''
         answers_json = json.dumps(user_answers) if user_answers else ''
         
-        # Create a dummy MockTest record for AI-generated mock tests (required by foreign key)
-        dummy_mock_test = None
-        from courses.models import Topic, Course
-        # Create a dummy course and topic for AI-generated mock tests
-        course, created = Course.objects.get_or_create(
-            course_id=2,  # Use different ID for mock tests
-            defaults={
-                'course_name': 'AI Generated Mock Tests',
-                'course_price': 0.00
-            }
-        )
-        
-        # Try to find or create a topic for this subtopic
-        topic, created = Topic.objects.get_or_create(
-            topic_name=validated_data['subtopic'],
-            defaults={
-                'course_id': course.course_id
-            }
-        )
-        
-        # Create a dummy mock test for this AI-generated mock test
-        dummy_mock_test, created = MockTest.objects.get_or_create(
-            title=f"AI Generated Mock Test - {validated_data['subtopic']}",
-            topic_id=topic
-        )
+        idempotency_key = get_idempotency_key(request)
+        existing_job = get_existing_submission(student_reg, idempotency_key)
+        if existing_job:
+            return submission_accepted_response(request, existing_job, 'Mock test attempt submitted successfully')
         
-        # Create mock test attempt
-        attempt = MockTestAttempt.objects.create(
-            test_id=dummy_mock_test,
-            student_id=student_reg,
-            score=validated_data['score']
-        )
-        
-        # Create individual mock test answers for detailed tracking
-        for i, (question, answer) in enumerate(zip(test_questions, user_answers)):
-            try:
-                # Handle the actual frontend data format
-                # question: {question: "...", options: {...}, answer: "..."}
-                # answer: string (selected answer text)
-                
-                question_text = question.get('question', '')
-                options = question.get('options', {})
-                correct_answer = question.get('answer', '')
-                
-                # Extract options - handle both dict and array formats
-                if isinstance(options, dict):
-                    option_a = options.get('A', '')
-                    option_b = options.get('B', '')
-                    option_c = options.get('C', '')
-                    option_d = options.get('D', '')
-                elif isinstance(options, list):
-                    option_a = options[0] if len(options) > 0 else ''
-                    option_b = options[1] if len(options) > 1 else ''
-                    option_c = options[2] if len(options) > 2 else ''
-                    option_d = options[3] if len(options) > 3 else ''
-                else:
-                    option_a = option_b = option_c = option_d = ''
-                
-                # Convert answer text to option letter (A, B, C, D)
-                def get_option_letter(answer_text, options_dict):
-                    """Convert answer text to option letter"""
-                    # If options_dict is a list, convert it to a dict for lookup
-                    if isinstance(options_dict, list):
-                        options_dict = {chr(65 + i): opt for i, opt in enumerate(options_dict)}
-
-                    for letter, text in options_dict.items():
-                        if text == answer_text:
-                            return letter
-                    return 'A'  # Default fallback
-                
-                correct_option_letter = get_option_letter(correct_answer, options)
-                selected_option_letter = get_option_letter(str(answer), options)
-                
-                # Create a MockTestQuestion record for this attempt
-                mock_test_question = MockTestQuestion.objects.create(
+        # Save the attempt and its processing job; the answer rows are written in the background
+        try:
+            with transaction.atomic():
+                # Get the placeholder MockTest for AI-generated mock tests (the attempt's test is required)
+                dummy_mock_test = placeholder_mock_test(validated_data['subtopic'])
+            
+                # Create mock test attempt
+                attempt = MockTestAttempt.objects.create(
                     test_id=dummy_mock_test,
-                    question_text=question_text,
-                    option_a=option_a,
-                    option_b=option_b,
-                    option_c=option_c,
-                    option_d=option_d,
-                    correct_option=correct_option_letter
+                    student_id=student_reg,
+                    score=validated_data['score']
                 )
-                
-                # Create a MockTestAnswer record
-                is_correct = selected_option_letter == correct_option_letter
-                
-                MockTestAnswer.objects.create(
-                    attempt_id=attempt,
-                    question_id=mock_test_question,
-                    selected_option=selected_option_letter,
-                    is_correct=is_correct
-                )
-                
-            except Exception as e:
-                # Log error but continue processing other questions
-                print(f"Error processing mock test question {i}: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
+            
+                # Individual mock test questions and answers are recorded by the worker
+                job = create_submission_job('mock_test', attempt, student_reg, {
+                    'questions': test_questions,
+                    'answers': user_answers,
+                }, idempotency_key)
+        except IntegrityError:
+            # A concurrent request with the same Idempotency-Key got there first; this attempt was rolled back
+            existing_job = get_existing_submission(student_reg, idempotency_key)
+            if existing_job is None:
+                raise
+            return submission_accepted_response(request, existing_job, 'Mock test attempt submitted successfully')
         
-        return Response({
-            'message': 'Mock test attempt submitted successfully',
-            'attempt_id': attempt.attempt_id,
-            'score': attempt.score
-        }, status=status.HTTP_201_CREATED)
+        return submission_accepted_response(request, job, 'Mock test attempt submitted successfully', attempt)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_submission_status(request, job_id):
+    """
+    Poll the background processing of a quiz or mock test submission.
+    Per-question results are included once processing is done.
+    """
+    student_reg = get_student_registration(request.user)
+    if not student_reg:
+        return Response(
+            {'error': 'Student registration not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        job = SubmissionJob.objects.get(job_id=job_id, student_id=student_reg.student_id)
+    except SubmissionJob.DoesNotExist:
+        return Response(
+            {'error': 'Submission not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    response_data = {
+        'job_id': str(job.job_id),
+        'kind': job.kind,
+        'attempt_id': job.attempt_id,
+        'processing_status': job.status,
+        'tries': job.tries,
+        'error': job.last_error,
+        'submitted_at': job.created_at,
+        'completed_at': job.completed_at,
+    }
+    if job.status == 'done':
+        response_data['results'] = submission_results(job)
+    return Response(response_data)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_recent_quiz_attempts(request):
@@ -1065,6 +923,116 @@ def get_child_quiz_attempts(request):
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def get_performance_summary(student_reg):
+    """
+    Helper function to read a student's StudentPerformance rollup (one indexed lookup).
+    Students who have not completed a quiz get an all-zero summary.
+    """
+    user = User.objects.filter(username=student_reg.student_username).first()
+    if user is None:
+        return None
+    performance = StudentPerformance.objects.select_related('student').filter(student=user).first()
+    if performance is None:
+        performance = StudentPerformance(student=user)
+    return StudentPerformanceSerializer(performance).data
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_student_performance_summary(request):
+    """
+    Get the logged-in student's performance summary from the StudentPerformance rollup
+    """
+    performance = StudentPerformance.objects.select_related('student').filter(student=request.user).first()
+    if performance is None:
+        if not get_student_registration(request.user):
+            return Response({'error': 'Student registration not found'}, status=status.HTTP_404_NOT_FOUND)
+        performance = StudentPerformance(student=request.user)
+    return Response(StudentPerformanceSerializer(performance).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_child_performance_summary(request):
+    """
+    Get the performance summary of a parent's linked child from the StudentPerformance rollup
+    """
+    user = request.user
+    
+    if user.role != 'Parent':
+        return Response({'error': 'Access denied. Only parent users can access this endpoint.'}, 
+                       status=status.HTTP_403_FORBIDDEN)
+    
+    from authentication.models import ParentRegistration
+    try:
+        parent_registration = ParentRegistration.objects.get(parent_username=user.username)
+    except ParentRegistration.DoesNotExist:
+        return Response({'error': 'Parent registration not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # For now, use the first linked student (same as child-attempts)
+    student_reg = StudentRegistration.objects.filter(parent_email=parent_registration.email).first()
+    if not student_reg:
+        return Response({'error': 'No child found linked to this parent account.'}, 
+                       status=status.HTTP_404_NOT_FOUND)
+    
+    summary = get_performance_summary(student_reg)
+    if summary is None:
+        return Response({'error': 'Child account not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(summary)
+
+
+def get_attempt_totals(attempts, **extra):
+    """
+    Helper function to total a set of quiz or mock test attempts in one aggregate query.
+    ``scored_*`` only count truthy scores (neither NULL nor 0), as the score averages always have.
+    """
+    scored = Q(score__isnull=False) & ~Q(score=0)
+    totals = attempts.aggregate(
+        attempts=Count('pk'),
+        total_questions=Sum('total_questions'),
+        correct_answers=Sum('correct_answers'),
+        total_score=Sum('score'),
+        scored_attempts=Count('pk', filter=scored),
+        scored_total=Sum('score', filter=scored),
+        **extra
+    )
+    for key in ('total_questions', 'correct_answers', 'total_score', 'scored_total'):
+        totals[key] = totals[key] or 0
+    return totals
+
+
+def add_group_totals(groups, name, attempts, total_questions, correct_answers, total_score):
+    """
+    Helper function to add attempt totals to a named group of a breakdown
+    """
+    group = groups.setdefault(name, {'attempts': 0, 'total_questions': 0, 'correct_answers': 0, 'total_score': 0})
+    group['attempts'] += attempts
+    group['total_questions'] += total_questions or 0
+    group['correct_answers'] += correct_answers or 0
+    group['total_score'] += total_score or 0
+
+
+def get_grouped_attempt_totals(attempts, field, default):
+    """
+    Helper function to total attempts per value of ``field`` (subject, class, difficulty) in one grouped query.
+    Blank values are reported under ``default``; groups are ordered most recently attempted first.
+    """
+    rows = attempts.values(field).annotate(
+        group_attempts=Count('pk'),
+        group_questions=Sum('total_questions'),
+        group_correct=Sum('correct_answers'),
+        group_score=Sum('score'),
+        latest_attempt=Max('attempted_at'),
+    ).order_by('-latest_attempt')
+    groups = {}
+    for row in rows:
+        add_group_totals(
+            groups, row[field] or default,
+            row['group_attempts'], row['group_questions'], row['group_correct'], row['group_score']
+        )
+    return groups
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_student_performance(request):
@@ -1076,136 +1044,60 @@ def get_student_performance(request):
     if not student_reg:
         return Response({'error': 'Student registration not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get all quiz attempts and mock test attempts for this student
+    # All figures are aggregated in the database; attempt rows (and their JSON columns) are never loaded
     quiz_attempts = QuizAttempt.objects.filter(student_id=student_reg)
     mock_test_attempts = MockTestAttempt.objects.filter(student_id=student_reg)
+    quiz_totals = get_attempt_totals(quiz_attempts)
+    # Mock tests count their whole-number score as correct answers
+    mock_totals = get_attempt_totals(mock_test_attempts, score_as_correct=Sum(Floor('score')))
     
     # Calculate performance metrics (combining quiz and mock test data)
-    total_quizzes_attempted = quiz_attempts.count()
-    total_mock_tests_attempted = mock_test_attempts.count()
+    total_quizzes_attempted = quiz_totals['attempts']
+    total_mock_tests_attempted = mock_totals['attempts']
     total_attempts = total_quizzes_attempted + total_mock_tests_attempted
     
-    total_questions_answered = sum(attempt.total_questions for attempt in quiz_attempts)
-    total_correct_answers = sum(attempt.correct_answers for attempt in quiz_attempts)
+    total_questions_answered = quiz_totals['total_questions']
+    total_correct_answers = quiz_totals['correct_answers']
     
     # Calculate separate average scores for quizzes and mock tests
-    quiz_scores = [attempt.score for attempt in quiz_attempts if attempt.score]
-    mock_test_scores = [attempt.score for attempt in mock_test_attempts if attempt.score]
-    
-    quiz_average_score = sum(quiz_scores) / len(quiz_scores) if quiz_scores else 0
-    mock_test_average_score = sum(mock_test_scores) / len(mock_test_scores) if mock_test_scores else 0
+    quiz_average_score = quiz_totals['scored_total'] / quiz_totals['scored_attempts'] if quiz_totals['scored_attempts'] else 0
+    mock_test_average_score = mock_totals['scored_total'] / mock_totals['scored_attempts'] if mock_totals['scored_attempts'] else 0
     
     # Calculate overall average score (including both quiz and mock test scores)
-    all_scores = quiz_scores + mock_test_scores
-    if all_scores:
-        overall_average_score = sum(all_scores) / len(all_scores)
+    scored_attempts = quiz_totals['scored_attempts'] + mock_totals['scored_attempts']
+    if scored_attempts:
+        overall_average_score = (quiz_totals['scored_total'] + mock_totals['scored_total']) / scored_attempts
     else:
         overall_average_score = 0
     
     # Subject-wise performance (including both quiz and mock test data)
-    subject_performance = {}
-    
-    # Process quiz attempts
-    for attempt in quiz_attempts:
-        subject = attempt.subject or 'Unknown'
-        if subject not in subject_performance:
-            subject_performance[subject] = {
-                'total_attempts': 0,
-                'total_questions': 0,
-                'correct_answers': 0,
-                'total_score': 0
-            }
-        
-        subject_performance[subject]['total_attempts'] += 1
-        subject_performance[subject]['total_questions'] += attempt.total_questions
-        subject_performance[subject]['correct_answers'] += attempt.correct_answers
-        subject_performance[subject]['total_score'] += attempt.score or 0
-    
-    # Process mock test attempts
-    for attempt in mock_test_attempts:
-        subject = 'Mock Test'  # Mock tests are categorized under "Mock Test" subject
-        if subject not in subject_performance:
-            subject_performance[subject] = {
-                'total_attempts': 0,
-                'total_questions': 0,
-                'correct_answers': 0,
-                'total_score': 0
-            }
-        
-        subject_performance[subject]['total_attempts'] += 1
-        # For mock tests, we don't have total_questions and correct_answers in the model
-        # So we'll use default values or calculate from related data
-        subject_performance[subject]['total_questions'] += 10  # Default assumption
-        subject_performance[subject]['correct_answers'] += int(attempt.score or 0)  # Use score as correct answers
-        subject_performance[subject]['total_score'] += attempt.score or 0
-    
-    # Calculate average scores for each subject
-    for subject in subject_performance:
-        if subject_performance[subject]['total_attempts'] > 0:
-            subject_performance[subject]['average_score'] = (
-                subject_performance[subject]['total_score'] / 
-                subject_performance[subject]['total_attempts']
-            )
-        else:
-            subject_performance[subject]['average_score'] = 0
-    
-    # Class-wise performance
-    class_performance = {}
-    for attempt in quiz_attempts:
-        class_name = attempt.class_name or 'Unknown'
-        if class_name not in class_performance:
-            class_performance[class_name] = {
-                'total_attempts': 0,
-                'total_questions': 0,
-                'correct_answers': 0,
-                'total_score': 0
-            }
-        
-        class_performance[class_name]['total_attempts'] += 1
-        class_performance[class_name]['total_questions'] += attempt.total_questions
-        class_performance[class_name]['correct_answers'] += attempt.correct_answers
-        class_performance[class_name]['total_score'] += attempt.score or 0
-    
-    # Calculate average scores for each class
-    for class_name in class_performance:
-        if class_performance[class_name]['total_attempts'] > 0:
-            class_performance[class_name]['average_score'] = (
-                class_performance[class_name]['total_score'] / 
-                class_performance[class_name]['total_attempts']
-            )
-        else:
-            class_performance[class_name]['average_score'] = 0
+    subject_groups = get_grouped_attempt_totals(quiz_attempts, 'subject', 'Unknown')
+    if mock_totals['attempts']:
+        # Mock tests are categorized under "Mock Test" subject, assuming 10 questions each
+        add_group_totals(
+            subject_groups, 'Mock Test', mock_totals['attempts'], mock_totals['attempts'] * 10,
+            int(mock_totals['score_as_correct'] or 0), mock_totals['total_score']
+        )
     
-    # Difficulty-wise performance
-    difficulty_performance = {}
-    for attempt in quiz_attempts:
-        difficulty = attempt.difficulty_level or 'simple'
-        if difficulty not in difficulty_performance:
-            difficulty_performance[difficulty] = {
-                'total_attempts': 0,
-                'total_questions': 0,
-                'correct_answers': 0,
-                'total_score': 0
+    # Class-wise and difficulty-wise performance
+    class_groups = get_grouped_attempt_totals(quiz_attempts, 'class_name', 'Unknown')
+    difficulty_groups = get_grouped_attempt_totals(quiz_attempts, 'difficulty_level', 'simple')
+    
+    def breakdown(groups):
+        return {
+            name: {
+                'total_attempts': group['attempts'],
+                'total_questions': group['total_questions'],
+                'correct_answers': group['correct_answers'],
+                'total_score': group['total_score'],
+                'average_score': group['total_score'] / group['attempts'] if group['attempts'] > 0 else 0,
             }
-        
-        difficulty_performance[difficulty]['total_attempts'] += 1
-        difficulty_performance[difficulty]['total_questions'] += attempt.total_questions
-        difficulty_performance[difficulty]['correct_answers'] += attempt.correct_answers
-        difficulty_performance[difficulty]['total_score'] += attempt.score or 0
-    
-    # Calculate average scores for each difficulty
-    for difficulty in difficulty_performance:
-        if difficulty_performance[difficulty]['total_attempts'] > 0:
-            difficulty_performance[difficulty]['average_score'] = (
-                difficulty_performance[difficulty]['total_score'] / 
-                difficulty_performance[difficulty]['total_attempts']
-            )
-        else:
-            difficulty_performance[difficulty]['average_score'] = 0
+            for name, group in groups.items()
+        }
     
     # Calculate mock test specific metrics
-    mock_test_questions_answered = sum(attempt.total_questions for attempt in mock_test_attempts)
-    mock_test_correct_answers = sum(attempt.correct_answers for attempt in mock_test_attempts)
+    mock_test_questions_answered = mock_totals['total_questions']
+    mock_test_correct_answers = mock_totals['correct_answers']
     
     performance_data = {
         'total_quizzes_attempted': total_quizzes_attempted,
@@ -1220,9 +1112,9 @@ def get_student_performance(request):
         'mock_test_average_score': round(mock_test_average_score, 2),
         'mock_test_questions_answered': mock_test_questions_answered,
         'mock_test_correct_answers': mock_test_correct_answers,
-        'subject_wise_performance': subject_performance,
-        'class_wise_performance': class_performance,
-        'difficulty_wise_performance': difficulty_performance
+        'subject_wise_performance': breakdown(subject_groups),
+        'class_wise_performance': breakdown(class_groups),
+        'difficulty_wise_performance': breakdown(difficulty_groups)
     }
     
     return Response(performance_data)
@@ -1241,105 +1133,54 @@ def get_quiz_statistics(request):
     if not student_reg:
         return Response({'error': 'Student registration not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get all quiz and mock test attempts
+    # All figures are aggregated in the database; attempt rows (and their JSON columns) are never loaded
     quiz_attempts = QuizAttempt.objects.filter(student_id=student_reg)
     mock_test_attempts = MockTestAttempt.objects.filter(student_id=student_reg)
+    quiz_totals = get_attempt_totals(quiz_attempts, average_score=Avg('score'))
+    mock_totals = get_attempt_totals(mock_test_attempts)
     
     # Calculate statistics (combining both quiz and mock test data)
-    total_quiz_attempts = quiz_attempts.count()
-    total_mock_test_attempts = mock_test_attempts.count()
-    total_attempts = total_quiz_attempts + total_mock_test_attempts
-    
-    total_questions = quiz_attempts.aggregate(total=Sum('total_questions'))['total'] or 0
-    total_correct = quiz_attempts.aggregate(total=Sum('correct_answers'))['total'] or 0
+    total_attempts = quiz_totals['attempts'] + mock_totals['attempts']
+    total_questions = quiz_totals['total_questions']
+    total_correct = quiz_totals['correct_answers']
     
     # Calculate average score from both quiz and mock test attempts
-    all_scores = []
-    all_scores.extend([attempt.score for attempt in quiz_attempts if attempt.score])
-    all_scores.extend([attempt.score for attempt in mock_test_attempts if attempt.score])
-    average_score = sum(all_scores) / len(all_scores) if all_scores else 0
-    
-    # Subject-wise performance (including both quiz and mock test data)
-    subject_stats = {}
-    
-    # Process quiz attempts
-    for attempt in quiz_attempts:
-        subject = attempt.subject or 'Unknown'
-        if subject not in subject_stats:
-            subject_stats[subject] = {'attempts': 0, 'total_score': 0, 'total_questions': 0}
-        subject_stats[subject]['attempts'] += 1
-        subject_stats[subject]['total_score'] += attempt.score or 0
-        subject_stats[subject]['total_questions'] += attempt.total_questions
-    
-    # Process mock test attempts
-    for attempt in mock_test_attempts:
-        subject = 'Mock Test'
-        if subject not in subject_stats:
-            subject_stats[subject] = {'attempts': 0, 'total_score': 0, 'total_questions': 0}
-        subject_stats[subject]['attempts'] += 1
-        subject_stats[subject]['total_score'] += attempt.score or 0
-        subject_stats[subject]['total_questions'] += 10  # Default assumption
-    
-    # Calculate averages for each subject
-    for subject in subject_stats:
-        if subject_stats[subject]['attempts'] > 0:
-            subject_stats[subject]['average_score'] = subject_stats[subject]['total_score'] / subject_stats[subject]['attempts']
-        else:
-            subject_stats[subject]['average_score'] = 0
-    
-    # Class-wise performance (including both quiz and mock test data)
-    class_stats = {}
-    
-    # Process quiz attempts
-    for attempt in quiz_attempts:
-        class_name = attempt.class_name or 'Unknown'
-        if class_name not in class_stats:
-            class_stats[class_name] = {'attempts': 0, 'total_score': 0}
-        class_stats[class_name]['attempts'] += 1
-        class_stats[class_name]['total_score'] += attempt.score or 0
-    
-    # Process mock test attempts (use default class for mock tests)
-    for attempt in mock_test_attempts:
-        class_name = 'Mock Test Class'  # Default class for mock tests
-        if class_name not in class_stats:
-            class_stats[class_name] = {'attempts': 0, 'total_score': 0}
-        class_stats[class_name]['attempts'] += 1
-        class_stats[class_name]['total_score'] += attempt.score or 0
-    
-    # Calculate averages for each class
-    for class_name in class_stats:
-        if class_stats[class_name]['attempts'] > 0:
-            class_stats[class_name]['average_score'] = class_stats[class_name]['total_score'] / class_stats[class_name]['attempts']
-        else:
-            class_stats[class_name]['average_score'] = 0
+    scored_attempts = quiz_totals['scored_attempts'] + mock_totals['scored_attempts']
+    average_score = (quiz_totals['scored_total'] + mock_totals['scored_total']) / scored_attempts if scored_attempts else 0
+    
+    # Subject-wise and class-wise performance (including both quiz and mock test data)
+    subject_groups = get_grouped_attempt_totals(quiz_attempts, 'subject', 'Unknown')
+    class_groups = get_grouped_attempt_totals(quiz_attempts, 'class_name', 'Unknown')
+    if mock_totals['attempts']:
+        # Mock tests assume 10 questions each and a default class
+        add_group_totals(
+            subject_groups, 'Mock Test', mock_totals['attempts'], mock_totals['attempts'] * 10, 0, mock_totals['total_score']
+        )
+        add_group_totals(class_groups, 'Mock Test Class', mock_totals['attempts'], 0, 0, mock_totals['total_score'])
     
     # Difficulty-wise performance (only quiz attempts have difficulty levels)
-    difficulty_stats = {}
-    for attempt in quiz_attempts:
-        difficulty = attempt.difficulty_level or 'simple'
-        if difficulty not in difficulty_stats:
-            difficulty_stats[difficulty] = {'attempts': 0, 'total_score': 0}
-        difficulty_stats[difficulty]['attempts'] += 1
-        difficulty_stats[difficulty]['total_score'] += attempt.score or 0
-    
-    # Calculate averages for each difficulty
-    for difficulty in difficulty_stats:
-        if difficulty_stats[difficulty]['attempts'] > 0:
-            difficulty_stats[difficulty]['average_score'] = difficulty_stats[difficulty]['total_score'] / difficulty_stats[difficulty]['attempts']
-        else:
-            difficulty_stats[difficulty]['average_score'] = 0
+    difficulty_groups = get_grouped_attempt_totals(quiz_attempts, 'difficulty_level', 'simple')
+    
+    def breakdown(groups, with_questions=False):
+        stats = {}
+        for name, group in groups.items():
+            stats[name] = {'attempts': group['attempts'], 'total_score': group['total_score']}
+            if with_questions:
+                stats[name]['total_questions'] = group['total_questions']
+            stats[name]['average_score'] = group['total_score'] / group['attempts'] if group['attempts'] > 0 else 0
+        return stats
     
     # Quiz statistics
-    quiz_total_attempts = quiz_attempts.count()
-    quiz_total_questions = quiz_attempts.aggregate(total=Sum('total_questions'))['total'] or 0
-    quiz_total_correct = quiz_attempts.aggregate(total=Sum('correct_answers'))['total'] or 0
-    quiz_average_score = quiz_attempts.aggregate(avg=Avg('score'))['avg'] or 0
+    quiz_total_attempts = quiz_totals['attempts']
+    quiz_total_questions = quiz_totals['total_questions']
+    quiz_total_correct = quiz_totals['correct_answers']
+    quiz_average_score = quiz_totals['average_score'] or 0
     
     # Mock test statistics
-    mock_total_attempts = mock_test_attempts.count()
+    mock_total_attempts = mock_totals['attempts']
     mock_total_questions = mock_total_attempts * 10  # Default assumption for mock tests
-    mock_total_correct = sum(attempt.score or 0 for attempt in mock_test_attempts)
-    mock_average_score = sum(attempt.score or 0 for attempt in mock_test_attempts) / mock_total_attempts if mock_total_attempts > 0 else 0
+    mock_total_correct = mock_totals['total_score']
+    mock_average_score = mock_totals['total_score'] / mock_total_attempts if mock_total_attempts > 0 else 0
     
     return Response({
         'overall': {
@@ -1363,133 +1204,7 @@ def get_quiz_statistics(request):
             'average_score': round(mock_average_score, 2),
             'accuracy_percentage': round((mock_total_correct / mock_total_questions * 100) if mock_total_questions > 0 else 0, 2)
         },
-        'subject_wise': subject_stats,
-        'class_wise': class_stats,
-        'difficulty_wise': difficulty_stats
+        'subject_wise': breakdown(subject_groups, with_questions=True),
+        'class_wise': breakdown(class_groups),
+        'difficulty_wise': breakdown(difficulty_groups)
     })
-
-
-def update_student_performance(student_reg, attempt):
-    """
-    Update student performance record based on quiz attempt
-    """
-    # Skip performance update for anonymous users or when no user is available
-    # This is for testing purposes - in production, proper authentication should be used
-    return
-    
-    # Note: The following code would be used with proper authentication:
-    # try:
-    #     performance = StudentPerformance.objects.get(student=student_reg)
-    # except StudentPerformance.DoesNotExist:
-    #     performance = StudentPerformance.objects.create(student=student_reg)
-    if not student_reg:
-        return  # Skip if no student registration found
-    
-    # Update overall statistics
-    performance.total_quizzes_attempted += 1
-    performance.total_questions_answered += attempt.total_questions
-    performance.total_correct_answers += attempt.correct_answers
-    performance.last_quiz_date = attempt.attempted_at
-    
-    # Recalculate overall average score
-    all_attempts = QuizAttempt.objects.filter(student_id=student_reg)
-    if all_attempts.exists():
-        performance.overall_average_score = all_attempts.aggregate(avg=Avg('score'))['avg'] or 0
-    
-    # Update subject-wise scores
-    subject = attempt.subject.lower() if attempt.subject else ''
-    if 'math' in subject or 'mathematics' in subject:
-        performance.mathematics_score = calculate_subject_average(student, 'mathematics')
-    elif 'science' in subject:
-        performance.science_score = calculate_subject_average(student, 'science')
-    elif 'english' in subject:
-        performance.english_score = calculate_subject_average(student, 'english')
-    elif 'computer' in subject or 'programming' in subject:
-        performance.computers_score = calculate_subject_average(student, 'computers')
-    
-    # Update class-wise scores
-    class_name = attempt.class_name or ''
-    if '7' in class_name:
-        performance.class_7_score = calculate_class_average(student, '7')
-    elif '8' in class_name:
-        performance.class_8_score = calculate_class_average(student, '8')
-    elif '9' in class_name:
-        performance.class_9_score = calculate_class_average(student, '9')
-    elif '10' in class_name:
-        performance.class_10_score = calculate_class_average(student, '10')
-    
-    # Update difficulty-wise scores
-    difficulty = attempt.difficulty_level or 'simple'
-    if difficulty == 'simple':
-        performance.simple_difficulty_score = calculate_difficulty_average(student, 'simple')
-    elif difficulty == 'medium':
-        performance.medium_difficulty_score = calculate_difficulty_average(student, 'medium')
-    elif difficulty == 'hard':
-        performance.hard_difficulty_score = calculate_difficulty_average(student, 'hard')
-    
-    # Calculate average time per question
-    total_time = all_attempts.aggregate(total=Sum('time_taken_seconds'))['total'] or 0
-    total_questions = all_attempts.aggregate(total=Sum('total_questions'))['total'] or 0
-    if total_questions > 0:
-        performance.average_time_per_question = total_time / total_questions
-    
-    # Calculate completion rate
-    completed_attempts = all_attempts.filter(completion_percentage__gte=80).count()
-    performance.completion_rate = (completed_attempts / all_attempts.count() * 100) if all_attempts.count() > 0 else 0
-    
-    performance.save()
-
-
-def calculate_subject_average(student, subject_keyword):
-    """
-    Calculate average score for a specific subject
-    """
-    student_reg = get_student_registration(student)
-    if not student_reg:
-        return 0
-    
-    attempts = QuizAttempt.objects.filter(student_id=student_reg)
-    subject_attempts = []
-    
-    for attempt in attempts:
-        subject = attempt.subject.lower() if attempt.subject else ''
-        if subject_keyword in subject:
-            subject_attempts.append(attempt.score or 0)
-    
-    return sum(subject_attempts) / len(subject_attempts) if subject_attempts else 0
-
-
-def calculate_class_average(student, class_number):
-    """
-    Calculate average score for a specific class
-    """
-    student_reg = get_student_registration(student)
-    if not student_reg:
-        return 0
-    
-    attempts = QuizAttempt.objects.filter(
-        student_id=student_reg,
-        class_name__icontains=class_number
-    )
-    
-    if attempts.exists():
-        return attempts.aggregate(avg=Avg('score'))['avg'] or 0
-    return 0
-
-
-def calculate_difficulty_average(student, difficulty):
-    """
-    Calculate average score for a specific difficulty level
-    """
-    student_reg = get_student_registration(student)
-    if not student_reg:
-        return 0
-    
-    attempts = QuizAttempt.objects.filter(
-        student_id=student_reg,
-        difficulty_level=difficulty
-    )
-    
-    if attempts.exists():
-        return attempts.aggregate(avg=Avg('score'))['avg'] or 0
-    return 0